@@ -0,0 +1,224 @@
+"""Benchmark of the icon pipeline on a fixed corpus of molecules, from water to a peptide of a few hundred atoms.
+
+Every stage (parsing, geometry, SVG build and serialization, export in each format, 3D graph in each resolution) is
+timed separately, and its memory peak is measured with tracemalloc in an extra run (only the python and numpy
+allocations are seen, not the ones of RDKit). PNG and JPEG images are produced with the same width for every molecule
+(RASTER_WIDTH): at the default 200 dpi the icon of the peptide would be about 20000 pixels wide. The results are
+written as JSON, together with the commit and the library versions, so runs of different commits can be compared:
+
+    python benchmark.py -o before.json
+    python benchmark.py -o after.json --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import plotly
+import rdkit
+from rdkit import Chem
+
+import molecule_icon_generator as mig
+
+# name, SMILES; sorted by size
+CORPUS = [
+    ('water', 'O'),
+    ('hydrogen sulfide', 'S'),
+    ('methane', 'C'),
+    ('carbon dioxide', 'O=C=O'),
+    ('benzonitrile', 'c1ccccc1C#N'),
+    ('caffeine', 'CN1C=NC2=C1C(=O)N(C(=O)N2C)C'),
+    ('glucose', 'OC[C@H]1OC(O)[C@H](O)[C@@H](O)[C@@H]1O'),
+    ('18-crown-6', 'C1COCCOCCOCCOCCOCCO1'),
+    ('cyclooctadecane', 'C1CCCCCCCCCCCCCCCCC1'),
+    ('porphine', 'C1=CC2=NC1=CC3=CC=C(N3)C=C4C=CC(=N4)C=C5C=CC(=C2)N5'),
+    ('peptide', Chem.MolToSmiles(Chem.MolFromSequence('ACDEFGHIKLMNPQRSTVWY'))),
+]
+RASTER_FORMATS = ('png', 'jpeg')
+RASTER_WIDTH = 1024
+# None is the automatic level of detail used by the viewer
+GRAPH_RESOLUTIONS = (10, 30, None)
+
+
+def measure(func, repeat=3, memory=True):
+    """It times a function and measures its memory peak.
+
+    Parameters
+    ----------
+    func : callable
+        The function to measure, without arguments.
+    repeat : int, default: 3
+        The number of timed runs.
+    memory : bool, default: True
+        Whether to measure the memory peak with tracemalloc, in an extra run.
+
+    Returns
+    -------
+    tuple
+        The timing and memory record, and the value returned by the last call of func.
+
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - start)
+    record = {'repeat': repeat, 'min_s': min(times), 'median_s': statistics.median(times), 'max_s': max(times)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        value = func()
+        record['peak_kib'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return record, value
+
+
+def molecule_stages(name, smiles, repeat=3, memory=True, dimension_3=True, formats=('svg', 'pdf') + RASTER_FORMATS,
+                    resolutions=GRAPH_RESOLUTIONS):
+    """It measures every stage of the pipeline for one molecule.
+
+    Parameters
+    ----------
+    name : str
+        The name of the molecule.
+    smiles : str
+        The SMILES of the molecule.
+    repeat : int, default: 3
+        The number of timed runs of each stage.
+    memory : bool, default: True
+        Whether to measure the memory peaks.
+    dimension_3 : bool, default: True
+        Whether to measure the 3D embedding and the 3D graph.
+    formats : tuple, default: ('svg', 'pdf', 'png', 'jpeg')
+        The export formats to measure.
+    resolutions : tuple, default: GRAPH_RESOLUTIONS
+        The resolutions of the 3D graph to measure. None uses the vertex budget of the viewer.
+
+    Returns
+    -------
+    list
+        A record for each stage.
+
+    """
+    records = []
+
+    def run(stage, func, **params):
+        record, value = measure(func, repeat, memory)
+        record.update({'molecule': name, 'stage': stage, 'params': params})
+        records.append(record)
+        return value
+
+    mol = run('parse_structure', lambda: mig.parse_structure(smiles), dimension=2)
+    n_atoms = mol.GetNumAtoms()
+    conf = mol.GetConformer()
+    run('position_map', lambda: mig.position_map(mol, conf))
+
+    def cold_build():
+        mig.clear_caches()
+        return mig.build_svg(mol, shadow=True)
+
+    run('icon_geometry', lambda: (mig.clear_caches(), mig.icon_geometry(mol))[1])
+    svg = run('build_svg', cold_build)
+    colors = dict(mig.color_map)
+
+    def restyle():
+        colors['C'] = '#%06x' % (len(records) * 7919 % 0xffffff)
+        return mig.build_svg(mol, atom_color=colors, shadow=True)
+
+    run('build_svg_restyle', restyle)
+    run('svg_serialize', lambda: mig.svg_to_bytes(svg))
+    run('svg_serialize', lambda: mig.svg_to_bytes(svg, indent=False), indent=False)
+    # the viewBox is in pixels at 96 dpi
+    dpi = round(RASTER_WIDTH * 96 / float(svg.get('viewBox').split()[2]), 3)
+    for form in formats:
+        params = {'format': form, 'dpi': dpi} if form in RASTER_FORMATS else {'format': form}
+        run('export_icon', lambda: mig.export_icon(svg, (form,), dpi=dpi), **params)
+    with tempfile.TemporaryDirectory() as directory:
+        for form in formats:
+            flags = {f'save_{form}': True} if form != 'svg' else {}
+            params = {'format': form, 'dpi': dpi} if form in RASTER_FORMATS else {'format': form}
+            run('icon_print', lambda: mig.icon_print(mol, directory=directory, dpi=dpi, **flags), **params)
+
+    if dimension_3:
+        mol_3d = run('parse_structure', lambda: mig.parse_structure(smiles, dimension_3=True, randomseed=1),
+                     dimension=3)
+        for resolution in resolutions:
+            for mesh in (False, True):
+                lod = {'resolution': 100, 'vertex_budget': mig.VERTEX_BUDGET} if resolution is None else \
+                    {'resolution': resolution}
+                graph = run('graph_3d', lambda: mig.graph_3d(mol_3d, mesh=mesh, **lod), resolution=resolution,
+                            mesh=mesh)
+                run('graph_json', lambda: graph.to_json(), resolution=resolution, mesh=mesh)
+                records[-1]['bytes'] = len(graph.to_json())
+    for record in records:
+        record['atoms'] = n_atoms
+    return records
+
+
+def environment():
+    """It describes the code and machine of a run: commit, library versions and platform."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'python': platform.python_version(),
+            'rdkit': rdkit.__version__, 'numpy': np.__version__, 'plotly': plotly.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def record_key(record):
+    """The key identifying a stage across runs."""
+    return record['molecule'], record['stage'], json.dumps(record['params'], sort_keys=True)
+
+
+def compare(old, new, stream=sys.stdout):
+    """It prints the median time ratio new/old of every stage found in both runs."""
+    old_records = {record_key(record): record for record in old['results']}
+    stream.write(f"{'molecule':<18}{'stage':<20}{'params':<36}{'old ms':>10}{'new ms':>10}{'ratio':>8}\n")
+    for record in new['results']:
+        previous = old_records.get(record_key(record))
+        if previous is None:
+            continue
+        ratio = record['median_s'] / previous['median_s'] if previous['median_s'] else float('nan')
+        stream.write(f"{record['molecule']:<18}{record['stage']:<20}{record_key(record)[2]:<36}"
+                     f"{previous['median_s'] * 1000:>10.2f}{record['median_s'] * 1000:>10.2f}{ratio:>8.2f}\n")
+
+
+def parse():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Benchmark the icon pipeline on a fixed corpus of molecules.')
+    parser.add_argument('-o', '--output', metavar='FILE', default='benchmark.json', help='JSON file of the results')
+    parser.add_argument('-r', '--repeat', metavar='INT', type=int, default=3, help='Timed runs of each stage')
+    parser.add_argument('-m', '--molecules', metavar='NAME', nargs='+',
+                        help='Only benchmark these molecules of the corpus')
+    parser.add_argument('--no-3d', action='store_true', help='Skip the 3D embedding and graphs')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the memory peak measurements')
+    parser.add_argument('--compare', metavar='FILE', help='Previous results to compare with')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    parsed = parse()
+    corpus = [(name, smiles) for name, smiles in CORPUS if not parsed.molecules or name in parsed.molecules]
+    results = []
+    for name, smiles in corpus:
+        start = time.perf_counter()
+        results.extend(molecule_stages(name, smiles, parsed.repeat, not parsed.no_memory, not parsed.no_3d))
+        print(f'{name}: {time.perf_counter() - start:.1f}s', file=sys.stderr)
+    output = {'environment': environment(), 'results': results}
+    with open(parsed.output, 'w') as f:
+        json.dump(output, f, indent=1)
+    if parsed.compare:
+        with open(parsed.compare) as f:
+            compare(json.load(f), output)
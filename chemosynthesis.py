@@ -1,7 +1,41 @@
 import streamlit as st
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
+import plotly.graph_objects as go
+import uuid
+from functools import lru_cache
+from food_web import cached_figure
+from food_web_analytics import ENERGY_SOURCES, cached_analytics
+from kinetics import KineticModel, PATHWAY_KINETICS, SUBSTRATES, half_life, simulate_batch
+from molecule_visualization import molecule_reactions
+from organism_registry import OrganismRegistry
+from stoichiometry import Reaction, pretty_formula
+
+# sulfide oxidation of the vent bacteria, and the range of the reactant sliders
+VENT_REACTION = Reaction.parse('CO2 + 4H2S + O2 -> CH2O + 4S + 3H2O')
+MAX_MOLES = 20
+PRODUCT_NAMES = {'CH2O': 'Sugar', 'S': 'Sulfur', 'H2O': 'Water'}
+REACTANT_NAMES = {'H2S': 'Hydrogen Sulfide', 'CO2': 'Carbon Dioxide', 'O2': 'Oxygen'}
+# kinetic pathways, and the molecule of molecule_reactions with their equation
+PATHWAY_MOLECULES = {'H₂S oxidation': 'Hydrogen sulfide', 'Methane oxidation': 'Methane',
+                     'Ammonia oxidation': 'Ammonia', 'Hydrogen oxidation': 'Water'}
+
+
+@lru_cache(maxsize=None)
+def vent_yields(maximum=MAX_MOLES):
+    """Run the vent reaction for every combination of 0 ... maximum moles of H2S, CO2 and O2, in one call. The arrays
+    are indexed [H2S, CO2, O2]."""
+    h2s, co2, o2 = np.meshgrid(*(np.arange(maximum + 1),) * 3, indexing='ij')
+    return VENT_REACTION.run({'H2S': h2s, 'CO2': co2, 'O2': o2})
+
+
+@st.fragment(run_every=0.5)
+def wait_for_simulation(future, n_scenarios):
+    """Poll a running simulation without blocking the script, and rerun the page once it is done."""
+    if future.done():
+        st.rerun()
+    st.info(f'Simulating {n_scenarios} scenarios...')
 
 def write_chemo_data():
     st.header("Organism Preview")
@@ -81,7 +115,9 @@ def write_chemo_data():
 
 def web_and_chemo_data():
     if 'organisms' not in st.session_state:
-        st.session_state['organisms'] = pd.DataFrame(columns=['Name', 'Type'])
+        st.session_state['organisms'] = OrganismRegistry()
+        st.session_state['organisms_imported'] = set()
+    registry = st.session_state['organisms']
 
     type_options = ['Microbial', 'Fungus-Like Organism', 'Filter Feeder', 'Mollusk', 'Zooplankton', 'Echinoderm']
     st.header('Food Web Builder')
@@ -90,45 +126,62 @@ def web_and_chemo_data():
 
     # Button to submit the new organism
     if st.button('Add Organism'):
-        if name:  # Ensure the name field is not empty
-            # Create a new entry
-            new_organism = {
-                'Name': name,
-                'Type': type_selected,
-            }
-
-            # Append to the DataFrame
-            st.session_state['organisms'] = st.session_state['organisms']._append(new_organism, ignore_index=True)
+        if not name.strip():  # Ensure the name field is not empty
+            st.error('Please enter a name for the organism.')
+        elif name in registry:
+            st.error(f'{name.strip()} is already registered.')
+        else:
+            registry.add(name, type_selected)
             st.success(f'Added {name} successfully!')
+
+    # Import a whole list of organisms at once
+    uploaded = st.file_uploader('Import organisms (CSV or Parquet file with a Name and a Type column):',
+                                type=['csv', 'parquet'])
+    # the uploaded file is returned on every rerun, it is imported only once
+    if uploaded is not None and uploaded.file_id not in st.session_state['organisms_imported']:
+        try:
+            added, skipped = registry.import_file(uploaded)
+        except (ValueError, KeyError, ImportError) as e:
+            st.error(f'Could not import {uploaded.name}: {e}')
         else:
-            st.error('Please enter a name for the organism.')
+            st.success(f'Imported {added} organisms from {uploaded.name} ({skipped} empty or already present).')
+        st.session_state['organisms_imported'].add(uploaded.file_id)
 
     # Display the current organisms
     st.subheader('Current Organisms')
-    st.dataframe(st.session_state['organisms'])
+    st.dataframe(registry.to_frame())
 
-
-    # Input for predator and prey relationships
-    predator = st.selectbox('Select Predator:', st.session_state['organisms']['Name'].tolist())
-    prey = st.selectbox('Select Prey:', st.session_state['organisms']['Name'].tolist())
+    # Input for predator and prey relationships, optionally only among the organisms of a type
+    type_filter = st.selectbox('Show organisms of type:', ['All'] + registry.types())
+    options = registry.names(None if type_filter == 'All' else type_filter)
+    predator = st.selectbox('Select Predator:', options)
+    # the producers feed on the chemical energy sources
+    prey = st.selectbox('Select Prey:', list(ENERGY_SOURCES) + options)
 
     if st.button('Add Relationship'):
         if predator and prey and predator != prey:  # Ensure they are not the same
             # Create a directed graph
             if 'food_web' not in st.session_state:
                 st.session_state['food_web'] = nx.DiGraph()
+                st.session_state['food_web_version'] = 0
 
-            st.session_state['food_web'].add_edge(prey, predator)  # Prey -> Predator
+            if not st.session_state['food_web'].has_edge(prey, predator):
+                st.session_state['food_web'].add_edge(prey, predator)  # Prey -> Predator
+                # the layout and the picture are only computed again for a new version
+                st.session_state['food_web_version'] += 1
             st.success(f'Added relationship: {prey} → {predator}')
 
-    # Draw the food web
+    # Draw the food web, cached in the session state until the graph changes
     if 'food_web' in st.session_state:
-        G = st.session_state['food_web']
-        plt.figure(figsize=(10, 6))
-        pos = nx.spring_layout(G)
-        nx.draw(G, pos, with_labels=True, node_size=2000, node_color='lightblue', font_size=10, font_color='black', font_weight='bold', arrows=True)
-        plt.title('Food Web')
-        st.pyplot(plt)
+        figure = cached_figure(st.session_state, st.session_state['food_web'], st.session_state['food_web_version'])
+        # pan, zoom and hover are handled by the browser, the figure is only built again when the graph changes
+        st.plotly_chart(figure, config={'scrollZoom': True}, key='food_web_chart')
+        with st.expander('Food web analytics'):
+            st.markdown(f'''Trophic level, energy reaching each organism from {' and '.join(ENERGY_SOURCES)} (one unit
+            per source, 10% passed to the predators), keystone index, betweenness and number of links from each
+            energy source. Sorted by keystone index.''')
+            st.dataframe(cached_analytics(st.session_state, st.session_state['food_web'],
+                                          st.session_state['food_web_version']))
 
     # hydrothermal vents
     # Title of the app
@@ -136,28 +189,106 @@ def web_and_chemo_data():
     st.header("Interactive Chemosynthesis Simulation")
 
     # Description
-    st.markdown("""
+    st.markdown(f"""
     Astral Aurelia's floor include many hydothermal vents, which are huge chimney-like structures that emit heated water rich in minerals.
     These serve as hotspots for biodiversity, where life thrives in extreme temperatures and pressures.
     In this simulation, we explore how vent bacteria oxidize hydrogen sulfide in hydrothermal vents to produce energy.
     The chemical equation governing this process is:  
-    **CO₂ + 4H₂S + O₂ → CH₂O + 4S + 3H₂O**
+    **{VENT_REACTION.pretty()}**
     """)
 
     # Create interactive inputs for exploration
     st.subheader("Explore the Process")
-    hydrogen_sulfide = st.slider("Amount of Hydrogen Sulfide (H₂S, in moles):", 0, 20, 4)
-    carbon_dioxide = st.slider("Amount of Carbon Dioxide (CO₂, in moles):", 0, 20, 1)
-    oxygen = st.slider("Amount of Oxygen (O₂, in moles):", 0, 20, 1)
+    hydrogen_sulfide = st.slider("Amount of Hydrogen Sulfide (H₂S, in moles):", 0, MAX_MOLES, 4)
+    carbon_dioxide = st.slider("Amount of Carbon Dioxide (CO₂, in moles):", 0, MAX_MOLES, 1)
+    oxygen = st.slider("Amount of Oxygen (O₂, in moles):", 0, MAX_MOLES, 1)
 
-    # Calculate products based on user input
-    sugar = carbon_dioxide  # 1 mole of CO₂ produces 1 mole of sugar
-    sulfur = hydrogen_sulfide * 4  # 4 moles of H₂S produce 4 moles of sulfur
-    water = hydrogen_sulfide * 3  # 3 moles of H₂S produce 3 moles of water
+    # the reaction is run once for every slider combination, the sliders only select a point
+    yields = vent_yields()
+    point = (hydrogen_sulfide, carbon_dioxide, oxygen)
+    limiting = VENT_REACTION.reactants[yields['limiting'][point]]
 
     # Display results
     st.write(f"With {hydrogen_sulfide} moles of H₂S, {carbon_dioxide} moles of CO₂, and {oxygen} moles of O₂,")
     st.write(f"the reaction produces:")
-    st.write(f"- Sugar (CH₂O): {sugar} mole(s)")
-    st.write(f"- Sulfur (S): {sulfur} mole(s)")
-    st.write(f"- Water (H₂O): {water} mole(s)")
\ No newline at end of file
+    for formula in VENT_REACTION.products:
+        st.write(f"- {PRODUCT_NAMES[formula]} ({pretty_formula(formula)}): {yields['amounts'][formula][point]:g} mole(s)")
+    st.write(f"The limiting reagent is {REACTANT_NAMES[limiting]} ({pretty_formula(limiting)}), left over: "
+             + ", ".join(f"{yields['amounts'][formula][point]:g} mole(s) of {pretty_formula(formula)}"
+                         for formula in VENT_REACTION.reactants if formula != limiting))
+
+    # sugar yield over every amount of H2S and CO2, for the selected amount of O2
+    surface = go.Figure(go.Heatmap(
+        z=yields['amounts']['CH2O'][:, :, oxygen].T, x=np.arange(MAX_MOLES + 1), y=np.arange(MAX_MOLES + 1),
+        customdata=np.array(VENT_REACTION.reactants)[yields['limiting'][:, :, oxygen].T],
+        hovertemplate='H₂S: %{x}<br>CO₂: %{y}<br>CH₂O: %{z:g}<br>limiting: %{customdata}<extra></extra>',
+        colorscale='Viridis', colorbar=dict(title='CH₂O'),
+    ))
+    surface.add_trace(go.Scatter(x=[hydrogen_sulfide], y=[carbon_dioxide], mode='markers', showlegend=False,
+                                 hoverinfo='skip', marker=dict(color='red', size=12, symbol='x')))
+    surface.update_layout(title=f'Sugar yield with {oxygen} moles of O₂', xaxis_title='H₂S (moles)',
+                          yaxis_title='CO₂ (moles)', height=450)
+    st.plotly_chart(surface, key='vent_yield_surface')
+
+    # kinetics of the pathways, for a grid of temperatures and microbe densities
+    st.subheader("Kinetics of the Pathways")
+    pathway = st.selectbox("Pathway:", list(PATHWAY_MOLECULES))
+    model = KineticModel(molecule_reactions[PATHWAY_MOLECULES[pathway]], PATHWAY_KINETICS[pathway])
+    st.write(f"**{model.reaction.pretty()}**")
+    low_temperature, high_temperature = st.slider("Temperature range (°C):", 0, 120, (2, 80))
+    low_density, high_density = st.slider("Microbe density range (mg/L):", 1, 200, (1, 100))
+    grid = st.slider("Scenarios per range:", 5, 30, 20)
+    hours = st.slider("Simulated time (hours):", 6, 168, 48)
+    substrates = [formula for formula in model.reaction.reactants if formula in SUBSTRATES]
+    columns = st.columns(len(substrates))
+    initial = {formula: column.number_input(f"{pretty_formula(formula)} (mM):", 0.0, 100.0, 10.0,
+                                            key=f'kinetics_{formula}')
+               for formula, column in zip(substrates, columns)}
+
+    temperatures = np.linspace(low_temperature, high_temperature, grid)
+    densities = np.linspace(low_density, high_density, grid)
+    temperature_grid, density_grid = np.meshgrid(temperatures, densities, indexing='ij')
+    concentrations = np.zeros((grid * grid, len(model.species)))
+    for formula, value in initial.items():
+        concentrations[:, model.species.index(formula)] = value
+    # the whole grid is one batch, simulated in the background and memoized. The session is the channel of its
+    # batches: the ones it asked for before and that have not started yet are dropped
+    if 'kinetics_channel' not in st.session_state:
+        st.session_state['kinetics_channel'] = uuid.uuid4().hex
+    future = simulate_batch(molecule_reactions[PATHWAY_MOLECULES[pathway]], pathway, temperature_grid.ravel(),
+                            concentrations, density_grid.ravel(), t_end=hours,
+                            channel=st.session_state['kinetics_channel'])
+    if not future.done():
+        wait_for_simulation(future, grid * grid)
+    elif future.exception() is not None:
+        st.error(f'The simulation failed: {future.exception()}')
+    else:
+        result = future.result()
+        limiting = min(substrates, key=lambda formula: initial[formula]
+                       / model.reaction.coefficients[model.species.index(formula)])
+        times = half_life(result, model.species.index(limiting)).reshape(grid, grid)
+        sweep = go.Figure(go.Heatmap(
+            z=times.T, x=temperatures, y=densities, colorscale='Viridis', colorbar=dict(title='hours'),
+            hovertemplate='T: %{x:.1f} °C<br>density: %{y:.1f} mg/L<br>half-life: %{z:.2f} h<extra></extra>',
+        ))
+        sweep.update_layout(title=f'Half-life of {pretty_formula(limiting)} (blank: not reached in {hours} hours)',
+                            xaxis_title='Temperature (°C)', yaxis_title='Microbe density (mg/L)', height=450)
+        st.plotly_chart(sweep, key='kinetics_sweep')
+
+        # time course of one scenario of the batch
+        temperature = st.select_slider("Scenario temperature (°C):", range(grid),
+                                       format_func=lambda i: f'{temperatures[i]:.1f}')
+        density = st.select_slider("Scenario microbe density (mg/L):", range(grid),
+                                   format_func=lambda i: f'{densities[i]:.1f}')
+        scenario = temperature * grid + density
+        course = go.Figure()
+        for i, formula in enumerate(model.species):
+            if formula not in ('H2O', 'H+', 'e-'):  # solvent, and the ions of the half reaction
+                course.add_trace(go.Scatter(x=result['time'], y=result['concentrations'][scenario, i],
+                                            name=pretty_formula(formula)))
+        course.add_trace(go.Scatter(x=result['time'], y=result['biomass'][scenario], name='Microbes (mg/L)',
+                                    line=dict(dash='dot'), yaxis='y2'))
+        course.update_layout(xaxis_title='Time (hours)', yaxis_title='Concentration (mM)', height=450,
+                             yaxis2=dict(title='Microbes (mg/L)', overlaying='y', side='right'),
+                             legend=dict(orientation='h', y=-0.2))
+        st.plotly_chart(course, key='kinetics_course')
@@ -0,0 +1,129 @@
+"""Persistent cache of the molecules prepared by parse_structure, keyed by canonical SMILES and embedding parameters."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from rdkit import Chem
+
+# default location of the on-disk cache, shared by every session and restart
+DEFAULT_CACHE_PATH = os.environ.get(
+    "CONFORMER_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "beyond-sunlight", "conformers.sqlite3"),
+)
+# total size of the pickled molecules in the SQLite store
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# number of molecules kept in the in-process tier in front of SQLite
+MEMORY_ENTRIES = 128
+
+
+def conformer_key(smiles, dimension_3=False, nice_conformation=True, n_conf=1, force_field='UFF', randomseed=-1):
+    """Return the cache key of a prepared molecule. Only the parameters used by the 2D or the 3D build are part of
+    the key, and the SMILES should be canonical so that equivalent inputs share one entry."""
+    if dimension_3:
+        return f"3D|{force_field}|{randomseed}|{n_conf}|{smiles}"
+    return f"2D|{bool(nice_conformation)}|{smiles}"
+
+
+class ConformerCache:
+    """Cache of rdkit molecules with an in-memory tier and a SQLite tier, both evicting the least recently used
+    molecules. The molecules are stored as rdkit binary pickles with their properties and double precision conformers,
+    so a cached molecule is drawn exactly as a new one. Every hit returns a new copy, so callers are free to modify it.
+
+    Parameters
+    ----------
+    path : str, default: DEFAULT_CACHE_PATH
+        The SQLite file used as persistent store. Use ':memory:' for a non-persistent cache.
+    max_bytes : int, default: DEFAULT_MAX_BYTES
+        Maximum total size of the molecules in the SQLite store.
+
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> pickled molecule
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conformers ("
+            "key TEXT PRIMARY KEY, mol BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conformers_access ON conformers (last_access)")
+        self._conn.commit()
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return a copy of the cached molecule, or None if the key is not cached."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._conn.execute("SELECT mol FROM conformers WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                data = bytes(row[0])
+                self._conn.execute("UPDATE conformers SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                self._remember(key, data)
+            self.hits += 1
+        return Chem.Mol(data)
+
+    def put(self, key, mol):
+        """Store a molecule and evict the least recently used ones above max_bytes."""
+        data = mol.ToBinary(Chem.PropertyPickleOptions.AllProps | Chem.PropertyPickleOptions.CoordsAsDouble)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conformers (key, mol, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM conformers WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS total FROM conformers) "
+                "WHERE total > ?)",
+                (self.max_bytes,),
+            )
+            self._conn.commit()
+            self._remember(key, data)
+
+    def clear(self):
+        """Remove every molecule from both cache tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM conformers")
+            self._conn.commit()
+
+    def size(self):
+        """Return the total size in bytes of the molecules in the SQLite store."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM conformers").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conformers").fetchone()[0]
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_conformer_cache():
+    """Return the process-wide conformer cache."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ConformerCache()
+        return _default_cache
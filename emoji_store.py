@@ -0,0 +1,285 @@
+"""Local store of the OpenMoji emojis used by the molecule icons.
+
+The emojis are looked up in an in-memory tier of already parsed emojis, then in a directory and in a zip bundle with
+the layout of the OpenMoji repository ('color/<unicode>.svg' and 'black/<unicode>.svg'), and only then downloaded.
+Downloaded emojis are saved in the directory, so each emoji is downloaded once.
+"""
+
+import os
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# default directory of the emoji files, shared by every session and restart
+DEFAULT_STORE_PATH = os.environ.get(
+    "EMOJI_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "beyond-sunlight", "openmoji"),
+)
+# optional zip bundle with the prefetched emojis
+DEFAULT_BUNDLE_PATH = os.environ.get("EMOJI_BUNDLE_PATH")
+OPENMOJI_URL = "https://raw.githubusercontent.com/hfg-gmuend/openmoji/master/{style}/svg/{unicode}.svg"
+# number of parsed emojis kept in memory
+MEMORY_ENTRIES = 512
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 2
+# number of concurrent downloads, also the size of the connection pool
+DEFAULT_WORKERS = 8
+
+
+def emoji_path(unicode, color=True):
+    """Return the relative path of an emoji in the store directory and in the bundle, e.g. 'color/1F525.svg'."""
+    return f"{'color' if color else 'black'}/{unicode.strip().upper()}.svg"
+
+
+def parse_emoji(svg_text):
+    """It prepares the svg text of an emoji to be defined inside an icon.
+
+    Parameters
+    ----------
+    svg_text : str or bytes
+        The svg file of the emoji.
+
+    Returns
+    -------
+    tuple
+        The serialized <svg> element without viewBox and namespace prefixes, and the viewBox as a tuple of floats.
+
+    """
+    root = ET.fromstring(svg_text)
+    view_box = tuple(float(i) for i in root.get("viewBox").split())
+    del root.attrib["viewBox"]
+    # the svg namespace is declared by the icon root
+    for elem in root.iter():
+        if isinstance(elem.tag, str) and elem.tag.startswith('{'):
+            elem.tag = elem.tag.split('}', 1)[1]
+    return ET.tostring(root, encoding='unicode'), view_box
+
+
+class EmojiStore:
+    """Emoji store with an in-memory tier of parsed emojis, a directory, an optional zip bundle and the OpenMoji
+    repository as fallback.
+
+    Parameters
+    ----------
+    path : str, default: DEFAULT_STORE_PATH
+        The directory with the emoji files, downloaded emojis are saved there. None disables the directory.
+    bundle : str, optional
+        A zip file with the prefetched emojis, see write_bundle().
+    offline : bool, default: False
+        If True, the emojis are never downloaded and missing emojis raise a LookupError.
+    timeout : float, default: DEFAULT_TIMEOUT
+        The timeout in seconds of each download request.
+    retries : int, default: DEFAULT_RETRIES
+        The number of retries of a download after a connection error or a 429/5xx response.
+    workers : int, default: DEFAULT_WORKERS
+        The number of concurrent downloads of prefetch(), and the size of the HTTP connection pool.
+    url : str, default: OPENMOJI_URL
+        The url template of the emojis, with the {style} ('color' or 'black') and {unicode} fields.
+
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, bundle=DEFAULT_BUNDLE_PATH, offline=False, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, workers=DEFAULT_WORKERS, url=OPENMOJI_URL):
+        self.path = path
+        self.offline = offline
+        self.timeout = timeout
+        self.workers = workers
+        self.url = url
+        self.downloads = 0
+        self._memory = OrderedDict()  # relative path -> (svg text, viewBox)
+        self._lock = threading.Lock()
+        self._inflight = {}  # relative path -> Future of the running download
+        # one pooled session: the connections to the server are reused by every download
+        retry = Retry(total=retries, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._bundle = zipfile.ZipFile(bundle) if bundle else None
+        self._bundle_names = set(self._bundle.namelist()) if bundle else set()
+
+    def _remember(self, key, emoji):
+        with self._lock:
+            self._memory[key] = emoji
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _read_local(self, key):
+        """Return the svg file of an emoji from the directory or the bundle, or None."""
+        if self.path:
+            file_path = os.path.join(self.path, key)
+            if os.path.isfile(file_path):
+                with open(file_path, 'rb') as f:
+                    return f.read()
+        if key in self._bundle_names:
+            with self._lock:  # ZipFile is not thread safe
+                return self._bundle.read(key)
+        return None
+
+    def download(self, unicode, color=True):
+        """Download the svg file of an emoji from the OpenMoji repository and save it in the directory.
+
+        Raises
+        ------
+        ValueError
+            If the emoji does not exist.
+
+        """
+        key = emoji_path(unicode, color)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:  # the same emoji is never downloaded twice at the same time
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            style = 'color' if color else 'black'
+            response = self._session.get(self.url.format(style=style, unicode=unicode.strip().upper()),
+                                         timeout=self.timeout)
+            if response.status_code == 404 or response.content == b'404: Not Found':
+                raise ValueError(f'Emoji unicode ({unicode}) not found')
+            response.raise_for_status()
+            with self._lock:
+                self.downloads += 1
+            self.save(unicode, color, response.content)
+            future.set_result(response.content)
+        except Exception as err:
+            future.set_exception(err)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return future.result()
+
+    def save(self, unicode, color, data):
+        """Save the svg file of an emoji in the directory, if the store has one."""
+        if not self.path:
+            return
+        file_path = os.path.join(self.path, emoji_path(unicode, color))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, file_path)  # atomic, concurrent sessions never read half a file
+
+    def has(self, unicode, color=True):
+        """Whether the emoji is available without downloading it."""
+        key = emoji_path(unicode, color)
+        with self._lock:
+            if key in self._memory:
+                return True
+        return key in self._bundle_names or bool(self.path) and os.path.isfile(os.path.join(self.path, key))
+
+    def get(self, unicode, color=True):
+        """Return the parsed emoji, see parse_emoji().
+
+        Raises
+        ------
+        LookupError
+            If the emoji is not stored locally and the store is offline.
+        ValueError
+            If the emoji does not exist.
+
+        """
+        key = emoji_path(unicode, color)
+        with self._lock:
+            emoji = self._memory.get(key)
+            if emoji is not None:
+                self._memory.move_to_end(key)
+                return emoji
+        data = self._read_local(key)
+        if data is None:
+            if self.offline:
+                raise LookupError(f"Emoji unicode ({unicode}) is not stored locally and the emoji store is offline")
+            data = self.download(unicode, color)
+        emoji = parse_emoji(data)
+        self._remember(key, emoji)
+        return emoji
+
+    def prefetch(self, emojis):
+        """Load the given emojis in memory, downloading the missing ones concurrently. Repeated emojis are loaded once.
+
+        Parameters
+        ----------
+        emojis : iterable
+            (unicode, color) tuples.
+
+        Raises
+        ------
+        LookupError
+            If an emoji is not stored locally and the store is offline.
+        ValueError
+            If an emoji does not exist.
+
+        """
+        emojis = dict.fromkeys((unicode.strip().upper(), bool(color)) for unicode, color in emojis)
+        with self._lock:
+            missing = [emoji for emoji in emojis if emoji_path(*emoji) not in self._memory]
+        if not missing:
+            return
+        if len(missing) == 1 or self.offline:
+            for unicode, color in missing:
+                self.get(unicode, color)
+            return
+        # the latency is the one of the slowest download, the first error is raised after all of them
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as executor:
+            futures = [executor.submit(self.get, unicode, color) for unicode, color in missing]
+        for future in futures:
+            future.result()
+
+    def write_bundle(self, bundle, emojis):
+        """Write a zip bundle with the given emojis, downloading the missing ones.
+
+        Parameters
+        ----------
+        bundle : str
+            The path of the zip file.
+        emojis : iterable
+            (unicode, color) tuples.
+
+        """
+        emojis = list(emojis)
+        self.prefetch(emojis)
+        with zipfile.ZipFile(bundle, 'w', compression=zipfile.ZIP_DEFLATED) as f:
+            for unicode, color in dict.fromkeys(emojis):
+                key = emoji_path(unicode, color)
+                data = self._read_local(key)
+                if data is None:
+                    data = self.download(unicode, color)
+                f.writestr(key, data)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_emoji_store():
+    """Return the process-wide emoji store. Set EMOJI_OFFLINE=1 to never download emojis."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            offline = os.environ.get("EMOJI_OFFLINE", "").lower() in ("1", "true", "yes")
+            _default_store = EmojiStore(offline=offline)
+        return _default_store
+
+
+if __name__ == "__main__":
+    import argparse
+    from molecule_icon_generator import emoji_periodic_table
+
+    parser = argparse.ArgumentParser(description="Write a zip bundle with the emojis of the emoji periodic table, to "
+                                                 "draw emoji icons offline (set EMOJI_BUNDLE_PATH to use it).")
+    parser.add_argument("bundle", help="the zip file to write")
+    parser.add_argument("--black", action="store_true", help="also include the black emojis")
+    parsed = parser.parse_args()
+    styles = (True, False) if parsed.black else (True,)
+    default_emoji_store().write_bundle(parsed.bundle, [(unicode, color) for unicode in emoji_periodic_table.values()
+                                                       for color in styles])
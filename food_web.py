@@ -0,0 +1,170 @@
+"""Layout and drawing of the Food Web Builder graph.
+
+The layout is warm-started: when the graph changes, the nodes already placed keep their position and only the new
+nodes are moved by the spring layout, starting next to their placed neighbors. The picture is therefore stable across
+reruns, and the layout and the figure are only computed again when the graph version changes.
+"""
+
+import networkx as nx
+import numpy as np
+import plotly.graph_objects as go
+from scipy import sparse
+
+# seed of the first layout and of the starting positions of new nodes
+LAYOUT_SEED = 0
+# distance of a new node from the mean position of its placed neighbors
+NEIGHBOR_JITTER = 0.1
+# maximum number of nodes drawn with their name
+LABEL_LIMIT = 100
+# fraction of the edge between the prey and the arrowhead
+ARROW_POSITION = 0.8
+# number of moved nodes whose forces are computed at once by the warm-started layout
+RELAX_BLOCK = 256
+
+
+def warm_layout(graph, previous=None, seed=LAYOUT_SEED, iterations=50):
+    """It computes the positions of the nodes of a food web, keeping the nodes already placed where they are.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        The food web.
+    previous : dictionary, optional
+        The positions of a previous layout, node -> (x, y). Nodes missing from the graph are ignored.
+    seed : int, default: LAYOUT_SEED
+        The random seed of the layout, so the same graph always gets the same picture.
+    iterations : int, default: 50
+        The number of iterations of the spring layout.
+
+    Returns
+    -------
+    dictionary
+        The position of each node, node -> numpy array (x, y).
+
+    """
+    previous = {node: np.asarray(xy, dtype=float) for node, xy in (previous or {}).items() if node in graph}
+    new_nodes = [node for node in graph if node not in previous]
+    # the springs of a directed graph only pull the prey, a predator added later would drift away from its prey
+    graph = graph.to_undirected(as_view=True)
+    if not previous:
+        return nx.spring_layout(graph, seed=seed, iterations=iterations)
+    if not new_nodes:
+        return previous
+
+    rng = np.random.default_rng(seed + len(graph))
+    placed = np.array(list(previous.values()))
+    center = placed.mean(axis=0)
+    spread = max(float(np.ptp(placed, axis=0).max()), 1.0)
+    start = dict(previous)
+    for node in new_nodes:
+        neighbors = [start[other] for other in graph.neighbors(node) if other in start]
+        anchor = np.mean(neighbors, axis=0) if neighbors else center
+        # new nodes start next to their neighbors, or close to the center of the web
+        start[node] = anchor + rng.uniform(-1, 1, 2) * (NEIGHBOR_JITTER * spread if neighbors else spread / 2)
+    # the placed nodes are not moved and the layout is not rescaled, so the old positions are kept exactly
+    nodes = list(graph)
+    xy = np.array([start[node] for node in nodes])
+    index = {node: i for i, node in enumerate(nodes)}
+    movable = np.array([index[node] for node in new_nodes])
+    # adjacency rows of the moved nodes only
+    neighbors = [[index[other] for other in graph.neighbors(node)] for node in new_nodes]
+    indptr = np.cumsum([0] + [len(row) for row in neighbors])
+    indices = np.fromiter((i for row in neighbors for i in row), dtype=int, count=indptr[-1])
+    adjacency = sparse.csr_array((np.ones(len(indices)), indices, indptr), shape=(len(new_nodes), len(nodes)))
+    _relax(xy, movable, adjacency, spread / max(np.sqrt(len(graph)), 1.0), iterations)
+    return dict(zip(nodes, xy))
+
+
+def _relax(xy, movable, adjacency, k, iterations):
+    """Fruchterman-Reingold iterations, as in networkx, moving only the movable rows of xy in place. Each iteration
+    costs O(movable * nodes), in blocks of RELAX_BLOCK rows, instead of O(nodes ** 2) for the whole graph."""
+    temperature = 0.1 * max(float(np.ptp(xy, axis=0).max()), k)
+    cooling = temperature / (iterations + 1)
+    blocks = [np.arange(i, min(i + RELAX_BLOCK, len(movable))) for i in range(0, len(movable), RELAX_BLOCK)]
+    for _ in range(iterations):
+        displacement = np.empty((len(movable), 2))
+        for rows in blocks:
+            delta = xy[movable[rows], None, :] - xy[None, :, :]
+            distance = np.maximum(np.linalg.norm(delta, axis=-1), 0.01)
+            # repulsion from every node, attraction to the neighbors
+            force = k * k / distance ** 2 - adjacency[rows].toarray() * distance / k
+            displacement[rows] = np.einsum('ijk,ij->ik', delta, force)
+        length = np.maximum(np.linalg.norm(displacement, axis=-1), 0.01)
+        xy[movable] += displacement * (temperature / length)[:, None]
+        temperature -= cooling
+
+
+def food_web_figure(graph, pos, title='Food Web', label_limit=LABEL_LIMIT):
+    """It draws a food web as an interactive WebGL figure: the nodes, the edges and the arrowheads are three scattergl
+    traces of flat arrays, so graphs with thousands of nodes are panned, zoomed and hovered in the browser.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph
+        The food web, the edges go from prey to predator.
+    pos : dictionary
+        The position of each node, see warm_layout().
+    title : str, default: 'Food Web'
+        The title of the figure.
+    label_limit : int, default: LABEL_LIMIT
+        The node names are written next to the nodes only up to this number of nodes, they are always in the hover
+        text.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        The figure of the food web.
+
+    """
+    nodes = list(graph)
+    index = {node: i for i, node in enumerate(nodes)}
+    xy = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+    edges = np.array([(index[prey], index[predator]) for prey, predator in graph.edges()], dtype=int).reshape(-1, 2)
+    start, end = xy[edges[:, 0]], xy[edges[:, 1]]
+    # one polyline for all the edges, separated by NaN
+    lines = np.full((len(edges) * 3, 2), np.nan)
+    lines[0::3] = start
+    lines[1::3] = end
+    # the arrowheads point to the predator, before its marker; marker angles are clockwise from north
+    heads = start + (end - start) * ARROW_POSITION
+    angles = np.degrees(np.arctan2(end[:, 0] - start[:, 0], end[:, 1] - start[:, 1]))
+    prey_count = np.bincount(edges[:, 1], minlength=len(nodes))
+    predator_count = np.bincount(edges[:, 0], minlength=len(nodes))
+    hover = [f'{node}<br>prey: {n_prey}<br>predators: {n_predators}'
+             for node, n_prey, n_predators in zip(nodes, prey_count.tolist(), predator_count.tolist())]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=lines[:, 0], y=lines[:, 1], mode='lines', hoverinfo='skip', showlegend=False,
+                               line=dict(color='#888888', width=1)))
+    fig.add_trace(go.Scattergl(x=heads[:, 0], y=heads[:, 1], mode='markers', hoverinfo='skip', showlegend=False,
+                               marker=dict(symbol='triangle-up', size=10, angle=angles, color='#888888')))
+    fig.add_trace(go.Scattergl(x=xy[:, 0], y=xy[:, 1], mode='markers+text' if len(nodes) <= label_limit else 'markers',
+                               text=[str(node) for node in nodes], textposition='top center', hovertext=hover,
+                               hoverinfo='text', showlegend=False,
+                               marker=dict(size=18 if len(nodes) <= label_limit else 8, color='lightblue',
+                                           line=dict(color='#333333', width=1))))
+    # same scale on both axes, so the arrowheads follow the edges
+    fig.update_layout(title=title, height=600, dragmode='pan', plot_bgcolor='white',
+                      xaxis=dict(visible=False), yaxis=dict(visible=False, scaleanchor='x'),
+                      margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def cached_layout(state, graph, version):
+    """It returns the layout of a food web stored in a session state, computing it again only if the graph version
+    changed, warm-started from the stored one."""
+    layout = state.get('food_web_layout')
+    if layout is None or layout[0] != version:
+        layout = (version, warm_layout(graph, layout[1] if layout else None))
+        state['food_web_layout'] = layout
+    return layout[1]
+
+
+def cached_figure(state, graph, version):
+    """It returns the figure of a food web stored in a session state, drawing it again only if the graph version
+    changed."""
+    figure = state.get('food_web_figure')
+    if figure is None or figure[0] != version:
+        figure = (version, food_web_figure(graph, cached_layout(state, graph, version)))
+        state['food_web_figure'] = figure
+    return figure[1]
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""In-process rasterizer for the molecule icons.
+
+The icons produced by build_svg only contain a background rectangle, circles, round-capped lines and the shadow
+paths (arcs), so they can be drawn directly into a Pillow image instead of going through svglib, a PDF file and
+poppler. Shapes are drawn on a supersampled canvas and reduced with a box filter to get antialiased edges. The
+attributes of the compact icons written as CSS class rules in a <style> element are supported too.
+"""
+
+import math
+import re
+import xml.etree.ElementTree as ET
+from PIL import Image, ImageChops, ImageDraw
+
+# CSS convention, one user unit is one pixel at 96 dpi (the same scale used by svglib)
+CSS_DPI = 96
+# maximum number of sub-pixels drawn at once, large images are drawn in horizontal bands to bound the memory
+MAX_BAND_PIXELS = 1 << 24
+
+path_tokens = re.compile(r'([MmLlHhVvAaZz])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+transform_tokens = re.compile(r'(translate|scale)\(([^)]*)\)')
+class_rules = re.compile(r'\.([\w-]+)\s*\{([^}]*)\}')
+
+
+class UnsupportedSVG(ValueError):
+    """Raised when the SVG contains an element that the rasterizer cannot draw (e.g. emoji)."""
+
+
+def parse_transform(transform):
+    """It parses a transform attribute made of translate and scale functions.
+
+    Parameters
+    ----------
+    transform : str
+        The transform attribute, e.g. 'translate(10 20)'.
+
+    Returns
+    -------
+    tuple
+        The x-y translation and the x-y scale.
+
+    """
+    tx, ty, sx, sy = 0.0, 0.0, 1.0, 1.0
+    for func, args in transform_tokens.findall(transform or ''):
+        values = [float(v) for v in args.replace(',', ' ').split()]
+        if func == 'translate':
+            tx += values[0] * sx
+            ty += (values[1] if len(values) > 1 else 0.0) * sy
+        else:
+            sx *= values[0]
+            sy *= values[1] if len(values) > 1 else values[0]
+    return tx, ty, sx, sy
+
+
+def parse_classes(css):
+    """It parses the class rules of a style sheet, e.g. '.b{stroke:#979797;stroke-width:25}'.
+
+    Parameters
+    ----------
+    css : str
+        The text of the <style> element.
+
+    Returns
+    -------
+    dictionary
+        The properties (name -> value) of each class name.
+
+    """
+    classes = {}
+    for name, body in class_rules.findall(css or ''):
+        properties = classes.setdefault(name, {})
+        for declaration in body.split(';'):
+            key, _, value = declaration.partition(':')
+            if value.strip():
+                properties[key.strip()] = value.strip()
+    return classes
+
+
+def arc_points(start, rx, ry, phi, large_arc, sweep, end, segment_length=4.0):
+    """It converts an SVG elliptical arc from endpoint to center parameterization and samples points along it.
+    Based on https://www.w3.org/TR/SVG11/implnote.html#ArcImplementationNotes
+
+    Parameters
+    ----------
+    start : tuple
+        The x-y coordinates of the starting point.
+    rx : float
+        The x-radius of the ellipse.
+    ry : float
+        The y-radius of the ellipse.
+    phi : float
+        The rotation (in degree) of the ellipse x-axis.
+    large_arc : bool
+        The large-arc-flag.
+    sweep : bool
+        The sweep-flag.
+    end : tuple
+        The x-y coordinates of the ending point.
+    segment_length : float, default: 4.0
+        The approximate length of each sampled segment, in user units.
+
+    Returns
+    -------
+    list
+        The points of the arc, excluding the starting point.
+
+    """
+    (x1, y1), (x2, y2) = start, end
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0 or (x1 == x2 and y1 == y2):
+        return [end]
+    phi = math.radians(phi)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+    # scale up the radii if they are too small to join the points
+    lam = (x1p / rx) ** 2 + (y1p / ry) ** 2
+    if lam > 1:
+        rx, ry = rx * math.sqrt(lam), ry * math.sqrt(lam)
+    num = rx ** 2 * ry ** 2 - rx ** 2 * y1p ** 2 - ry ** 2 * x1p ** 2
+    den = rx ** 2 * y1p ** 2 + ry ** 2 * x1p ** 2
+    coef = math.sqrt(max(num, 0) / den)
+    if large_arc == sweep:
+        coef = -coef
+    cxp = coef * rx * y1p / ry
+    cyp = -coef * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2
+    theta = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    delta = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx) - theta
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    steps = max(8, int(abs(delta) * max(rx, ry) / segment_length))
+    points = []
+    for i in range(1, steps + 1):
+        angle = theta + delta * i / steps
+        ex, ey = rx * math.cos(angle), ry * math.sin(angle)
+        points.append((cos_phi * ex - sin_phi * ey + cx, sin_phi * ex + cos_phi * ey + cy))
+    return points
+
+
+def path_polygons(d, segment_length=4.0):
+    """It converts the d attribute of a path (M, L, H, V, A and Z commands) into a list of polygons.
+
+    Parameters
+    ----------
+    d : str
+        The path data.
+    segment_length : float, default: 4.0
+        The approximate length of each segment used to sample the arcs, in user units.
+
+    Returns
+    -------
+    list
+        A list of polygons, one for each sub-path, as lists of x-y tuples.
+
+    """
+    polygons = []
+    current = None
+    command = None
+    numbers = []
+    tokens = [(c, float(n) if n else None) for c, n in path_tokens.findall(d)]
+    tokens.append(('Z', None))  # sentinel to flush the last command
+    pos = (0.0, 0.0)
+    for cmd, value in tokens:
+        if value is not None:
+            numbers.append(value)
+            # consume the complete argument groups of the current command
+            arity = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'A': 7}.get(command.upper() if command else '', 0)
+            if arity and len(numbers) == arity:
+                rel = command.islower()
+                ox, oy = pos if rel else (0.0, 0.0)
+                upper = command.upper()
+                if upper == 'M':
+                    pos = (numbers[0] + ox, numbers[1] + oy)
+                    current = [pos]
+                    polygons.append(current)
+                    command = 'l' if rel else 'L'  # implicit lineto after moveto
+                elif upper == 'L':
+                    pos = (numbers[0] + ox, numbers[1] + oy)
+                    current.append(pos)
+                elif upper == 'H':
+                    pos = (numbers[0] + ox, pos[1])
+                    current.append(pos)
+                elif upper == 'V':
+                    pos = (pos[0], numbers[0] + (pos[1] if rel else 0.0))
+                    current.append(pos)
+                else:
+                    end = (numbers[5] + ox, numbers[6] + oy)
+                    current.extend(arc_points(pos, numbers[0], numbers[1], numbers[2], bool(numbers[3]),
+                                              bool(numbers[4]), end, segment_length))
+                    pos = end
+                numbers = []
+            continue
+        if cmd in 'Zz':
+            if current:
+                pos = current[0]
+            command = None
+        else:
+            command = cmd
+        numbers = []
+    return [polygon for polygon in polygons if len(polygon) > 2]
+
+
+class _Canvas:
+    """Supersampled Pillow canvas mapping user units to the pixels of the current horizontal band."""
+
+    def __init__(self, view_box, width, height, supersample, background):
+        self.x0, self.y0, self.view_w, self.view_h = view_box
+        self.width = width
+        self.supersample = supersample
+        self.scale_x = width * supersample / self.view_w
+        self.scale_y = height * supersample / self.view_h
+        self.background = background
+        self.defs = {}
+        self.classes = {}  # CSS class name -> properties
+        self.polygons = {}  # path element id -> polygons in user units, shared by the bands
+        self.top = 0
+        self.image = None
+        self.draw = None
+
+    def band(self, top, rows):
+        """Start drawing the band of image rows [top, top + rows) and return its supersampled image."""
+        self.top = top * self.supersample
+        self.image = Image.new('RGB', (self.width * self.supersample, rows * self.supersample), self.background)
+        self.draw = ImageDraw.Draw(self.image)
+        return self.image
+
+    def px(self, x, y):
+        return (x - self.x0) * self.scale_x, (y - self.y0) * self.scale_y - self.top
+
+    def attribute(self, elem, name, default=None):
+        """Return an attribute of an element, or the property of its CSS classes."""
+        value = elem.get(name)
+        if value is None:
+            for class_name in elem.get('class', '').split():
+                value = self.classes.get(class_name, {}).get(name, value)
+        return default if value is None else value
+
+    def disc(self, x, y, radius, color):
+        """Draw a filled disc centered in the pixel coordinates x-y, with the radius in user units."""
+        if radius <= 0:
+            return
+        rx, ry = radius * self.scale_x, radius * self.scale_y
+        self.draw.ellipse((x - rx, y - ry, x + rx, y + ry), fill=color)
+
+    def circle(self, elem, tx, ty):
+        cx = float(elem.get('cx', 0)) + tx
+        cy = float(elem.get('cy', 0)) + ty
+        radius = float(elem.get('r', 0))
+        fill = self.attribute(elem, 'fill', '#000000')
+        stroke = self.attribute(elem, 'stroke')
+        stroke_width = float(self.attribute(elem, 'stroke-width', 1)) if stroke else 0
+        if stroke and stroke != 'none' and stroke_width > 0:
+            # the stroke is centered on the circumference: draw the outer disc, then the fill on top
+            self.disc(*self.px(cx, cy), radius + stroke_width / 2, stroke)
+            radius -= stroke_width / 2
+        if fill != 'none':
+            self.disc(*self.px(cx, cy), radius, fill)
+
+    def line(self, elem, tx, ty):
+        color = self.attribute(elem, 'stroke')
+        width = float(self.attribute(elem, 'stroke-width', 1))
+        if not color or color == 'none' or width <= 0:
+            return
+        p = self.px(float(elem.get('x1', 0)) + tx, float(elem.get('y1', 0)) + ty)
+        q = self.px(float(elem.get('x2', 0)) + tx, float(elem.get('y2', 0)) + ty)
+        self.draw.line((p, q), fill=color, width=max(1, round(width * self.scale_x)))
+        if self.attribute(elem, 'stroke-linecap') == 'round':
+            for x, y in (p, q):
+                self.disc(x, y, width / 2, color)
+
+    def path(self, elem, tx, ty):
+        fill = self.attribute(elem, 'fill', '#000000')
+        if fill == 'none':
+            return
+        if id(elem) not in self.polygons:
+            # arcs are sampled every output pixel, the polygons are shared by every band and every use
+            polygons = path_polygons(elem.get('d', ''), segment_length=self.supersample / self.scale_x)
+            ys = [y for polygon in polygons for _, y in polygon]
+            self.polygons[id(elem)] = (polygons, min(ys, default=0), max(ys, default=0))
+        polygons, y_min, y_max = self.polygons[id(elem)]
+        # skip the paths outside the current band
+        if not polygons or self.px(0, y_max + ty)[1] < 0 or self.px(0, y_min + ty)[1] > self.image.height:
+            return
+        polygons = [[self.px(x + tx, y + ty) for x, y in polygon] for polygon in polygons]
+        if len(polygons) == 1:
+            self.draw.polygon(polygons[0], fill=fill)
+            return
+        # combine the sub-paths with the even-odd rule on a mask restricted to the bounding box
+        xs = [x for polygon in polygons for x, _ in polygon]
+        ys = [y for polygon in polygons for _, y in polygon]
+        left, top = max(int(min(xs)), 0), max(int(min(ys)), 0)
+        right = min(int(math.ceil(max(xs))) + 1, self.image.width)
+        bottom = min(int(math.ceil(max(ys))) + 1, self.image.height)
+        if right <= left or bottom <= top:
+            return
+        mask = None
+        for polygon in polygons:
+            sub = Image.new('1', (right - left, bottom - top), 0)
+            ImageDraw.Draw(sub).polygon([(x - left, y - top) for x, y in polygon], fill=1)
+            mask = sub if mask is None else ImageChops.logical_xor(mask, sub)
+        self.image.paste(fill, (left, top, right, bottom), mask)
+
+    def rect(self, elem, tx, ty):
+        fill = self.attribute(elem, 'fill', '#000000')
+        if fill == 'none':
+            return
+        x = float(elem.get('x', 0)) + tx
+        y = float(elem.get('y', 0)) + ty
+
+        def length(value, full):
+            value = str(value)
+            return float(value[:-1]) / 100 * full if value.endswith('%') else float(value)
+
+        p = self.px(x, y)
+        q = self.px(x + length(elem.get('width', 0), self.view_w), y + length(elem.get('height', 0), self.view_h))
+        self.draw.rectangle((p, q), fill=fill)
+
+    def element(self, elem, tx=0.0, ty=0.0):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if tag == 'defs':
+            for child in elem:
+                if child.get('id'):
+                    self.defs[child.get('id')] = child
+            return
+        if tag == 'style':
+            self.classes.update(parse_classes(elem.text))
+            return
+        if elem.get('transform'):
+            dx, dy, sx, sy = parse_transform(elem.get('transform'))
+            if sx != 1 or sy != 1:
+                raise UnsupportedSVG('Scaled elements are not supported by the rasterizer')
+            tx, ty = tx + dx, ty + dy
+        if tag == 'use':
+            href = elem.get('href') or elem.get('xlink:href') or elem.get('{http://www.w3.org/1999/xlink}href')
+            self.element(self.defs[href.lstrip('#')], tx, ty)
+        elif tag == 'g':
+            for child in elem:
+                self.element(child, tx, ty)
+        elif tag in ('circle', 'line', 'path', 'rect'):
+            getattr(self, tag)(elem, tx, ty)
+        else:
+            raise UnsupportedSVG(f'The element <{tag}> is not supported by the rasterizer')
+
+
+def rasterize_svg(svg, dpi=200, width=None, background='#ffffff', supersample=3):
+    """It draws an icon produced by build_svg into an in-memory RGB image, without files or external programs.
+
+    Parameters
+    ----------
+    svg : bytes, str or xml.etree.ElementTree.Element
+        The svg text of an icon produced by build_svg, or its parsed root element.
+    dpi : float, default: 200
+        The resolution of the image. One user unit of the SVG is one pixel at 96 dpi.
+    width : int, optional
+        The width of the image in pixels. If set, it overrides dpi.
+    background : str, default: '#ffffff'
+        The color under the icon (the icon background rectangle is drawn on top of it).
+    supersample : int, default: 3
+        The number of sub-pixels per pixel side used for antialiasing.
+
+    Returns
+    -------
+    PIL.Image.Image
+        The RGB image of the icon.
+
+    """
+    if isinstance(svg, (bytes, str)):
+        svg = ET.fromstring(svg)
+    view_box = [float(v) for v in svg.get('viewBox').split()]
+    if width is None:
+        width = max(1, round(view_box[2] * dpi / CSS_DPI))
+    height = max(1, round(width * view_box[3] / view_box[2]))
+    supersample = max(1, int(supersample))
+    canvas = _Canvas(view_box, width, height, supersample, background)
+    image = Image.new('RGB', (width, height), background)
+    rows = max(1, MAX_BAND_PIXELS // (width * supersample ** 2))
+    for top in range(0, height, rows):
+        band = canvas.band(top, min(rows, height - top))
+        for elem in svg:
+            canvas.element(elem)
+        image.paste(band.reduce(supersample) if supersample > 1 else band, (0, top))
+    return image
@@ -0,0 +1,291 @@
+"""Time-resolved kinetics of the chemosynthesis pathways, for batches of scenarios.
+
+Each pathway is a balanced Reaction (see stoichiometry) run by microbes with Monod kinetics:
+
+    rate = k(T) * biomass * prod(C / (K + C))   over the dissolved substrates
+    dC/dt = coefficient * rate                   (negative for the reactants)
+    dbiomass/dt = growth_yield * rate - decay(T) * biomass
+
+with Arrhenius temperature dependence of k and of the decay. The scenarios of a batch (temperature, substrate
+concentrations, microbe density) are integrated in groups of GROUP_SCENARIOS scenarios with similar time scales, each
+group as one block-diagonal system with a single solve_ivp call: the right-hand side is evaluated for the whole group
+with one NumPy expression per step, and the analytic Jacobian is given to the solver in banded (LSODA) or sparse (BDF,
+Radau) form, so its cost grows linearly with the number of scenarios. Concentrations are in mM, the biomass in mg/L
+and the time in hours.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import solve_ivp
+
+from stoichiometry import Reaction
+
+GAS_CONSTANT = 8.314  # J/(mol K)
+REFERENCE_TEMPERATURE = 298.15  # K
+# number of memoized simulation batches
+CACHE_ENTRIES = 32
+# number of scenarios integrated together, see KineticModel.simulate()
+GROUP_SCENARIOS = 32
+
+# kinetic parameters of each pathway: maximum rate at 25 °C (mM of reaction per hour and per mg/L of biomass),
+# activation energy (J/mol), half-saturation constant of the substrates (mM), biomass yield (mg/L per mM of
+# reaction) and decay rate of the biomass at 25 °C (1/h). Illustrative values of the order of the ones measured for
+# vent and seep microbes.
+PathwayKinetics = namedtuple('PathwayKinetics', 'rate activation_energy half_saturation growth_yield decay')
+PATHWAY_KINETICS = {
+    'H₂S oxidation': PathwayKinetics(0.02, 60000, 0.5, 2.0, 0.01),
+    'Methane oxidation': PathwayKinetics(0.05, 70000, 0.2, 8.0, 0.01),
+    'Ammonia oxidation': PathwayKinetics(0.04, 65000, 0.3, 1.5, 0.005),
+    'Hydrogen oxidation': PathwayKinetics(0.10, 55000, 0.1, 4.0, 0.01),
+}
+
+# dissolved species whose concentration limits the rate, the other reactants (water, protons...) are in excess
+SUBSTRATES = frozenset(('H2S', 'CO2', 'CH4', 'O2', 'NH3', 'H2'))
+
+
+class KineticModel:
+    """Monod kinetics of one pathway, see the module description.
+
+    Parameters
+    ----------
+    reaction : Reaction or str
+        The balanced reaction, or its equation.
+    kinetics : PathwayKinetics
+        The kinetic parameters.
+
+    """
+
+    def __init__(self, reaction, kinetics):
+        self.reaction = Reaction.parse(reaction) if isinstance(reaction, str) else reaction
+        self.kinetics = kinetics
+        self.species = self.reaction.species
+        self.stoichiometry = self.reaction.stoichiometric_vector()
+        self.substrates = np.array([i for i, formula in enumerate(self.reaction.reactants) if formula in SUBSTRATES],
+                                   dtype=int)
+
+    def arrhenius(self, temperature):
+        """Return the factor of the rates at a temperature in °C, relative to 25 °C."""
+        kelvin = np.asarray(temperature, dtype=float) + 273.15
+        return np.exp(-self.kinetics.activation_energy / GAS_CONSTANT * (1 / kelvin - 1 / REFERENCE_TEMPERATURE))
+
+    def simulate(self, temperatures, concentrations, biomass, t_end=48.0, n_points=97, method='LSODA'):
+        """It integrates a batch of scenarios, in groups of similar scenarios, see the module description.
+
+        Parameters
+        ----------
+        temperatures : array-like
+            The temperature of each scenario, in °C. Shape (n_scenarios,).
+        concentrations : array-like
+            The initial concentration of each species of the reaction, in mM. Shape (n_scenarios, n_species).
+        biomass : array-like
+            The initial microbe density of each scenario, in mg/L. Shape (n_scenarios,).
+        t_end : float, default: 48.0
+            The simulated time, in hours.
+        n_points : int, default: 97
+            The number of time points of the results.
+        method : str, default: 'LSODA'
+            The solve_ivp method: LSODA (switching to BDF when the batch gets stiff) with the banded analytic Jacobian,
+            or BDF and Radau with the sparse one. The other methods do not use a Jacobian.
+
+        Returns
+        -------
+        dictionary
+            'time': shape (n_points,); 'concentrations': shape (n_scenarios, n_species, n_points); 'biomass': shape
+            (n_scenarios, n_points); 'rate': the reaction rate, shape (n_scenarios, n_points).
+
+        Raises
+        ------
+        RuntimeError
+            If the integration fails.
+
+        """
+        factor = self.arrhenius(temperatures)
+        concentrations = np.asarray(concentrations, dtype=float)
+        biomass = np.asarray(biomass, dtype=float)
+        n_scenarios, n_species = concentrations.shape
+        time = np.linspace(0, t_end, n_points)
+        states = np.empty((n_scenarios, n_species + 1, n_points))
+        # the scenarios integrated together share the step sizes: grouping the ones with similar time scales (rate
+        # factor times biomass) keeps the fast ones from slowing down the slow ones
+        order = np.argsort(factor * biomass, kind='stable')
+        for start in range(0, n_scenarios, GROUP_SCENARIOS):
+            group = order[start:start + GROUP_SCENARIOS]
+            states[group] = self._integrate(factor[group], concentrations[group], biomass[group], time, method)
+        rate = self._rates(np.moveaxis(states, 1, 2), factor[:, None])
+        return {'time': time, 'concentrations': states[:, :-1], 'biomass': states[:, -1], 'rate': rate}
+
+    def _rates(self, state, factor):
+        # state: the species then the biomass on the last axis
+        kinetics = self.kinetics
+        substrate = np.clip(state[..., self.substrates], 0, None)
+        monod = np.prod(substrate / (kinetics.half_saturation + substrate), axis=-1)
+        return kinetics.rate * factor * np.clip(state[..., -1], 0, None) * monod
+
+    def _integrate(self, factor, concentrations, biomass, time, method):
+        """Integrate a group of scenarios as one block-diagonal system, return their states, shape (n_scenarios,
+        n_species + 1, n_points)."""
+        n_scenarios, n_species = concentrations.shape
+        width = n_species + 1  # the species, then the biomass
+        kinetics = self.kinetics
+        stoichiometry = self.stoichiometry
+
+        def derivative(_, y):
+            state = y.reshape(n_scenarios, width)
+            rate = self._rates(state, factor)
+            change = np.empty_like(state)
+            change[:, :-1] = rate[:, None] * stoichiometry
+            change[:, -1] = kinetics.growth_yield * rate - kinetics.decay * factor * state[:, -1]
+            return change.ravel()
+
+        # the Jacobian is block diagonal, one dense width x width block for each scenario
+        columns = np.arange(n_scenarios)[:, None, None] * width + np.arange(width)
+        indices = np.broadcast_to(columns, (n_scenarios, width, width)).ravel()
+        indptr = np.arange(0, n_scenarios * width * width + 1, width)
+        # derivative of every variable with respect to the rate
+        response = np.append(stoichiometry, kinetics.growth_yield)
+
+        # a block spans width - 1 diagonals above and below the main one
+        band = width - 1
+        band_rows = np.broadcast_to(band + np.arange(width)[:, None] - np.arange(width), (n_scenarios, width, width))
+        band_columns = np.broadcast_to(columns, (n_scenarios, width, width))
+
+        def jacobian_blocks(y):
+            state = y.reshape(n_scenarios, width)
+            substrate = np.clip(state[:, self.substrates], 0, None)
+            saturation = substrate / (kinetics.half_saturation + substrate)
+            capacity = kinetics.rate * factor * np.clip(state[:, -1], 0, None)
+            gradient = np.zeros((n_scenarios, width))  # of the rate
+            for column, i in enumerate(self.substrates):
+                others = np.prod(np.delete(saturation, column, axis=1), axis=1)
+                slope = kinetics.half_saturation / (kinetics.half_saturation + substrate[:, column]) ** 2
+                gradient[:, i] = capacity * others * np.where(state[:, i] > 0, slope, 0)
+            gradient[:, -1] = np.where(state[:, -1] > 0, kinetics.rate * factor * np.prod(saturation, axis=1), 0)
+            blocks = response[None, :, None] * gradient[:, None, :]
+            blocks[:, -1, -1] -= kinetics.decay * factor
+            return blocks
+
+        def jacobian(_, y):
+            return sparse.csr_array((jacobian_blocks(y).ravel(), indices, indptr), shape=(len(y), len(y)))
+
+        def banded_jacobian(_, y):
+            # LSODA banded storage: element (i, j) in row band + i - j, column j
+            banded = np.zeros((2 * band + 1, len(y)))
+            banded[band_rows, band_columns] = jacobian_blocks(y)
+            return banded
+
+        y0 = np.column_stack((concentrations, biomass)).ravel()
+        if method == 'LSODA':
+            options = {'jac': banded_jacobian, 'lband': band, 'uband': band}
+        elif method in ('BDF', 'Radau'):
+            options = {'jac': jacobian}
+        else:
+            options = {}
+        solution = solve_ivp(derivative, (0, time[-1]), y0, method=method, t_eval=time, rtol=1e-6, atol=1e-9,
+                             **options)
+        if not solution.success:
+            raise RuntimeError(f'Kinetic simulation failed: {solution.message}')
+        return solution.y.reshape(n_scenarios, width, len(time))
+
+
+def half_life(result, index):
+    """It returns, for each scenario, the time at which the concentration of a species falls to half of its initial
+    value (NaN if it does not), interpolated between the time points."""
+    time = result['time']
+    values = result['concentrations'][:, index]
+    below = values <= values[:, :1] / 2
+    first = np.argmax(below, axis=1)
+    reached = below.any(axis=1) & (values[:, 0] > 0)
+    previous = np.maximum(first - 1, 0)
+    rows = np.arange(len(values))
+    before, after = values[rows, previous], values[rows, first]
+    target = values[:, 0] / 2
+    weight = np.divide(before - target, before - after, out=np.zeros(len(values)), where=before != after)
+    return np.where(reached, time[previous] + weight * (time[first] - time[previous]), np.nan)
+
+
+_results = OrderedDict()  # batch key -> read-only result
+_pending = {}  # batch key -> Future of the running simulation
+_wanted = {}  # batch key -> channels waiting for the pending batch (None for the callers without channel)
+_latest = {}  # channel -> key of the pending batch it last asked for
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kinetics')
+
+
+def batch_key(equation, pathway, temperatures, concentrations, biomass, t_end, n_points):
+    """Return the hashable key of a simulation batch."""
+    return (equation, pathway, tuple(np.asarray(temperatures, dtype=float).tolist()),
+            tuple(map(tuple, np.asarray(concentrations, dtype=float).tolist())),
+            tuple(np.asarray(biomass, dtype=float).tolist()), float(t_end), int(n_points))
+
+
+def _release(key):
+    # the batch is done or dropped, its channels are no longer waiting for it
+    for channel in _wanted.pop(key, ()):
+        if _latest.get(channel) == key:
+            del _latest[channel]
+
+
+def _run(key):
+    equation, pathway, temperatures, concentrations, biomass, t_end, n_points = key
+    try:
+        result = KineticModel(equation, PATHWAY_KINETICS[pathway]).simulate(temperatures, concentrations, biomass,
+                                                                              t_end, n_points)
+    except Exception:
+        with _lock:
+            del _pending[key]  # the failure is not memoized, the batch can be retried
+            _release(key)
+        raise
+    for array in result.values():
+        array.flags.writeable = False  # shared by every caller
+    with _lock:
+        _results[key] = result
+        while len(_results) > CACHE_ENTRIES:
+            _results.popitem(last=False)
+        del _pending[key]
+        _release(key)
+    return result
+
+
+def simulate_batch(equation, pathway, temperatures, concentrations, biomass, t_end=48.0, n_points=97,
+                   channel=None):
+    """It starts, or joins, the simulation of a batch of scenarios in a background thread, see
+    KineticModel.simulate(). The results of the last CACHE_ENTRIES batches are memoized.
+
+    A channel (e.g. the id of a user session) only waits for its last batch: the batch it asked for before is
+    cancelled if it has not started yet and no other caller waits for it, so quick changes of the parameters do not
+    queue batches that nobody will look at.
+
+    Parameters
+    ----------
+    channel : hashable, optional
+        The caller asking for the batch, see above. The batches asked without channel are never cancelled.
+
+    Returns
+    -------
+    concurrent.futures.Future
+        The future of the result, already done for a memoized batch. The result arrays are read-only.
+
+    """
+    key = batch_key(equation, pathway, temperatures, concentrations, biomass, t_end, n_points)
+    with _lock:
+        previous = _latest.pop(channel, None) if channel is not None else None
+        if previous is not None and previous != key and previous in _wanted:
+            _wanted[previous].discard(channel)
+            if not _wanted[previous] and _pending[previous].cancel():
+                del _pending[previous]
+                _release(previous)
+        if key in _results:
+            _results.move_to_end(key)
+            done = Future()
+            done.set_result(_results[key])
+            return done
+        if key not in _pending:
+            _pending[key] = _executor.submit(_run, key)
+        _wanted.setdefault(key, set()).add(channel)
+        if channel is not None:
+            _latest[channel] = key
+        return _pending[key]
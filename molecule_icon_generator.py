@@ -1,984 +1,1893 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-__author__ = "Luca Monari"
-__credits__ = ["Luca Monari"]
-__version__ = "1.0"
-__email__ = "luca.monari@etu.unistra.fr"
-
-import numpy as np
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPDF
-from pdf2image import convert_from_path  # require poppler
-import rdkit
-from rdkit import Chem
-from rdkit.Chem import AllChem
-from rdkit.Chem.Draw import rdMolDraw2D
-from rdkit.Chem import rdCoordGen
-from rdkit.Chem import rdDepictor
-import math
-from scipy.spatial.transform import Rotation as Rot
-from scipy.linalg import norm
-import plotly.graph_objects as go
-import argparse
-import os
-import colorsys
-import warnings
-import requests
-from io import BytesIO
-import xml.etree.ElementTree as ET
-
-# brute force approach to avoid decompression bomb warning by pdf2image and PIL
-from PIL import Image
-Image.MAX_IMAGE_PIXELS = None
-warnings.filterwarnings("ignore")
-warnings.simplefilter('ignore', Image.DecompressionBombWarning)
-
-
-# dictionary containing the default colour for each atom, according to CPK colour convention
-color_map = {"H": "#FFFFFF", "D": "#FFFFC0", "T": "#FFFFA0", "He": "#D9FFFF", "Li": "#CC80FF", "Be": "#C2FF00",
-             "B": "#FFB5B5", "C": "#909090", "C-13": "#505050", "C-14": "#404040", "N": "#3050F8", "N-15": "#105050",
-             "O": "#FF0D0D", "F": "#90E050", "Ne": "#B3E3F5", "Na": "#AB5CF2", "Mg": "#8AFF00", "Al": "#BFA6A6",
-             "Si": "#F0C8A0", "P": "#FF8000", "S": "#FFFF30", "Cl": "#1FF01F", "Ar": "#80D1E3", "K": "#8F40D4",
-             "Ca": "#3DFF00", "Sc": "#E6E6E6", "Ti": "#BFC2C7", "V": "#A6A6AB", "Cr": "#8A99C7", "Mn": "#9C7AC7",
-             "Fe": "#E06633", "Co": "#F090A0", "Ni": "#50D050", "Cu": "#C88033", "Zn": "#7D80B0", "Ga": "#C28F8F",
-             "Ge": "#668F8F", "As": "#BD80E3", "Se": "#FFA100", "Br": "#A62929", "Kr": "#5CB8D1", "Rb": "#702EB0",
-             "Sr": "#00FF00", "Y": "#94FFFF", "Zr": "#94E0E0", "Nb": "#73C2C9", "Mo": "#54B5B5", "Tc": "#3B9E9E",
-             "Ru": "#248F8F", "Rh": "#0A7D8C", "Pd": "#006985", "Ag": "#C0C0C0", "Cd": "#FFD98F", "In": "#A67573",
-             "Sn": "#668080", "Sb": "#9E63B5", "Te": "#D47A00", "I": "#940094", "Xe": "#429EB0", "Cs": "#57178F",
-             "Ba": "#00C900", "La": "#70D4FF", "Ce": "#FFFFC7", "Pr": "#D9FFC7", "Nd": "#C7FFC7", "Pm": "#A3FFC7",
-             "Sm": "#8FFFC7", "Eu": "#61FFC7", "Gd": "#45FFC7", "Tb": "#30FFC7", "Dy": "#1FFFC7", "Ho": "#00FF9C",
-             "Er": "#00E675", "Tm": "#00D452", "Yb": "#00BF38", "Lu": "#00AB24", "Hf": "#4DC2FF", "Ta": "#4DA6FF",
-             "W": "#2194D6", "Re": "#267DAB", "Os": "#266696", "Ir": "#175487", "Pt": "#D0D0E0", "Au": "#FFD123",
-             "Hg": "#B8B8D0", "Tl": "#A6544D", "Pb": "#575961", "Bi": "#9E4FB5", "Po": "#AB5C00", "At": "#754F45",
-             "Rn": "#428296", "Fr": "#420066", "Ra": "#007D00", "Ac": "#70ABFA", "Th": "#00BAFF", "Pa": "#00A1FF",
-             "U": "#008FFF", "Np": "#0080FF", "Pu": "#006BFF", "Am": "#545CF2", "Cm": "#785CE3", "Bk": "#8A4FE3",
-             "Cf": "#A136D4", "Es": "#B31FD4", "Fm": "#B31FBA", "Md": "#B30DA6", "No": "#BD0D87", "Lr": "#C70066",
-             "Rf": "#CC0059", "Db": "#D1004F", "Sg": "#D90045", "Bh": "#E00038", "Hs": "#E6002E", "Mt": "#EB0026",
-             'other': '#f5c2cb', 'Bond': '#979797', 'Background': "#ffffff", 'All icon': "#000000", 'All atoms': "#000000"}
-
-# dictionary containing the value to multiply to the final radius of each atom
-atom_resize = {'All atoms': 1.0, 'H': 1.0, 'D': 1.0, 'T': 1.0, 'He': 1.0, 'Li': 1.0, 'Be': 1.0, 'B': 1.0, 'C': 1.0,
-               'C-13': 1.0, 'C-14': 1.0, 'N': 1.0, 'N-15': 1.0, 'O': 1.0, 'F': 1.0, 'Ne': 1.0, 'Na': 1.0, 'Mg': 1.0,
-               'Al': 1.0, 'Si': 1.0, 'P': 1.0, 'S': 1.0, 'Cl': 1.0, 'Ar': 1.0, 'K': 1.0, 'Ca': 1.0, 'Sc': 1.0,
-               'Ti': 1.0, 'V': 1.0, 'Cr': 1.0, 'Mn': 1.0, 'Fe': 1.0, 'Co': 1.0, 'Ni': 1.0, 'Cu': 1.0, 'Zn': 1.0,
-               'Ga': 1.0, 'Ge': 1.0, 'As': 1.0, 'Se': 1.0, 'Br': 1.0, 'Kr': 1.0, 'Rb': 1.0, 'Sr': 1.0, 'Y': 1.0,
-               'Zr': 1.0, 'Nb': 1.0, 'Mo': 1.0, 'Tc': 1.0, 'Ru': 1.0, 'Rh': 1.0, 'Pd': 1.0, 'Ag': 1.0, 'Cd': 1.0,
-               'In': 1.0, 'Sn': 1.0, 'Sb': 1.0, 'Te': 1.0, 'I': 1.0, 'Xe': 1.0, 'Cs': 1.0, 'Ba': 1.0, 'La': 1.0,
-               'Ce': 1.0, 'Pr': 1.0, 'Nd': 1.0, 'Pm': 1.0, 'Sm': 1.0, 'Eu': 1.0, 'Gd': 1.0, 'Tb': 1.0, 'Dy': 1.0,
-               'Ho': 1.0, 'Er': 1.0, 'Tm': 1.0, 'Yb': 1.0, 'Lu': 1.0, 'Hf': 1.0, 'Ta': 1.0, 'W': 1.0, 'Re': 1.0,
-               'Os': 1.0, 'Ir': 1.0, 'Pt': 1.0, 'Au': 1.0, 'Hg': 1.0, 'Tl': 1.0, 'Pb': 1.0, 'Bi': 1.0, 'Po': 1.0,
-               'At': 1.0, 'Rn': 1.0, 'Fr': 1.0, 'Ra': 1.0, 'Ac': 1.0, 'Th': 1.0, 'Pa': 1.0, 'U': 1.0, 'Np': 1.0,
-               'Pu': 1.0, 'Am': 1.0, 'Cm': 1.0, 'Bk': 1.0, 'Cf': 1.0, 'Es': 1.0, 'Fm': 1.0, 'Md': 1.0, 'No': 1.0,
-               'Lr': 1.0, 'Rf': 1.0, 'Db': 1.0, 'Sg': 1.0, 'Bh': 1.0, 'Hs': 1.0, 'Mt': 1.0, 'other': 1.0,
-               'Bond': 1.0, 'Bond spacing': 1.0, 'Outline': 1.0}
-
-# period table of emoji from the emoji-chem repository (https://github.com/whitead/emoji-chem), thanks to Andrew White
-emoji_periodic_table = {'H': '2B50', 'He': '1F388', 'Li': '1F50B', 'Be': '1F6F0', 'B': '1F939-200D-2640-FE0F',
-                        'C': '26FD', 'N': '1FAB4', 'O': '1F525', 'F': '1FAA5', 'Ne': '1F383', 'Na': '1F35F',
-                        'Mg': '1F4A5', 'Al': '2708', 'Si': '1F5A5', 'P': '1F30B', 'S': '1F637', 'Cl': '1F922',
-                        'Ar': '1F47B', 'K': '1F34C', 'Ca': '1F95B', 'Sc': '1F6B2', 'Ti': '1F6F3', 'V': '1F3A8',
-                        'Cr': '1F36D', 'Mn': '1F356', 'Fe': '1F953', 'Co': '1F4FC', 'Ni': '1F374', 'Cu': '1F949',
-                        'Zn': '1F5DD', 'Ga': '1F944', 'Ge': '1F37A', 'As': '1F480', 'Se': '1F485',
-                        'Br': '1F95C', 'Kr': '1F52B', 'Rb': '1F6A8', 'Sr': '1F387', 'Y': '1F4FA', 'Zr': '1F680',
-                        'Nb': '1F3AD', 'Mo': '26D3', 'Tc': '2699', 'Ru': '1F984', 'Rh': '1F6E3', 'Pd': '2697',
-                        'Ag': '1F948', 'Cd': '1F3ED', 'In': '1F4F1', 'Sn': '1F916', 'Sb': '1F441', 'Te': '1F30C',
-                        'I': '1F41F', 'Xe': '1F52E', 'Cs': '23F1', 'Ba': '1F48A', 'La': '269C', 'Ce': '1F69B',
-                        'Pr': '1F465', 'Nd': '1F377', 'Pm': '1F6AC', 'Sm': '1F489', 'Eu': '1F1EA', 'Gd': '1F3B0',
-                        'Tb': '1F433', 'Dy': '1F484', 'Ho': '1F306', 'Er': '1F62C', 'Tm': '1F352', 'Yb': '1F315',
-                        'Lu': '1F90D', 'Hf': '1F4F8', 'Ta': '1F50D', 'W': '1F48E', 'Re': '1F4BB', 'Os': '1F58B',
-                        'Ir': '2604', 'Pt': '1F4B0', 'Au': '1F947', 'Hg': '1F321', 'Tl': '1F400', 'Pb': '1F6B0',
-                        'Bi': '1F308', 'Po': '1F985', 'At': '26A1', 'Rn': '1F32A', 'Fr': '1F950',
-                        'Ra': '231A', 'Ac': '1F300', 'Th': '26C8', 'Pa': '1F469-200D-1F680', 'U': '2622',
-                        'Np': '1F531', 'Pu': '1F4A3', 'Am': '1F30E', 'Cm': '1F469-200D-1F52C', 'Bk': '1F393',
-                        'Cf': '1F31E', 'Es': '1F43C', 'Fm': '1F4AF', 'Md': '1F647', 'No': '1F3C5', 'Lr': '1F501',
-                        'Rf': '1F5FA', 'Db': '1F914', 'Sg': '1F30A', 'Bh': '269B', 'Hs': '2696', 'Mt': '1F483',
-                        'Ds': '1F3F0', 'Rg': '1FA7B', 'Cn': '1F4AB', 'Nh': '1F5FE', 'Fl': '1F4DD', 'Mc': '1F3C7',
-                        'Lv': '1F4A1', 'Ts': '1F345', 'Og': '1F95D'}
-
-# A dictionary with the unicode of the emoji as key and the emoji dimension as values.
-emoji_dims = {}
-
-
-def hex_to_rgb(color):
-    """It takes a hexadecimal color string and returns a rgb tuple.
-
-    Parameters
-    ----------
-    color : string
-        The hexadecimal color code, it starts with a '#'.
-
-    Returns
-    -------
-    tuple
-        the RGB values of the hexadecimal color code.
-
-    """
-    r = int(color[1:3], 16)
-    g = int(color[3:5], 16)
-    b = int(color[5:], 16)
-    return r, g, b
-
-
-def rgb_to_hex(color):
-    """It takes the rgb tuple and returns the hexadecimal string of the color.
-    Based on https://stackoverflow.com/questions/3380726/converting-an-rgb-color-tuple-to-a-hexidecimal-string
-
-    Parameters
-    ----------
-    color : tuple
-        a tuple of three integers, each between 0 and 255, representing the rgb values.
-
-    Returns
-    -------
-    string
-        The hexadecimal color code, it starts with a '#'.
-
-    """
-    int_color = tuple([int(x) for x in color])
-    return '#%02x%02x%02x' % int_color
-
-
-def shadow_color_correction(color, light_multiplier):
-    """Given a color and a light multiplier, return the hexadecimal color code with the corrected light.
-
-    Parameters
-    ----------
-    color : tuple
-        The rgb color tuple.
-    light_multiplier : float
-        The value to multiply to decrease the light.
-
-    Returns
-    -------
-    string
-        The hexadecimal color code, it starts with a '#'.
-
-    """
-    r, g, b = hex_to_rgb(color)
-    h, l, s = colorsys.rgb_to_hls(r, g, b)
-    rgb = colorsys.hls_to_rgb(h, l * light_multiplier, s)
-    return rgb_to_hex(rgb)
-
-
-def position_map(mol, conf, rotation=(0, 0, 0)):
-    """This function takes a mol object, the conformation, the position multiplier and the image dimension and calculate
-    the corrected positions for the image.
-
-    Parameters
-    ----------
-    mol : Mol rdkit object
-        The rdkit mol object representing a molecule.
-    conf : Conformer rdkit object
-        The conformation of the
-    rotation : tuple, default: (0,0,0)
-        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the molecule.
-
-    Returns
-    -------
-    dictionary
-        A dictionary in which the keys are the atom indexes and the values are the corrected positions of the atoms.
-    dimension
-        The half dimension of the image.
-
-    """
-    rotate = Rot.from_euler('xyz', rotation, degrees=True)
-    pos_dict = dict()
-    max_pos_set = set()
-    for i in range(mol.GetNumAtoms()):
-        # add dimension to center with respect to the center of the blank image
-        pos = conf.GetAtomPosition(i)
-        new_pos = rotate.apply((pos.x, pos.y, pos.z))
-        pos_dict[i] = new_pos
-        max_pos_set.add(max(abs(new_pos[:2])))
-    bond_map = {atom_idx: set() for atom_idx in pos_dict}
-    for bond in mol.GetBonds():
-        bond_idx = bond.GetIdx()
-        bond_map[bond.GetBeginAtomIdx()].add(bond_idx)
-        bond_map[bond.GetEndAtomIdx()].add(bond_idx)
-    return pos_dict, max(max_pos_set), bond_map
-
-
-def circ_post(degree, size, center):
-    """This function takes in an angle, size, and center and returns the x-y coordinates of the point
-    on the circumference.
-
-    Parameters
-    ----------
-    degree : float
-        The degree angle where you want to calculate the coordinate on the circumference.
-    size : float
-        The radius of the circumference.
-    center : tuple
-        Tuple containing the x-y coordinates of the center of the circumference.
-
-    Returns
-    -------
-    tuple
-        A tuple with the x-y coordinates of the point on the circumference at the defined angle.
-
-    """
-    angle_rad = math.radians(degree)
-    x = int(size * math.cos(angle_rad) + center[0])
-    y = int(size * math.sin(angle_rad) + center[1])
-    return x, y
-
-
-def sphere(x, y, z, radius, resolution=20):
-    """This function takes 3D coordinates and a radius a build the mesh-grid for a sphere with the defined resolution.
-    Based on https://stackoverflow.com/questions/70977042/how-to-plot-spheres-in-3d-with-plotly-or-another-library
-
-    Parameters
-    ----------
-    x : float
-        The x-coordinates of the center of the sphere.
-    y : float
-        The y-coordinates of the center of the sphere.
-    z : float
-        The z-coordinates of the center of the sphere.
-    radius : float
-        The radius of the sphere.
-    resolution : int, default: 20
-        The number of point for each coordinate of the grid.
-
-    Returns
-    -------
-    tuple
-        A tuple with the x, y and z arrays to build a spherical grid.
-
-    """
-    u, v = np.mgrid[0:2 * np.pi:resolution * 2j, 0:np.pi:resolution * 1j]
-    x_grid = radius * np.cos(u) * np.sin(v) + x
-    y_grid = radius * np.sin(u) * np.sin(v) + y
-    z_grid = radius * np.cos(v) + z
-    return x_grid, y_grid, z_grid
-
-
-def cylinder(radius, start, end, resolution=100):
-    """This function takes a radius, a starting point (3D coordinates) and an ending point to build the mesh-grid for a
-     cylinder with the defined resolution.
-     Based on https://community.plotly.com/t/draw-3d-cylinder-along-points/57382
-
-    Parameters
-    ----------
-    radius : float
-        The radius of the cylinder.
-    start : array
-        The starting point of the cylinder axis (3D coordinates).
-    end : array
-        The ending point of the cylinder axis (3D coordinates).
-    resolution : int, default: 100
-        The number of point for each coordinate of the grid.
-
-    Returns
-    -------
-    tuple
-        A tuple with the x, y and z arrays to build a cylindrical grid.
-
-    """
-    v = end - start
-    # find magnitude of vector
-    mag = norm(v)
-    # unit vector in direction of axis
-    v = v / mag
-    # create a different vector
-    not_v = end - np.array((start[0] + 1, start[1], start[2]))
-    # make vector perpendicular to v
-    n1 = np.cross(v, not_v)
-    n1 /= norm(n1)  # normalize the perpendicular vector
-    # make unit vector perpendicular to v and n1
-    n2 = np.cross(v, n1)
-    # surface ranges over t from 0 to length of axis and 0 to 2*pi
-    t = np.linspace(0, mag, resolution)
-    theta = np.linspace(0, 2 * np.pi, resolution)
-    # use meshgrid to make 2d arrays
-    t, theta = np.meshgrid(t, theta)
-    # generate coordinates for surface
-    x, y, z = [start[i] + v[i] * t + radius * np.sin(theta) * n1[i] + radius * np.cos(theta) * n2[i] for i in [0, 1, 2]]
-    return x, y, z
-
-
-def add_atom_svg(src, atom_name, center, radius, color, outline, shadow=True, shadow_curve=1.2, shadow_deg=45,
-                 shadow_light=0.35):
-    """It draws a circle, filled with the color, in the svg text. A shadow can be drawn on the circle.
-
-    Parameters
-    ----------
-    src : list
-        List containing the svg text elements.
-    atom_name : str
-        Name of the atom to use defs elements in svg.
-    center : tuple
-        The center of the atom in x-y coordinates.
-    radius : float
-        The radius of the circle.
-    color : string
-        The hex color to fill the circle.
-    outline : float,
-        The thickness of the border of the circle.
-    shadow : bool, default: True
-        Whether to add a shadow or not on the circle.
-    shadow_curve : float, default: 1.2
-        The curve of the shadow. 1.2 is a good value.
-    shadow_deg : float, default: 45
-        The angle in the degree of the shadow start.
-    shadow_light : float, default: 0.35
-        The lightness of the shadow. 0 is black, 1 is white.
-
-    """
-    shadow_color = shadow_color_correction(color, shadow_light)
-    defs = src.find('defs')
-    if not defs.find(f".//*[@id='{atom_name}']"):  # if not found the def, create the def
-        atom_group = ET.Element('g')
-        atom_group.set('id', atom_name)
-        atom_defs = ET.Element('circle')
-        atom_defs.set('cx', '0')
-        atom_defs.set('cy', '0')
-        atom_defs.set('r', f'{radius}')
-        atom_defs.set('fill', f'{color}')
-        atom_defs.set('stroke', f'{shadow_color}')
-        atom_defs.set('stroke-width', f'{outline}')
-        atom_group.append(atom_defs)
-        if shadow:
-            shadow_rad = radius - outline
-            start_shade = circ_post(-shadow_deg, radius, (0, 0))
-            end_shade = circ_post(-shadow_deg + 180, radius, (0, 0))
-            shad_elem = ET.Element('path')
-            shad_elem.set('d',
-                          f'M{start_shade[0]},{start_shade[1]} A{shadow_rad},{shadow_rad} 0, 1, 1 {end_shade[0]},{end_shade[1]} M{end_shade[0]},{end_shade[1]} A{radius * shadow_curve},{radius * shadow_curve} 0, 0,0 {start_shade[0]}, {start_shade[1]} Z')
-            shad_elem.set('fill', f'{shadow_color}')
-            shad_elem.set('stroke-width', '0')
-            atom_group.append(shad_elem)
-            # # patch to cover line that appears in jpeg and png images with pdf2image
-            # start_patch = circ_post(-shadow_deg, radius - outline, (0, 0))
-            # end_patch = circ_post(-shadow_deg + 180, radius - outline, (0, 0))
-            # patch_elem = ET.Element('path')
-            # patch_elem.set('d', f'M{start_patch[0]},{start_patch[1]} L {end_patch[0]},{end_patch[1]}')
-            # patch_elem.set('stroke', f'{color}')
-            # atom_group.append(patch_elem)
-        defs.append(atom_group)
-    atom_elem = ET.Element('use')
-    atom_elem.set('href', f'#{atom_name}')  # for browser rendering
-    atom_elem.set('xlink:href', f'#{atom_name}')  # for program rendering (Inkscape, Illustrator, ...)
-    atom_elem.set('transform', f'translate({center[0]} {center[1]})')  # create the circle at 0 and translate it after
-    src.append(atom_elem)
-
-
-def add_bond_svg(src, bond_type, x1, y1, x2, y2, bond_thickness, outline, bondcolor='#575757', shadow_light=0.35,
-                 bond_space_multi=1):
-    """It adds a line as a bond to an SVG image.
-    Parameters
-    ----------
-    src : list
-        List containing the svg text elements.
-    bond_type : int
-        The type of the bond. 1 stands for single bond, 2 stands for double bond, 3 stands for triple bond.
-    x1 : float
-        x-coordinate of the first atom.
-    y1 : float
-        y-coordinate of the first atom.
-    x2 : float
-        x-coordinate of the second atom.
-    y2 : float
-        y-coordinate of the second atom.
-    bond_thickness: float
-        The thickness of the bond line.
-    outline : float,
-        The thickness of the border of the bond.
-    bondcolor : string, default: '#575757'
-        The hex color of the bond.
-    shadow_light : float, default: 0.35
-        The lightness of the shadow. 0 is black, 1 is white.
-    bond_space_multi : float, default: 1
-        Bond spacing multiplier.
-
-    """
-    start = np.array((x1, y1))
-    end = np.array((x2, y2))
-    d_space = bond_thickness * 1.5 * bond_space_multi
-    t_space = bond_thickness * 2.5 * bond_space_multi
-    # calculate the degree of the bond line, y-axis is reversed in images
-    radians = math.atan2(-y1 + y2, x1 - x2) + math.pi / 2  # add 90 degree to make the angle perpendicular
-    contour_color = shadow_color_correction(bondcolor, shadow_light)
-
-    def dist_point(point, spacer):
-        """This function takes a point and a spacer distance. It returns two points that have a distance
-        equal to the spacer on the direction defined by the radians parent variable.
-        Parameters
-        ----------
-        point : tuple
-            A tuple of the x and y coordinates of the point.
-        spacer : float
-            The distance between the points.
-        Returns
-        -------
-        tuple
-            Two points with a spacer distance from point on the radian angle direction.
-        """
-        dist_x = int(math.cos(radians) * spacer)
-        dist_y = int(math.sin(radians) * spacer)
-        # y-axis is reversed in images
-        pt1 = point + np.array((dist_x, -dist_y))
-        pt2 = point - np.array((dist_x, -dist_y))
-        return pt1, pt2
-
-    def add_bond(p, q, thick=bond_thickness, color=bondcolor):
-        """It adds a bond between two points.
-        Parameters
-        ----------
-        p : tuple
-            The first point.
-        q : tuple
-            The second point.
-        thick : float, default: 1
-            The thickness of the line.
-        color : str, default: bondcolor
-            The hex code for the color of the bond.
-        """
-        bond_elem = ET.Element('line')
-        bond_elem.set('stroke', f"{color}")
-        bond_elem.set('stroke-linecap', "round")
-        bond_elem.set('stroke-width', f'{thick}')
-        bond_elem.set('x1', f'{p[0]}')
-        bond_elem.set('y1', f'{p[1]}')
-        bond_elem.set('x2', f'{q[0]}')
-        bond_elem.set('y2', f'{q[1]}')
-        src.append(bond_elem)
-
-    if bond_type == 2:
-        start_1, start_2 = dist_point(start, d_space)
-        end_1, end_2 = dist_point(end, d_space)
-        add_bond(start_1, end_1, outline, contour_color)
-        add_bond(start_2, end_2, outline, contour_color)
-        add_bond(start_1, end_1)
-        add_bond(start_2, end_2)
-    else:
-        add_bond(start, end, outline, contour_color)
-        add_bond(start, end)
-    if bond_type == 3:
-        start_1, start_2 = dist_point(start, t_space)
-        end_1, end_2 = dist_point(end, t_space)
-        add_bond(start_1, end_1, outline, contour_color)
-        add_bond(start_2, end_2, outline, contour_color)
-        add_bond(start_1, end_1)
-        add_bond(start_2, end_2)
-
-
-def add_emoji(src, xy, size, unicode, color=True):
-    """This function a svg source and insert the unicode emoji in position xy with roughly dimension size.
-
-    Parameters
-    ----------
-    src : list
-        List containing the svg text elements.
-    xy : tuple,
-        Tuple containing x and y coordinates of the atom to replace.
-    size : float
-        The size of the atom to replace.
-    unicode : str
-        The unicode string of the emoji.
-    color : bool, default: True
-        Whether to use a colored or black emoji.
-
-    """
-    unicode = unicode.strip()  # just to make sure
-    emoji_id = 'Emoji' + unicode # id cannot start with a digit
-    defs = src.find('defs')
-    if not defs.find(f".//*[@id='{emoji_id}']"):  # if not found the def, create the def
-        # request emoji from online repository
-        if color:
-            url = f"https://raw.github.com/hfg-gmuend/openmoji/master/color/svg/{unicode}.svg"
-        else:
-            url = f"https://raw.githubusercontent.com/hfg-gmuend/openmoji/master/black/svg/{unicode}.svg"
-        response = requests.get(url)
-        emoji_text = BytesIO(response.content).read().decode('utf-8')
-        if emoji_text == '404: Not Found':
-            raise ValueError(f'Emoji unicode ({unicode}) not found')
-        root = ET.fromstring(emoji_text)
-        emoji_dim = [float(i) for i in root.get("viewBox").split()]
-        emoji_dims[unicode] = emoji_dim
-        del root.attrib["viewBox"]
-        emoji_group = ET.Element('g')
-        emoji_group.set('id', emoji_id)
-        emoji_group.append(root)
-        defs.append(emoji_group)
-    emoji_dim = emoji_dims[unicode]
-    scale_x = size / emoji_dim[2] * 3  # *3 because otherwise square emojis could be small
-    scale_y = size / emoji_dim[3] * 3  # *3 because otherwise square emojis could be small
-    trans_x = xy[0] - emoji_dim[2] * scale_x / 2
-    trans_y = xy[1] - emoji_dim[3] * scale_y / 2
-    emoji_elem = ET.Element('use')
-    emoji_elem.set('href', '#' + emoji_id)  # for browser rendering
-    emoji_elem.set('xlink:href', '#' + emoji_id)  # for program rendering (Inkscape, Illustrator, ...)
-    emoji_elem.set('transform', f'translate({trans_x} {trans_y}) scale({scale_x} {scale_y})')
-    src.append(emoji_elem)
-
-
-def partial_sanitize(mol):
-    """This function takes a molecule, computes ring/valence and sanitize it partially.
-    Based on https://sourceforge.net/p/rdkit/mailman/message/32599798/
-
-    Parameters
-    ----------
-    mol : rdkit molecule object.
-        RDKIT object for a molecule
-
-    """
-    # Generates properties like implicit valence and ring information.
-    mol.UpdatePropertyCache(strict=False)
-    Chem.SanitizeMol(mol,
-                     Chem.SanitizeFlags.SANITIZE_FINDRADICALS | Chem.SanitizeFlags.SANITIZE_KEKULIZE | Chem.SanitizeFlags.SANITIZE_SETAROMATICITY | Chem.SanitizeFlags.SANITIZE_SETCONJUGATION | Chem.SanitizeFlags.SANITIZE_SETHYBRIDIZATION | Chem.SanitizeFlags.SANITIZE_SYMMRINGS,
-                     catchErrors=True)
-
-
-def parse_structure(smiles, nice_conformation=True, dimension_3=False, n_conf=1, force_field='UFF',
-                    randomseed=-1):
-    """This function takes a SMILES string and returns molecule object that hase been prepared.
-
-    Parameters
-    ----------
-    smiles : string
-        The SMILES string of the molecule you want to draw.
-    nice_conformation : bool, default: True
-        If True, the molecule will be put into a nice conformation.
-    dimension_3 : bool, optional
-        If True, it will embed and optimize a 3D structure of the molecule.
-    n_conf : int, default: 1
-        The number of 3D conformations to generate.
-    force_field : str, default: 'UFF'
-        The force field to optimize of the 3D conformation. Force fields currently supported: 'UFF' and 'MMFF'.
-    randomseed: int, optional
-        The value of the random seed to generate conformations.
-
-    Returns
-    -------
-    mol object
-        A rdkit molecule object.
-
-    """
-    mol = Chem.MolFromSmiles(smiles, sanitize=False)  # read the molecule
-    partial_sanitize(mol)  # partial sanitization
-    mol = Chem.AddHs(mol)  # add Hydrogens
-    # build with 3D structure
-    if dimension_3:
-        build = AllChem.EmbedMultipleConfs(mol, numConfs=n_conf, randomSeed=randomseed)
-        if build == -1:
-            raise ValueError('Embedding 3D conformation failed')
-        if force_field == 'UFF':
-            AllChem.UFFOptimizeMoleculeConfs(mol)
-        elif force_field == 'MMFF':
-            AllChem.MMFFOptimizeMoleculeConfs(mol)
-        return mol
-
-    # build with 2D structure
-    if nice_conformation:
-        rdDepictor.SetPreferCoordGen(True)  # rdCoordGen conformation as default
-        rdCoordGen.AddCoords(mol)  # better conformation for macrocycle
-    else:
-        rdDepictor.SetPreferCoordGen(False)  # rdkit conformation default
-        AllChem.Compute2DCoords(mol)  # canonical rdkit conformation
-    mol = rdkit.Chem.Draw.rdMolDraw2D.PrepareMolForDrawing(mol)  # clean the conformer
-    return mol
-
-
-def build_svg(mol, atom_radius=100, atom_color=color_map, radius_multi=atom_resize, pos_multi=300,
-              shadow_light=0.35, shadow=False, single_bonds=False, conformation=0, verbose=False,
-              rotation=(0, 0, 0), emoji=None):
-    """This function takes a SMILES string and returns an icon of the molecule, in format PNG, SVG, JPEG, and PDF.
-
-    Parameters
-    ----------
-    mol : mol object
-        The rdkit mol object representing a molecule.
-    atom_radius : int, default: 100
-        The radius of the atoms in the icon.
-    atom_color : dictionary, default: color_map
-        a dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
-    radius_multi : dictionary, default: atom_resize
-        A dictionary containing the multiplier for each atom, bond and outline. It multiplies the atom radius, bond and
-        outline thickness.
-    pos_multi : int, default: 300
-        This is the distance between atoms.
-    shadow_light : float, default: 0.35
-        How light the shadow is. 0.35 is a good value.
-    shadow : bool, optional
-        Whether to add a shadow to the image or not.
-    single_bonds : bool, optional
-        If True, all bonds will be single bonds.
-    conformation : int, default: 0
-        The conformation to draw.
-    verbose : bool, optional
-        Prints out the atoms and bonds coordinates.
-    rotation : tuple, default: (0,0,0)
-        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
-    emoji : dictionary, optional
-        A dictionary the string containing atom index as key, and as value a list containing the unicode
-        identifier of an emoji and whether it is colored or black emoji.
-
-    Returns
-    -------
-    list
-        List containing the svg text elements.
-
-    """
-    conf = mol.GetConformer(conformation)
-    max_radius_multi = atom_radius * max(radius_multi.values())
-    pos_dict, max_pos, bond_map = position_map(mol, conf, rotation)
-    # the dimension is calculated considering the maximum position, the atom diameter and multiplying by two (the
-    # dimension is half of the image size
-    dim = max_pos * pos_multi + max_radius_multi * 2
-    # scale the position according to the image
-    pos_dict = {k: val * pos_multi for k, val in pos_dict.items()}
-    # setting svg attributes
-    svg = ET.Element('svg')
-    svg.set('id', "molecule_icon")
-    svg.set('viewBox', f"{-dim} {-dim} {dim * 2} {dim * 2}")
-    svg.set('xmlns', "http://www.w3.org/2000/svg")
-    svg.set('xmlns:xlink', "http://www.w3.org/1999/xlink")
-    background = atom_color['Background']
-    # add background if it is not white
-    if background and background != '#ffffff':
-        back = ET.Element('rect')
-        back.set('id', "background")
-        back.set('x', f"{-dim}")
-        back.set('y', f"{-dim}")
-        back.set('height', "101%") # 101 to make sure covers the whole background
-        back.set('width', "101%")
-        back.set('fill', f"{background}")
-        svg.append(back)
-    defs = ET.Element('defs')  # add defs to save space for repeated atoms and icons
-    svg.append(defs)
-    aromatic_index = set()
-    double_index = set()
-    bond_done = set()
-    # add atoms (to start from the Hydrogens, the atom index must be reversed)
-    if verbose:
-        print('\nAtom-index\tSymbol\tx\ty')
-        print('\nBond-type\tAtom1\tAtom2')
-    # order the atoms according to the z-axis
-    atom_order = [k for k, v in sorted(pos_dict.items(), key=lambda item: item[1][2])]
-    bond_thickness = atom_radius * radius_multi['Bond'] / 4
-    bond_outline = bond_thickness + atom_radius * radius_multi['Outline'] / 5
-    outline = atom_radius * radius_multi['Outline'] / 10
-    if 'Bond spacing' in radius_multi and radius_multi['Bond spacing']:
-        bond_space_multi = radius_multi['Bond spacing']
-    else:
-        bond_space_multi = 1
-    for atom_idx in atom_order:
-        atom = mol.GetAtomWithIdx(atom_idx)
-        symbol = atom.GetSymbol()
-        # add dimension to center with respect to the center of the blank image
-        atom_x = pos_dict[atom_idx][0]
-        atom_y = -pos_dict[atom_idx][1]  # the y-axis is inverted in an image
-        if symbol not in atom_color:
-            symbol = 'other'
-        if verbose:
-            print(f"Atom\t{atom_idx}\t{symbol}\t{atom_x}\t{atom_y}")
-        # add  atom bonds before the atom icon
-        for bond_idx in bond_map[atom_idx].difference(bond_done):
-            bond = mol.GetBondWithIdx(bond_idx)
-            atom1 = bond.GetBeginAtom()
-            idx1 = bond.GetBeginAtomIdx()
-            atom2 = bond.GetEndAtom()
-            idx2 = bond.GetEndAtomIdx()
-            b_type = bond.GetBondType()
-            if verbose:
-                print(f"Bond\t{b_type}\t{idx1}\t{idx2}")
-            bond_type = 1
-            if rdkit.Chem.rdchem.BondType.AROMATIC == b_type and not single_bonds:
-                conditions = [idx1 not in aromatic_index, idx2 not in aromatic_index,
-                              idx1 not in double_index, idx2 not in double_index,  # avoid double bonds of aromatics
-                              len(bond_map[idx1]) < atom1.GetTotalValence(),
-                              len(bond_map[idx2]) < atom2.GetTotalValence()]
-                if all(conditions):
-                    bond_type = 2
-                    aromatic_index.add(idx1)
-                    aromatic_index.add(idx2)
-            elif rdkit.Chem.rdchem.BondType.TRIPLE == b_type and not single_bonds:
-                bond_type = 3
-                aromatic_index.add(idx1)
-                aromatic_index.add(idx2)
-            elif rdkit.Chem.rdchem.BondType.DOUBLE == b_type and not single_bonds:
-                bond_type = 2
-                double_index.add(idx1)
-                double_index.add(idx2)
-            add_bond_svg(svg, bond_type, pos_dict[idx1][0], -pos_dict[idx1][1], pos_dict[idx2][0], -pos_dict[idx2][1],
-                         bond_thickness, bond_outline, bondcolor=atom_color['Bond'], shadow_light=shadow_light,
-                         bond_space_multi=bond_space_multi)
-            bond_done.add(bond_idx)
-        corrected_radius = atom_radius * radius_multi[symbol]  # resize the atom dimension
-        if emoji and atom_idx in emoji and emoji[atom_idx][0] and emoji[atom_idx][0].strip() != '':
-            add_emoji(svg, (atom_x, atom_y), corrected_radius, unicode=emoji[atom_idx][0], color=emoji[atom_idx][1])
-        elif emoji and symbol in emoji and emoji[symbol][0] and emoji[symbol][0].strip() != '':
-            add_emoji(svg, (atom_x, atom_y), corrected_radius, unicode=emoji[symbol][0], color=emoji[symbol][1])
-        else:
-            add_atom_svg(svg, symbol, (atom_x, atom_y), corrected_radius, atom_color[symbol], outline, shadow=shadow,
-                         shadow_light=shadow_light)
-    return svg
-
-
-def icon_print(mol, name='molecule_icon', directory=os.getcwd(), rdkit_png=False, rdkit_svg=False, save_svg=True,
-               save_png=False, save_jpeg=False, save_pdf=False, atom_color=color_map, atom_radius=100,
-               radius_multi=atom_resize, pos_multi=300, single_bonds=False, remove_H=True,
-               shadow=True, shadow_light=0.35, verbose=False, rotation=(0, 0, 0), emoji=None):
-    """This function takes a SMILES string and returns an icon of the molecule, in format PNG, SVG, JPEG, and PDF.
-
-    Parameters
-    ----------
-    mol : mol object
-        The rdkit mol object representing a molecule.
-    name : string, default: 'molecule_icon'
-        The name of the file to be saved.
-    directory : string, default: os.getcwd()
-        The directory to save the image in.
-    rdkit_png : bool, optional
-        If True, will use RDKit to generate a PNG image of the default structure.
-    rdkit_svg : bool, optional
-        If True, will use RDKit to generate an SVG image of the default structure.
-    save_svg : bool, default: True
-        Save the SVG icon format.
-    save_png : bool, default: False
-        Save the SVG, PDF and PNG icon formats.
-    save_jpeg : bool, default: False
-        Save the SVG, PDF and JPEG icon formats.
-    save_pdf : bool, default: False
-        Save the SVG and PDF icon formats.
-    atom_color : dictionary, default: color_map
-        A dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
-    atom_radius : int, default: 100
-        The radius of the atoms in the icon.
-    radius_multi : dictionary, default: atom_resize
-        A dictionary containing the multiplier for each atom. It multiplies the atom radius.
-    pos_multi : int, default: 300
-        This is the distance between atoms.
-    single_bonds : bool, optional
-        If True, all bonds will be single bonds.
-    remove_H : bool, optional
-        Remove all non-chiral hydrogen from the molecule.
-    shadow : bool, optional
-        Whether to add a shadow to the image or not.
-    shadow_light : float, default: 0.35
-        How light the shadow is. 0.35 is a good value.
-    verbose : bool, optional
-        Prints out the atoms coordinates.
-    rotation : tuple, default: (0,0,0)
-        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
-    emoji : dictionary, optional
-        A dictionary the string containing atom index as key, and as value a list containing the unicode
-        identifier of an emoji and whether it is colored or black emoji.
-
-    Returns
-    -------
-    list
-        List containing the svg text elements.
-
-    """
-    if '.svg' in name:
-        fullname = directory + os.sep + name
-    else:
-        fullname = directory + os.sep + name + '.svg'
-    if remove_H:
-        mol = Chem.RemoveHs(mol)  # remove not chiral Hydrogen
-    svg = build_svg(mol, atom_radius=atom_radius, verbose=verbose, atom_color=atom_color,
-                    radius_multi=radius_multi, shadow_light=shadow_light,
-                    shadow=shadow, single_bonds=single_bonds, pos_multi=pos_multi, rotation=rotation, emoji=emoji)
-
-    # Draw indices if emojis are present
-    if emoji:
-        for atom in mol.GetAtoms():
-            atom.SetAtomMapNum(atom.GetIdx())
-    else:  # clear atom mapping
-        for atom in mol.GetAtoms():
-            atom.SetAtomMapNum(0)
-    if rdkit_png:
-        rdkit.Chem.Draw.MolToFile(mol, directory + os.sep + name + "_rdkit.png")
-    if rdkit_svg:
-        drawer = rdMolDraw2D.MolDraw2DSVG(300, 300)
-        drawer.DrawMolecule(mol)
-        drawer.FinishDrawing()
-        rdkit_svg_text = drawer.GetDrawingText()
-        with open(directory + os.sep + name + "_rdkit.svg", 'w') as f:
-            f.write(rdkit_svg_text)
-
-    pdf_name = directory + os.sep + name + ".pdf"
-    if save_pdf or save_png or save_jpeg:
-        save_svg = True
-        if save_png or save_jpeg:
-            save_pdf = True
-    if save_svg:
-        svg_elementtree = ET.ElementTree(svg)
-        ET.indent(svg_elementtree, space="\t", level=0)
-        with open(fullname, 'wb') as f:
-            svg_elementtree.write(f, encoding='utf-8')
-    if save_pdf:
-        drawing = svg2rlg(fullname)
-        renderPDF.drawToFile(drawing, pdf_name)
-    if save_png or save_jpeg:
-        pages = convert_from_path(pdf_name)
-    if save_png:
-        pages[0].save(directory + os.sep + name + '.png', 'PNG')
-    if save_jpeg:
-        pages[0].save(directory + os.sep + name + '.jpeg', 'JPEG')
-
-    if verbose:
-        print('\033[0;32m' + fullname + ' completed' + '\033[0;0;m')
-    return svg
-
-
-def graph_3d(mol, name='molecule_icon', directory=os.getcwd(), rdkit_png=False, rdkit_svg=False, resolution=100,
-             atom_color=color_map, atom_radius=100, radius_multi=atom_resize, pos_multi=300, remove_H=True,
-             rotation=(0, 0, 0)):
-    """This function takes a SMILES string and returns an icon of the molecule, in format PNG, SVG, JPEG, and PDF.
-
-    Parameters
-    ----------
-    mol : mol object
-        The rdkit mol object representing a molecule.
-    name : string, default: 'molecule_icon'
-        The name of the file to be saved.
-    directory : string, default: os.getcwd()
-        The directory to save the image in.
-    rdkit_png : bool, optional
-        If True, will use RDKit to generate a PNG image of the default structure.
-    rdkit_svg : bool, optional
-        If True, will use RDKit to generate an SVG image of the default structure.
-    resolution : int, default: 100
-        The resolution of the sphere and cylinder in the 3D graph.
-    atom_color : dictionary, default: color_map
-        a dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
-    atom_radius : int, default: 100
-        The radius of the atoms in the icon.
-    radius_multi : dictionary, default: atom_resize
-        A dictionary containing the multiplier for each atom. It multiplies the atom radius.
-    pos_multi : int, default: 300
-        This is the distance between atoms.
-    remove_H : bool, optional
-        Remove all non-chiral hydrogen from the molecule.
-    rotation : tuple, default: (0,0,0)
-        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
-
-    Returns
-    -------
-    plotly.graph_objects.Figure
-        Plotly object containing the 3D structure of the molecule.
-
-    """
-    # produce rdkit image
-    if rdkit_png:
-        rdkit.Chem.Draw.MolToFile(mol, directory + os.sep + name + "_rdkit.png")
-    if rdkit_svg:
-        drawer = rdMolDraw2D.MolDraw2DSVG(300, 300)
-        drawer.DrawMolecule(mol)
-        drawer.FinishDrawing()
-        rdkit_svg_text = drawer.GetDrawingText()
-        with open(directory + os.sep + name + "_rdkit.svg", 'w') as f:
-            f.write(rdkit_svg_text)
-
-    if remove_H:
-        mol = Chem.RemoveHs(mol)  # remove not chiral Hydrogen
-    conf = mol.GetConformer()
-    max_radius_multi = atom_radius * max(radius_multi.values())
-    pos_dict, max_pos, bond_map = position_map(mol, conf, rotation)
-    # the dimension is calculated considering the maximum position, the atom diameter and multiplying by two (the
-    # dimension is half of the image size)
-    dimension = (max_pos * pos_multi + max_radius_multi * 2)
-    # scale the position according to the image
-    pos_dict = {k: val * pos_multi for k, val in pos_dict.items()}
-
-    # create plotly graph with the white background
-    layout = go.Layout(scene_xaxis_visible=False, scene_yaxis_visible=False, scene_zaxis_visible=False,
-                       scene_aspectmode='cube')
-    fig = go.Figure(layout=layout)
-
-    # all_pos = np.array(list(pos_dict.values()))
-    # x_cent, y_cent, z_cent = np.mean(all_pos[:, 0]), np.mean(all_pos[:, 1]), np.mean(all_pos[:, 2])
-    # set equal axis dimension
-    axis_range = [-dimension, dimension]
-    fig.update_layout(
-        scene=dict(
-            xaxis=dict(range=axis_range, ),
-            yaxis=dict(range=axis_range, ),
-            zaxis=dict(range=axis_range, ), ), )
-    # build bonds
-    bond_thickness = atom_radius * radius_multi['Bond'] / 4
-    for bond in mol.GetBonds():
-        idx1 = bond.GetBeginAtomIdx()
-        idx2 = bond.GetEndAtomIdx()
-        color_scale = [[0, atom_color['Bond']], [1, atom_color['Bond']]]
-        name = f'{bond.GetIdx()}: {bond.GetBondType()}'
-        (x_surf, y_surf, z_surf) = cylinder(bond_thickness, pos_dict[idx1], pos_dict[idx2], resolution=resolution)
-        data = go.Surface(x=x_surf, y=y_surf, z=z_surf, colorscale=color_scale, name=name,
-                          showscale=False, showlegend=False)
-        fig.add_traces(data)
-
-    # build atom icons
-    for k, val in pos_dict.items():
-        atom = mol.GetAtomWithIdx(k)
-        symbol = atom.GetSymbol()
-        radius = atom_radius * radius_multi[symbol]  # resize the atom dimension
-        color_scale = [[0, atom_color[symbol]], [1, atom_color[symbol]]]
-        name = f'{k}: {symbol}'
-        (x_surf, y_surf, z_surf) = sphere(val[0], val[1], val[2], radius, resolution=resolution)
-        data = go.Surface(x=x_surf, y=y_surf, z=z_surf, colorscale=color_scale, name=name,
-                          showscale=False, showlegend=False)
-        fig.add_traces(data)
-    return fig
-
-
-def parse():
-    # create a parser for command line
-    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-                                     description='Produce 2D icons of molecules from smiles.')
-    main = parser.add_argument_group('[ Required ]')
-    main.add_argument('SMILE',
-                      metavar='SMILE string',
-                      help='Smile of the molecule to produce the icon')
-
-    optional = parser.add_argument_group('[ Optional ]')
-    optional.add_argument("--name",
-                          metavar='STR',
-                          default='molecule_icon',
-                          help='Name of the png output file')
-    optional.add_argument("-a", '--atom_multiplier',
-                          metavar='FLOAT',
-                          type=float,
-                          default=1,
-                          help='Increase or decrease the atom size in the image')
-    optional.add_argument("-p", '--position_multiplier',
-                          metavar='FLOAT',
-                          type=float,
-                          default=1,
-                          help='Increase or decrease the image size in the image')
-    optional.add_argument("-d", '--directory',
-                          metavar='FOLDER',
-                          default=os.getcwd(),
-                          help='Path to the folder to save the icon file ')
-    optional.add_argument("--rdkit_svg",
-                          action='store_true',
-                          help='Use this flag to save also the rdkit 2D image of the molecule')
-    optional.add_argument("-s", "--single_bond",
-                          action='store_true',
-                          help='Use this flag to draw single bonds only')
-    optional.add_argument("--remove_H",
-                          action='store_true',
-                          help='Use this flag to remove the hydrogens from the structure')
-    optional.add_argument("--hide_shadows",
-                          action='store_true',
-                          help='Hide the shadows of the atoms')
-    optional.add_argument("--shadow_light",
-                          type=float,
-                          default=0.35,
-                          help='Select how dark the shadow should be in the range [0:1]')
-    optional.add_argument("-v", "--verbose",
-                          action='store_true',
-                          help='Print the 2D coordinates of each atom')
-    args = parser.parse_args()
-    return args
-
-
-if __name__ == "__main__":
-    parsed = parse()
-    molecule = parse_structure(parsed.SMILE)
-    icon_print(molecule, name=parsed.name, directory=parsed.directory, pos_multi=int(300 * parsed.position_multiplier),
-               rdkit_svg=parsed.rdkit_svg, single_bonds=parsed.single_bond, save_png=True, verbose=parsed.verbose,
-               atom_radius=100 * parsed.atom_multiplier, remove_H=parsed.remove_H,
-               shadow=not parsed.hide_shadows, shadow_light=parsed.shadow_light)
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Luca Monari"
+__credits__ = ["Luca Monari"]
+__version__ = "1.0"
+__email__ = "luca.monari@etu.unistra.fr"
+
+import numpy as np
+from svglib.svglib import svg2rlg
+from reportlab.graphics import renderPDF
+from pdf2image import convert_from_bytes  # require poppler, only used by the poppler raster backend
+import rdkit
+from rdkit import Chem
+from rdkit.Chem import AllChem
+from rdkit.Chem.Draw import rdMolDraw2D
+from rdkit.Chem import rdCoordGen
+from rdkit.Chem import rdDepictor
+import math
+from scipy.linalg import norm
+import plotly.graph_objects as go
+import argparse
+import os
+import sys
+import re
+import csv
+import json
+import gzip
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import threading
+from collections import OrderedDict
+import warnings
+from io import BytesIO
+from icon_raster import rasterize_svg
+from svg_writer import SvgWriter, format_number
+from conformer_cache import conformer_key
+from molecule_record import MoleculeRecord, clear_records, molecule_record
+from palette import Palette, compile_palette, hex_to_rgb, rgb_to_hex, shadow_color_correction
+from emoji_store import default_emoji_store
+from tracing import span, traced
+
+# brute force approach to avoid decompression bomb warning by pdf2image and PIL
+from PIL import Image
+Image.MAX_IMAGE_PIXELS = None
+warnings.filterwarnings("ignore")
+warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+
+
+# dictionary containing the default colour for each atom, according to CPK colour convention
+color_map = {"H": "#FFFFFF", "D": "#FFFFC0", "T": "#FFFFA0", "He": "#D9FFFF", "Li": "#CC80FF", "Be": "#C2FF00",
+             "B": "#FFB5B5", "C": "#909090", "C-13": "#505050", "C-14": "#404040", "N": "#3050F8", "N-15": "#105050",
+             "O": "#FF0D0D", "F": "#90E050", "Ne": "#B3E3F5", "Na": "#AB5CF2", "Mg": "#8AFF00", "Al": "#BFA6A6",
+             "Si": "#F0C8A0", "P": "#FF8000", "S": "#FFFF30", "Cl": "#1FF01F", "Ar": "#80D1E3", "K": "#8F40D4",
+             "Ca": "#3DFF00", "Sc": "#E6E6E6", "Ti": "#BFC2C7", "V": "#A6A6AB", "Cr": "#8A99C7", "Mn": "#9C7AC7",
+             "Fe": "#E06633", "Co": "#F090A0", "Ni": "#50D050", "Cu": "#C88033", "Zn": "#7D80B0", "Ga": "#C28F8F",
+             "Ge": "#668F8F", "As": "#BD80E3", "Se": "#FFA100", "Br": "#A62929", "Kr": "#5CB8D1", "Rb": "#702EB0",
+             "Sr": "#00FF00", "Y": "#94FFFF", "Zr": "#94E0E0", "Nb": "#73C2C9", "Mo": "#54B5B5", "Tc": "#3B9E9E",
+             "Ru": "#248F8F", "Rh": "#0A7D8C", "Pd": "#006985", "Ag": "#C0C0C0", "Cd": "#FFD98F", "In": "#A67573",
+             "Sn": "#668080", "Sb": "#9E63B5", "Te": "#D47A00", "I": "#940094", "Xe": "#429EB0", "Cs": "#57178F",
+             "Ba": "#00C900", "La": "#70D4FF", "Ce": "#FFFFC7", "Pr": "#D9FFC7", "Nd": "#C7FFC7", "Pm": "#A3FFC7",
+             "Sm": "#8FFFC7", "Eu": "#61FFC7", "Gd": "#45FFC7", "Tb": "#30FFC7", "Dy": "#1FFFC7", "Ho": "#00FF9C",
+             "Er": "#00E675", "Tm": "#00D452", "Yb": "#00BF38", "Lu": "#00AB24", "Hf": "#4DC2FF", "Ta": "#4DA6FF",
+             "W": "#2194D6", "Re": "#267DAB", "Os": "#266696", "Ir": "#175487", "Pt": "#D0D0E0", "Au": "#FFD123",
+             "Hg": "#B8B8D0", "Tl": "#A6544D", "Pb": "#575961", "Bi": "#9E4FB5", "Po": "#AB5C00", "At": "#754F45",
+             "Rn": "#428296", "Fr": "#420066", "Ra": "#007D00", "Ac": "#70ABFA", "Th": "#00BAFF", "Pa": "#00A1FF",
+             "U": "#008FFF", "Np": "#0080FF", "Pu": "#006BFF", "Am": "#545CF2", "Cm": "#785CE3", "Bk": "#8A4FE3",
+             "Cf": "#A136D4", "Es": "#B31FD4", "Fm": "#B31FBA", "Md": "#B30DA6", "No": "#BD0D87", "Lr": "#C70066",
+             "Rf": "#CC0059", "Db": "#D1004F", "Sg": "#D90045", "Bh": "#E00038", "Hs": "#E6002E", "Mt": "#EB0026",
+             'other': '#f5c2cb', 'Bond': '#979797', 'Background': "#ffffff", 'All icon': "#000000", 'All atoms': "#000000"}
+
+# dictionary containing the value to multiply to the final radius of each atom
+atom_resize = {'All atoms': 1.0, 'H': 1.0, 'D': 1.0, 'T': 1.0, 'He': 1.0, 'Li': 1.0, 'Be': 1.0, 'B': 1.0, 'C': 1.0,
+               'C-13': 1.0, 'C-14': 1.0, 'N': 1.0, 'N-15': 1.0, 'O': 1.0, 'F': 1.0, 'Ne': 1.0, 'Na': 1.0, 'Mg': 1.0,
+               'Al': 1.0, 'Si': 1.0, 'P': 1.0, 'S': 1.0, 'Cl': 1.0, 'Ar': 1.0, 'K': 1.0, 'Ca': 1.0, 'Sc': 1.0,
+               'Ti': 1.0, 'V': 1.0, 'Cr': 1.0, 'Mn': 1.0, 'Fe': 1.0, 'Co': 1.0, 'Ni': 1.0, 'Cu': 1.0, 'Zn': 1.0,
+               'Ga': 1.0, 'Ge': 1.0, 'As': 1.0, 'Se': 1.0, 'Br': 1.0, 'Kr': 1.0, 'Rb': 1.0, 'Sr': 1.0, 'Y': 1.0,
+               'Zr': 1.0, 'Nb': 1.0, 'Mo': 1.0, 'Tc': 1.0, 'Ru': 1.0, 'Rh': 1.0, 'Pd': 1.0, 'Ag': 1.0, 'Cd': 1.0,
+               'In': 1.0, 'Sn': 1.0, 'Sb': 1.0, 'Te': 1.0, 'I': 1.0, 'Xe': 1.0, 'Cs': 1.0, 'Ba': 1.0, 'La': 1.0,
+               'Ce': 1.0, 'Pr': 1.0, 'Nd': 1.0, 'Pm': 1.0, 'Sm': 1.0, 'Eu': 1.0, 'Gd': 1.0, 'Tb': 1.0, 'Dy': 1.0,
+               'Ho': 1.0, 'Er': 1.0, 'Tm': 1.0, 'Yb': 1.0, 'Lu': 1.0, 'Hf': 1.0, 'Ta': 1.0, 'W': 1.0, 'Re': 1.0,
+               'Os': 1.0, 'Ir': 1.0, 'Pt': 1.0, 'Au': 1.0, 'Hg': 1.0, 'Tl': 1.0, 'Pb': 1.0, 'Bi': 1.0, 'Po': 1.0,
+               'At': 1.0, 'Rn': 1.0, 'Fr': 1.0, 'Ra': 1.0, 'Ac': 1.0, 'Th': 1.0, 'Pa': 1.0, 'U': 1.0, 'Np': 1.0,
+               'Pu': 1.0, 'Am': 1.0, 'Cm': 1.0, 'Bk': 1.0, 'Cf': 1.0, 'Es': 1.0, 'Fm': 1.0, 'Md': 1.0, 'No': 1.0,
+               'Lr': 1.0, 'Rf': 1.0, 'Db': 1.0, 'Sg': 1.0, 'Bh': 1.0, 'Hs': 1.0, 'Mt': 1.0, 'other': 1.0,
+               'Bond': 1.0, 'Bond spacing': 1.0, 'Outline': 1.0}
+
+# period table of emoji from the emoji-chem repository (https://github.com/whitead/emoji-chem), thanks to Andrew White
+emoji_periodic_table = {'H': '2B50', 'He': '1F388', 'Li': '1F50B', 'Be': '1F6F0', 'B': '1F939-200D-2640-FE0F',
+                        'C': '26FD', 'N': '1FAB4', 'O': '1F525', 'F': '1FAA5', 'Ne': '1F383', 'Na': '1F35F',
+                        'Mg': '1F4A5', 'Al': '2708', 'Si': '1F5A5', 'P': '1F30B', 'S': '1F637', 'Cl': '1F922',
+                        'Ar': '1F47B', 'K': '1F34C', 'Ca': '1F95B', 'Sc': '1F6B2', 'Ti': '1F6F3', 'V': '1F3A8',
+                        'Cr': '1F36D', 'Mn': '1F356', 'Fe': '1F953', 'Co': '1F4FC', 'Ni': '1F374', 'Cu': '1F949',
+                        'Zn': '1F5DD', 'Ga': '1F944', 'Ge': '1F37A', 'As': '1F480', 'Se': '1F485',
+                        'Br': '1F95C', 'Kr': '1F52B', 'Rb': '1F6A8', 'Sr': '1F387', 'Y': '1F4FA', 'Zr': '1F680',
+                        'Nb': '1F3AD', 'Mo': '26D3', 'Tc': '2699', 'Ru': '1F984', 'Rh': '1F6E3', 'Pd': '2697',
+                        'Ag': '1F948', 'Cd': '1F3ED', 'In': '1F4F1', 'Sn': '1F916', 'Sb': '1F441', 'Te': '1F30C',
+                        'I': '1F41F', 'Xe': '1F52E', 'Cs': '23F1', 'Ba': '1F48A', 'La': '269C', 'Ce': '1F69B',
+                        'Pr': '1F465', 'Nd': '1F377', 'Pm': '1F6AC', 'Sm': '1F489', 'Eu': '1F1EA', 'Gd': '1F3B0',
+                        'Tb': '1F433', 'Dy': '1F484', 'Ho': '1F306', 'Er': '1F62C', 'Tm': '1F352', 'Yb': '1F315',
+                        'Lu': '1F90D', 'Hf': '1F4F8', 'Ta': '1F50D', 'W': '1F48E', 'Re': '1F4BB', 'Os': '1F58B',
+                        'Ir': '2604', 'Pt': '1F4B0', 'Au': '1F947', 'Hg': '1F321', 'Tl': '1F400', 'Pb': '1F6B0',
+                        'Bi': '1F308', 'Po': '1F985', 'At': '26A1', 'Rn': '1F32A', 'Fr': '1F950',
+                        'Ra': '231A', 'Ac': '1F300', 'Th': '26C8', 'Pa': '1F469-200D-1F680', 'U': '2622',
+                        'Np': '1F531', 'Pu': '1F4A3', 'Am': '1F30E', 'Cm': '1F469-200D-1F52C', 'Bk': '1F393',
+                        'Cf': '1F31E', 'Es': '1F43C', 'Fm': '1F4AF', 'Md': '1F647', 'No': '1F3C5', 'Lr': '1F501',
+                        'Rf': '1F5FA', 'Db': '1F914', 'Sg': '1F30A', 'Bh': '269B', 'Hs': '2696', 'Mt': '1F483',
+                        'Ds': '1F3F0', 'Rg': '1FA7B', 'Cn': '1F4AB', 'Nh': '1F5FE', 'Fl': '1F4DD', 'Mc': '1F3C7',
+                        'Lv': '1F4A1', 'Ts': '1F345', 'Og': '1F95D'}
+
+# default number of vertices of a whole 3D graph when the resolution is chosen automatically
+VERTEX_BUDGET = 200000
+# lowest resolution used by the automatic level of detail
+MIN_RESOLUTION = 6
+# most subdivisions of the icosphere of the mesh atoms (642 vertices), and most segments around the mesh bonds: finer
+# meshes are not visibly smoother once plotly shades them
+MESH_SUBDIVISIONS = 3
+MESH_SEGMENTS = 32
+# CSS classes of the bond borders and of the bonds in the compact svg
+BOND_CLASSES = ('c', 'b')
+# decimals of the coordinates and sizes in the compact svg (the icons are thousands of units wide)
+COMPACT_PRECISION = 1
+
+
+def position_map(mol, conf, rotation=(0, 0, 0), pos_multi=1):
+    """This function takes a mol object, the conformation, the rotation and the position multiplier and calculates
+    the corrected positions of the atoms, together with the bond and adjacency arrays.
+
+    Parameters
+    ----------
+    mol : Mol rdkit object or MoleculeRecord
+        The rdkit mol object representing a molecule, or its record.
+    conf : Conformer rdkit object
+        The conformation of the molecule.
+    rotation : tuple, default: (0,0,0)
+        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the molecule.
+    pos_multi : float, default: 1
+        The value to multiply to the positions (the distance between atoms).
+
+    Returns
+    -------
+    array
+        A (n_atoms, 3) array with the rotated and scaled positions of the atoms, indexed by atom index.
+    float
+        The maximum absolute x or y coordinate, that is the half dimension of the image without the atoms.
+    array
+        A (n_bonds, 2) array with the begin and end atom indexes of each bond, indexed by bond index.
+    tuple
+        The CSR adjacency (bond_ptr, atom_bonds): the bonds of atom i are atom_bonds[bond_ptr[i]:bond_ptr[i + 1]],
+        in increasing bond index order.
+
+    """
+    record = molecule_record(mol)
+    positions, max_pos = record.positions(conf.GetId(), rotation, pos_multi)
+    bonds = np.column_stack((record.bonds['begin'], record.bonds['end'])).astype(np.intp)
+    return positions, max_pos, bonds, (record.bond_ptr, record.atom_bonds)
+
+
+def circ_post(degree, size, center):
+    """This function takes in an angle, size, and center and returns the x-y coordinates of the point
+    on the circumference.
+
+    Parameters
+    ----------
+    degree : float
+        The degree angle where you want to calculate the coordinate on the circumference.
+    size : float
+        The radius of the circumference.
+    center : tuple
+        Tuple containing the x-y coordinates of the center of the circumference.
+
+    Returns
+    -------
+    tuple
+        A tuple with the x-y coordinates of the point on the circumference at the defined angle.
+
+    """
+    angle_rad = math.radians(degree)
+    x = int(size * math.cos(angle_rad) + center[0])
+    y = int(size * math.sin(angle_rad) + center[1])
+    return x, y
+
+
+def sphere(x, y, z, radius, resolution=20):
+    """This function takes 3D coordinates and a radius a build the mesh-grid for a sphere with the defined resolution.
+    Based on https://stackoverflow.com/questions/70977042/how-to-plot-spheres-in-3d-with-plotly-or-another-library
+
+    Parameters
+    ----------
+    x : float
+        The x-coordinates of the center of the sphere.
+    y : float
+        The y-coordinates of the center of the sphere.
+    z : float
+        The z-coordinates of the center of the sphere.
+    radius : float
+        The radius of the sphere.
+    resolution : int, default: 20
+        The number of point for each coordinate of the grid.
+
+    Returns
+    -------
+    tuple
+        A tuple with the x, y and z arrays to build a spherical grid.
+
+    """
+    x_unit, y_unit, z_unit = sphere_template(resolution)
+    return radius * x_unit + x, radius * y_unit + y, radius * z_unit + z
+
+
+def cylinder(radius, start, end, resolution=100):
+    """This function takes a radius, a starting point (3D coordinates) and an ending point to build the mesh-grid for a
+     cylinder with the defined resolution.
+     Based on https://community.plotly.com/t/draw-3d-cylinder-along-points/57382
+
+    Parameters
+    ----------
+    radius : float
+        The radius of the cylinder.
+    start : array
+        The starting point of the cylinder axis (3D coordinates).
+    end : array
+        The ending point of the cylinder axis (3D coordinates).
+    resolution : int, default: 100
+        The number of point for each coordinate of the grid.
+
+    Returns
+    -------
+    tuple
+        A tuple with the x, y and z arrays to build a cylindrical grid.
+
+    """
+    v = end - start
+    # find magnitude of vector
+    mag = norm(v)
+    # unit vector in direction of axis
+    v = v / mag
+    # create a different vector
+    not_v = end - np.array((start[0] + 1, start[1], start[2]))
+    # make vector perpendicular to v
+    n1 = np.cross(v, not_v)
+    n1 /= norm(n1)  # normalize the perpendicular vector
+    # make unit vector perpendicular to v and n1
+    n2 = np.cross(v, n1)
+    # map the unit cylinder on the bond with one affine transformation
+    grid = cylinder_template(resolution) @ np.array((v * mag, radius * n1, radius * n2)) + start
+    return grid[..., 0], grid[..., 1], grid[..., 2]
+
+
+@lru_cache(maxsize=32)
+def sphere_template(resolution=20):
+    """This function builds the grid of a unit sphere centered in the origin, used by sphere(). The grids are cached
+    for each resolution and are read-only.
+
+    Parameters
+    ----------
+    resolution : int, default: 20
+        The number of point for each coordinate of the grid.
+
+    Returns
+    -------
+    tuple
+        A tuple with the x, y and z arrays of the unit spherical grid.
+
+    """
+    u, v = np.mgrid[0:2 * np.pi:resolution * 2j, 0:np.pi:resolution * 1j]
+    grids = np.cos(u) * np.sin(v), np.sin(u) * np.sin(v), np.cos(v)
+    for grid in grids:
+        grid.setflags(write=False)
+    return grids
+
+
+@lru_cache(maxsize=32)
+def cylinder_template(resolution=100):
+    """This function builds the grid of a unit cylinder, used by cylinder(). The last axis holds the position along
+    the axis (from 0 to 1) and the sine and cosine of the angle, so a cylinder is obtained by multiplying the grid by
+    the axis vector and the two scaled perpendicular vectors. The grids are cached for each resolution and are
+    read-only.
+
+    Parameters
+    ----------
+    resolution : int, default: 100
+        The number of point for each coordinate of the grid.
+
+    Returns
+    -------
+    array
+        A (resolution, resolution, 3) array.
+
+    """
+    t, theta = np.meshgrid(np.linspace(0, 1, resolution), np.linspace(0, 2 * np.pi, resolution))
+    grid = np.stack((t, np.sin(theta), np.cos(theta)), axis=-1)
+    grid.setflags(write=False)
+    return grid
+
+
+def lod_resolution(n_atoms, n_bonds, vertex_budget=VERTEX_BUDGET, mesh=False, max_resolution=100):
+    """This function chooses the resolution of the spheres and cylinders of a 3D graph, so that the whole graph has
+    about vertex_budget vertices. Small molecules get the max_resolution, big ones are drawn with less detail, down
+    to MIN_RESOLUTION.
+
+    Parameters
+    ----------
+    n_atoms : int
+        The number of atoms (spheres) in the graph.
+    n_bonds : int
+        The number of bonds (cylinders) in the graph.
+    vertex_budget : int, default: VERTEX_BUDGET
+        The target number of vertices of the whole graph.
+    mesh : bool, optional
+        If True, the vertices are counted as in mesh_traces(), otherwise as in sphere() and cylinder().
+    max_resolution : int, default: 100
+        The highest resolution returned.
+
+    Returns
+    -------
+    int
+        The resolution.
+
+    """
+    # a sphere has 2 * r ** 2 vertices, a cylinder r ** 2 for Surface traces and 2 * r for meshes (upper bounds for
+    # meshes, whose spheres and cylinders stop getting finer, see sphere_mesh())
+    a = 2 * n_atoms + (0 if mesh else n_bonds)
+    b = 2 * n_bonds if mesh else 0
+    if a:
+        resolution = (math.sqrt(b ** 2 + 4 * a * vertex_budget) - b) / (2 * a)
+    elif b:
+        resolution = vertex_budget / b
+    else:
+        resolution = max_resolution
+    return int(min(max(resolution, MIN_RESOLUTION), max_resolution))
+
+
+@lru_cache(maxsize=None)
+def icosphere(subdivisions=2):
+    """This function builds the triangle mesh of a unit icosphere: an icosahedron whose triangles are split in four
+    subdivisions times, with the new vertices pushed onto the sphere. Its vertices are evenly spread, unlike the
+    ones of a grid sphere that crowd at the poles.
+
+    Parameters
+    ----------
+    subdivisions : int, default: 2
+        The number of times the triangles are split. The mesh has 10 * 4 ** subdivisions + 2 vertices.
+
+    Returns
+    -------
+    tuple
+        A (n_vertices, 3) array with the vertex coordinates and a (n_triangles, 3) array with the vertex indexes of
+        each triangle. The arrays are cached for each number of subdivisions and are read-only.
+
+    """
+    phi = (1 + math.sqrt(5)) / 2
+    vertices = [(-1, phi, 0), (1, phi, 0), (-1, -phi, 0), (1, -phi, 0), (0, -1, phi), (0, 1, phi), (0, -1, -phi),
+                (0, 1, -phi), (phi, 0, -1), (phi, 0, 1), (-phi, 0, -1), (-phi, 0, 1)]
+    faces = [(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4), (11, 10, 2),
+             (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9), (4, 9, 5), (2, 4, 11),
+             (6, 2, 10), (8, 6, 7), (9, 8, 1)]
+    for _ in range(subdivisions):
+        midpoints = {}  # edge -> index of its midpoint, shared by the two triangles of the edge
+
+        def midpoint(a, b):
+            edge = (a, b) if a < b else (b, a)
+            if edge not in midpoints:
+                midpoints[edge] = len(vertices)
+                vertices.append(tuple((p + q) / 2 for p, q in zip(vertices[a], vertices[b])))
+            return midpoints[edge]
+
+        split = []
+        for a, b, c in faces:
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            split.extend(((a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca)))
+        faces = split
+    vertices = np.array(vertices, dtype=float)
+    vertices /= np.linalg.norm(vertices, axis=1, keepdims=True)
+    faces = np.array(faces, dtype=np.int32)
+    vertices.setflags(write=False)
+    faces.setflags(write=False)
+    return vertices, faces
+
+
+def sphere_mesh(resolution=20):
+    """This function returns the triangle mesh of a unit sphere centered in the origin: the icosphere with the most
+    subdivisions, up to MESH_SUBDIVISIONS, that has no more vertices than the grid of sphere() at this resolution.
+
+    Parameters
+    ----------
+    resolution : int, default: 20
+        The resolution of the grid sphere it replaces.
+
+    Returns
+    -------
+    tuple
+        A (n_vertices, 3) array with the vertex coordinates and a (n_triangles, 3) array with the vertex indexes of
+        each triangle, see icosphere().
+
+    """
+    subdivisions = 0
+    while subdivisions < MESH_SUBDIVISIONS and 10 * 4 ** (subdivisions + 1) + 2 <= 2 * resolution ** 2:
+        subdivisions += 1
+    return icosphere(subdivisions)
+
+
+@lru_cache(maxsize=32)
+def cylinder_mesh(resolution=20):
+    """This function builds the triangle mesh of the side of a unit cylinder, of radius 1 along the z-axis from 0 to 1.
+
+    Parameters
+    ----------
+    resolution : int, default: 20
+        The number of points around the circumference, at most MESH_SEGMENTS.
+
+    Returns
+    -------
+    tuple
+        A (n_vertices, 3) array with the vertex coordinates and a (n_triangles, 3) array with the vertex indexes of
+        each triangle. The arrays are cached for each resolution and are read-only.
+
+    """
+    n_theta = min(max(resolution, 6), MESH_SEGMENTS)
+    theta = np.linspace(0, 2 * np.pi, n_theta, endpoint=False)
+    # the side is straight, the two end circles are enough
+    ring = np.stack((np.sin(theta), np.cos(theta)), axis=-1)
+    vertices = np.concatenate((np.column_stack((ring, np.zeros(n_theta))), np.column_stack((ring, np.ones(n_theta)))))
+    a = np.arange(n_theta)
+    b = (a + 1) % n_theta
+    faces = np.concatenate((np.stack((a, a + n_theta, b), axis=-1), np.stack((b, a + n_theta, b + n_theta), axis=-1)))
+    vertices.setflags(write=False)
+    faces.setflags(write=False)
+    return vertices, faces
+
+
+def mesh_traces(positions, bonds, bond_thickness, bond_color, bond_types, radii, colors, symbols, resolution=20):
+    """This function builds the atoms and bonds of a molecule as indexed Mesh3d traces, by placing copies of the unit
+    sphere and cylinder meshes. There is one trace for each element and bond type (one for each color, unless two
+    elements share a color), and the hover label shows the atom or bond index.
+
+    Parameters
+    ----------
+    positions : array
+        A (n_atoms, 3) array with the positions of the atoms.
+    bonds : array
+        A (n_bonds, 2) array with the atom indexes of each bond.
+    bond_thickness : float
+        The radius of the bonds.
+    bond_color : str
+        The hex color of the bonds.
+    bond_types : list
+        The type of each bond, e.g. 'SINGLE'.
+    radii : array
+        The radius of each atom.
+    colors : list
+        The hex color of each atom.
+    symbols : list
+        The symbol of each atom.
+    resolution : int, default: 20
+        The resolution of the sphere and cylinder meshes, see sphere_mesh() and cylinder_mesh(). The meshes stop
+        getting finer above about 20, so the figure stays small at the default resolution of graph_3d.
+
+    Returns
+    -------
+    list
+        A list of plotly.graph_objects.Mesh3d traces.
+
+    """
+    groups = []  # (color, label, indexes, vertices, faces) for each trace
+
+    if len(bonds):
+        unit, unit_faces = cylinder_mesh(resolution)
+        start, end = positions[bonds[:, 0]], positions[bonds[:, 1]]
+        axis = end - start
+        # orthonormal basis of each bond, the helper vector must not be parallel to the axis
+        direction = axis / np.linalg.norm(axis, axis=1, keepdims=True)
+        helper = np.where(np.abs(direction[:, :1]) < 0.9, [[1.0, 0, 0]], [[0, 1.0, 0]])
+        n1 = np.cross(direction, helper)
+        n1 /= np.linalg.norm(n1, axis=1, keepdims=True)
+        n2 = np.cross(direction, n1)
+        vertices = (start[:, None, :] + unit[None, :, 2:] * axis[:, None, :]
+                    + bond_thickness * (unit[None, :, :1] * n1[:, None, :] + unit[None, :, 1:2] * n2[:, None, :]))
+        bond_types = np.asarray(bond_types)
+        for bond_type in dict.fromkeys(bond_types.tolist()):
+            index = np.flatnonzero(bond_types == bond_type)
+            groups.append((bond_color, bond_type, index, vertices[index], unit_faces))
+
+    unit, unit_faces = sphere_mesh(resolution)
+    symbols = np.asarray(symbols)
+    colors = np.asarray(colors)
+    radii = np.asarray(radii)
+    for symbol in dict.fromkeys(symbols.tolist()):
+        index = np.flatnonzero(symbols == symbol)
+        vertices = positions[index, None, :] + radii[index, None, None] * unit[None]
+        groups.append((colors[index[0]], symbol, index, vertices, unit_faces))
+
+    traces = []
+    for color, label, index, vertices, faces in groups:
+        n_shapes, n_vertices = vertices.shape[:2]
+        vertices = vertices.reshape(-1, 3).astype(np.float32)
+        faces = (faces[None] + (np.arange(n_shapes) * n_vertices)[:, None, None]).reshape(-1, 3).astype(np.int32)
+        # atom or bond index of each vertex, shown in the hover label
+        custom = np.repeat(index.astype(np.int32), n_vertices)
+        traces.append(go.Mesh3d(x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
+                                i=faces[:, 0], j=faces[:, 1], k=faces[:, 2], color=color, customdata=custom,
+                                hovertemplate=f'%{{customdata}}: {label}<extra></extra>', name=label,
+                                showlegend=False))
+    return traces
+
+
+def add_atom_svg(src, atom_name, center, radius, color, outline, shadow=True, shadow_curve=1.2, shadow_deg=45,
+                 shadow_light=0.35, shadow_color=None):
+    """It draws a circle, filled with the color, in the svg text. A shadow can be drawn on the circle.
+
+    Parameters
+    ----------
+    src : SvgWriter
+        The svg document.
+    atom_name : str
+        Name of the atom to use defs elements in svg.
+    center : tuple
+        The center of the atom in x-y coordinates.
+    radius : float
+        The radius of the circle.
+    color : string
+        The hex color to fill the circle.
+    outline : float,
+        The thickness of the border of the circle.
+    shadow : bool, default: True
+        Whether to add a shadow or not on the circle.
+    shadow_curve : float, default: 1.2
+        The curve of the shadow. 1.2 is a good value.
+    shadow_deg : float, default: 45
+        The angle in the degree of the shadow start.
+    shadow_light : float, default: 0.35
+        The lightness of the shadow. 0 is black, 1 is white.
+    shadow_color : string, optional
+        The hex color of the shadow and the border, if already known (see Palette). By default, it is the color
+        with the shadow light.
+
+    """
+    add_atom_def(src, atom_name, radius, color, outline, shadow, shadow_curve, shadow_deg, shadow_light, shadow_color)
+    use_atom(src, atom_name, center)
+
+
+def add_atom_def(src, atom_name, radius, color, outline, shadow=True, shadow_curve=1.2, shadow_deg=45,
+                 shadow_light=0.35, shadow_color=None):
+    """It defines the circle of an atom in the svg defs, if it is not defined yet. See add_atom_svg for the
+    parameters."""
+    if not src.has_def(atom_name):  # if not found the def, create the def
+        if shadow_color is None:
+            shadow_color = shadow_color_correction(color, shadow_light)
+        atom_group = [('circle', {'cx': '0', 'cy': '0', 'r': radius, 'fill': color, 'stroke': shadow_color,
+                                  'stroke-width': outline})]
+        if shadow:
+            shadow_rad = radius - outline
+            start_shade = circ_post(-shadow_deg, radius, (0, 0))
+            end_shade = circ_post(-shadow_deg + 180, radius, (0, 0))
+            shadow_rad, curve_rad = src.number(shadow_rad), src.number(radius * shadow_curve)
+            atom_group.append(('path', {
+                'd': f'M{start_shade[0]},{start_shade[1]} A{shadow_rad},{shadow_rad} 0, 1, 1 {end_shade[0]},{end_shade[1]} M{end_shade[0]},{end_shade[1]} A{curve_rad},{curve_rad} 0, 0,0 {start_shade[0]}, {start_shade[1]} Z',
+                'fill': shadow_color, 'stroke-width': '0'}))
+            # # patch to cover line that appears in jpeg and png images with pdf2image
+            # start_patch = circ_post(-shadow_deg, radius - outline, (0, 0))
+            # end_patch = circ_post(-shadow_deg + 180, radius - outline, (0, 0))
+            # patch_elem = ET.Element('path')
+            # patch_elem.set('d', f'M{start_patch[0]},{start_patch[1]} L {end_patch[0]},{end_patch[1]}')
+            # patch_elem.set('stroke', f'{color}')
+            # atom_group.append(patch_elem)
+        src.add_def(atom_name, atom_group)
+
+
+def use_atom(src, atom_name, center):
+    """It draws an atom defined with add_atom_def at the center (x-y coordinates)."""
+    src.element('use', {'href': f'#{atom_name}',  # for browser rendering
+                        'xlink:href': f'#{atom_name}',  # for program rendering (Inkscape, Illustrator, ...)
+                        # create the circle at 0 and translate
+                        'transform': f'translate({src.number(center[0])} {src.number(center[1])})'})
+
+
+def add_bond_svg(src, bond_type, x1, y1, x2, y2, bond_thickness, outline, bondcolor='#575757', shadow_light=0.35,
+                 bond_space_multi=1, radians=None, contour_color=None, classes=None):
+    """It adds a line as a bond to an SVG image.
+    Parameters
+    ----------
+    src : SvgWriter
+        The svg document.
+    bond_type : int
+        The type of the bond. 1 stands for single bond, 2 stands for double bond, 3 stands for triple bond.
+    x1 : float
+        x-coordinate of the first atom.
+    y1 : float
+        y-coordinate of the first atom.
+    x2 : float
+        x-coordinate of the second atom.
+    y2 : float
+        y-coordinate of the second atom.
+    bond_thickness: float
+        The thickness of the bond line.
+    outline : float,
+        The thickness of the border of the bond.
+    bondcolor : string, default: '#575757'
+        The hex color of the bond.
+    shadow_light : float, default: 0.35
+        The lightness of the shadow. 0 is black, 1 is white.
+    bond_space_multi : float, default: 1
+        Bond spacing multiplier.
+    radians : float, optional
+        The angle perpendicular to the bond, if already known (see bond_angle).
+    contour_color : string, optional
+        The hex color of the border of the bond, if already known (see Palette). By default, it is the bond color
+        with the shadow light.
+    classes : tuple, optional
+        The CSS classes (border, bond) defining the stroke of the lines, see bond_classes. By default, each line is
+        written with its stroke attributes.
+
+    """
+    start = np.array((x1, y1))
+    end = np.array((x2, y2))
+    d_space = bond_thickness * 1.5 * bond_space_multi
+    t_space = bond_thickness * 2.5 * bond_space_multi
+    if radians is None:
+        radians = bond_angle(x1, y1, x2, y2)
+    if contour_color is None:
+        contour_color = shadow_color_correction(bondcolor, shadow_light)
+
+    def dist_point(point, spacer):
+        """This function takes a point and a spacer distance. It returns two points that have a distance
+        equal to the spacer on the direction defined by the radians parent variable.
+        Parameters
+        ----------
+        point : tuple
+            A tuple of the x and y coordinates of the point.
+        spacer : float
+            The distance between the points.
+        Returns
+        -------
+        tuple
+            Two points with a spacer distance from point on the radian angle direction.
+        """
+        dist_x = int(math.cos(radians) * spacer)
+        dist_y = int(math.sin(radians) * spacer)
+        # y-axis is reversed in images
+        pt1 = point + np.array((dist_x, -dist_y))
+        pt2 = point - np.array((dist_x, -dist_y))
+        return pt1, pt2
+
+    def add_bond(p, q, thick=bond_thickness, color=bondcolor, style=1):
+        """It adds a bond between two points.
+        Parameters
+        ----------
+        p : tuple
+            The first point.
+        q : tuple
+            The second point.
+        thick : float, default: 1
+            The thickness of the line.
+        color : str, default: bondcolor
+            The hex code for the color of the bond.
+        style : int, default: 1
+            The index of the CSS class of the line in classes, 0 for the border and 1 for the bond.
+        """
+        if classes:
+            src.element('line', {'class': classes[style], 'x1': p[0], 'y1': p[1], 'x2': q[0], 'y2': q[1]})
+        else:
+            src.element('line', {'stroke': color, 'stroke-linecap': "round", 'stroke-width': thick,
+                                 'x1': p[0], 'y1': p[1], 'x2': q[0], 'y2': q[1]})
+
+    if bond_type == 2:
+        start_1, start_2 = dist_point(start, d_space)
+        end_1, end_2 = dist_point(end, d_space)
+        add_bond(start_1, end_1, outline, contour_color, 0)
+        add_bond(start_2, end_2, outline, contour_color, 0)
+        add_bond(start_1, end_1)
+        add_bond(start_2, end_2)
+    else:
+        add_bond(start, end, outline, contour_color, 0)
+        add_bond(start, end)
+    if bond_type == 3:
+        start_1, start_2 = dist_point(start, t_space)
+        end_1, end_2 = dist_point(end, t_space)
+        add_bond(start_1, end_1, outline, contour_color, 0)
+        add_bond(start_2, end_2, outline, contour_color, 0)
+        add_bond(start_1, end_1)
+        add_bond(start_2, end_2)
+
+
+def bond_classes(src, bond_thickness, outline, bondcolor='#575757', contour_color='#575757'):
+    """It defines the CSS classes of the bond borders and of the bonds in the svg document, so that the bond lines
+    only carry their coordinates. It returns the class names to pass to add_bond_svg."""
+    src.add_class(BOND_CLASSES[0], {'stroke': contour_color, 'stroke-linecap': 'round', 'stroke-width': outline})
+    src.add_class(BOND_CLASSES[1], {'stroke': bondcolor, 'stroke-linecap': 'round', 'stroke-width': bond_thickness})
+    return BOND_CLASSES
+
+
+def bond_angle(x1, y1, x2, y2):
+    """It returns the angle (in radians) perpendicular to the bond line, used to space double and triple bonds."""
+    # calculate the degree of the bond line, y-axis is reversed in images
+    return math.atan2(-y1 + y2, x1 - x2) + math.pi / 2  # add 90 degree to make the angle perpendicular
+
+
+def add_emoji(src, xy, size, unicode, color=True, store=None):
+    """This function a svg source and insert the unicode emoji in position xy with roughly dimension size.
+
+    Parameters
+    ----------
+    src : SvgWriter
+        The svg document.
+    xy : tuple,
+        Tuple containing x and y coordinates of the atom to replace.
+    size : float
+        The size of the atom to replace.
+    unicode : str
+        The unicode string of the emoji.
+    color : bool, default: True
+        Whether to use a colored or black emoji.
+    store : EmojiStore, optional
+        The store of the emojis, default_emoji_store() by default.
+
+    """
+    unicode = unicode.strip()  # just to make sure
+    emoji_id = 'Emoji' + unicode # id cannot start with a digit
+    # parsed once and shared by every icon, downloaded only if not stored locally
+    emoji_text, emoji_dim = (store or default_emoji_store()).get(unicode, color)
+    if not src.has_def(emoji_id):  # if not found the def, create the def
+        src.add_raw_def(emoji_id, emoji_text)
+    scale_x = size / emoji_dim[2] * 3  # *3 because otherwise square emojis could be small
+    scale_y = size / emoji_dim[3] * 3  # *3 because otherwise square emojis could be small
+    trans_x = xy[0] - emoji_dim[2] * scale_x / 2
+    trans_y = xy[1] - emoji_dim[3] * scale_y / 2
+    src.element('use', {'href': '#' + emoji_id,  # for browser rendering
+                        'xlink:href': '#' + emoji_id,  # for program rendering (Inkscape, Illustrator, ...)
+                        # the scale is kept at full precision, it is much smaller than the coordinates
+                        'transform': f'translate({src.number(trans_x)} {src.number(trans_y)}) '
+                                     f'scale({scale_x} {scale_y})'})
+
+
+def partial_sanitize(mol):
+    """This function takes a molecule, computes ring/valence and sanitize it partially.
+    Based on https://sourceforge.net/p/rdkit/mailman/message/32599798/
+
+    Parameters
+    ----------
+    mol : rdkit molecule object.
+        RDKIT object for a molecule
+
+    """
+    # Generates properties like implicit valence and ring information.
+    mol.UpdatePropertyCache(strict=False)
+    Chem.SanitizeMol(mol,
+                     Chem.SanitizeFlags.SANITIZE_FINDRADICALS | Chem.SanitizeFlags.SANITIZE_KEKULIZE | Chem.SanitizeFlags.SANITIZE_SETAROMATICITY | Chem.SanitizeFlags.SANITIZE_SETCONJUGATION | Chem.SanitizeFlags.SANITIZE_SETHYBRIDIZATION | Chem.SanitizeFlags.SANITIZE_SYMMRINGS,
+                     catchErrors=True)
+
+
+@traced()
+def parse_structure(smiles, nice_conformation=True, dimension_3=False, n_conf=1, force_field='UFF',
+                    randomseed=-1, cache=None, num_threads=0):
+    """This function takes a SMILES string and returns molecule object that hase been prepared.
+
+    Parameters
+    ----------
+    smiles : string
+        The SMILES string of the molecule you want to draw.
+    nice_conformation : bool, default: True
+        If True, the molecule will be put into a nice conformation.
+    dimension_3 : bool, optional
+        If True, it will embed and optimize a 3D structure of the molecule.
+    n_conf : int, default: 1
+        The number of 3D conformations to generate. The conformations are sorted by energy, so conformation 0 is the
+        one with the lowest energy, see conformer_energies().
+    force_field : str, default: 'UFF'
+        The force field to optimize of the 3D conformation. Force fields currently supported: 'UFF' and 'MMFF'.
+    randomseed: int, optional
+        The value of the random seed to generate conformations.
+    cache : ConformerCache, optional
+        If given, the prepared molecule is looked up in the cache and stored there after a miss. The molecule is then
+        built from its canonical SMILES, so equivalent inputs (e.g. 'O' and '[H]O[H]') give the same cached molecule.
+        The cache is not used for random 3D structures (negative randomseed), which must differ at every call.
+    num_threads : int, default: 0
+        The number of threads used to embed and optimize the 3D conformations, 0 uses all the cores. The result does
+        not depend on it.
+
+    Returns
+    -------
+    mol object
+        A rdkit molecule object.
+
+    """
+    with span('sanitize'):
+        mol = Chem.MolFromSmiles(smiles, sanitize=False)  # read the molecule
+        if mol is None:
+            raise ValueError(f'Invalid SMILES ({smiles})')
+        partial_sanitize(mol)  # partial sanitization
+    if cache is None or (dimension_3 and randomseed < 0):
+        return prepare_structure(mol, nice_conformation, dimension_3, n_conf, force_field, randomseed, num_threads)
+
+    smiles = Chem.MolToSmiles(Chem.RemoveHs(mol, sanitize=False))  # canonical SMILES, hydrogens are added back later
+    key = conformer_key(smiles, dimension_3, nice_conformation, n_conf, force_field, randomseed)
+    with span('conformer_cache', dimension=3 if dimension_3 else 2) as record:
+        cached = cache.get(key)
+        record['attrs']['hit'] = cached is not None
+    if cached is not None:
+        return cached
+    with span('sanitize'):
+        mol = Chem.MolFromSmiles(smiles, sanitize=False)
+        partial_sanitize(mol)
+    mol = prepare_structure(mol, nice_conformation, dimension_3, n_conf, force_field, randomseed, num_threads)
+    cache.put(key, mol)
+    return mol
+
+
+def prepare_structure(mol, nice_conformation=True, dimension_3=False, n_conf=1, force_field='UFF', randomseed=-1,
+                      num_threads=0):
+    """This function takes a partially sanitized molecule, adds the hydrogens and computes its 2D or 3D coordinates.
+    See parse_structure() for the parameters.
+
+    Returns
+    -------
+    mol object
+        A rdkit molecule object.
+
+    """
+    with span('add_hs'):
+        mol = Chem.AddHs(mol)  # add Hydrogens
+    # build with 3D structure
+    if dimension_3:
+        # rdkit seeds the i-th conformation with randomseed * (i + 1): with 0 every conformation would be the same.
+        # Seed 1 starts from the same first conformation.
+        if randomseed == 0 and n_conf > 1:
+            randomseed = 1
+        with span('embed', atoms=mol.GetNumAtoms(), n_conf=n_conf) as record:
+            build = AllChem.EmbedMultipleConfs(mol, numConfs=n_conf, randomSeed=randomseed, numThreads=num_threads)
+            if len(build) == 0:  # big molecules, e.g. peptides, often embed only starting from random coordinates
+                record['attrs']['random_coords'] = True
+                build = AllChem.EmbedMultipleConfs(mol, numConfs=n_conf, randomSeed=randomseed,
+                                                   numThreads=num_threads, useRandomCoords=True)
+            if len(build) == 0:
+                raise ValueError('Embedding 3D conformation failed')
+        results = None
+        with span('optimize', atoms=mol.GetNumAtoms(), n_conf=len(build), force_field=force_field):
+            if force_field == 'UFF':
+                results = AllChem.UFFOptimizeMoleculeConfs(mol, numThreads=num_threads)
+            elif force_field == 'MMFF':
+                results = AllChem.MMFFOptimizeMoleculeConfs(mol, numThreads=num_threads)
+        # (-1, -1) means that the force field has no parameters for the molecule, the conformations are not optimized
+        if results and all(converged != -1 for converged, _ in results):
+            rank_conformers(mol, results)
+        return mol
+
+    # build with 2D structure
+    with span('depict', atoms=mol.GetNumAtoms(), coordgen=bool(nice_conformation)):
+        if nice_conformation:
+            rdDepictor.SetPreferCoordGen(True)  # rdCoordGen conformation as default
+            rdCoordGen.AddCoords(mol)  # better conformation for macrocycle
+        else:
+            rdDepictor.SetPreferCoordGen(False)  # rdkit conformation default
+            AllChem.Compute2DCoords(mol)  # canonical rdkit conformation
+        mol = rdkit.Chem.Draw.rdMolDraw2D.PrepareMolForDrawing(mol)  # clean the conformer
+    return mol
+
+
+def rank_conformers(mol, results):
+    """This function sorts the conformations of a molecule by energy, in place. The conformation ids become 0, 1, ...
+    from the lowest energy, and each conformation stores its 'energy' and whether the optimization 'converged'.
+
+    Parameters
+    ----------
+    mol : mol object
+        The rdkit mol object with the optimized conformations.
+    results : list
+        The (not_converged, energy) tuple of each conformation, as returned by the rdkit force field optimizers.
+
+    """
+    conformers = [Chem.Conformer(conf) for conf in mol.GetConformers()]
+    mol.RemoveAllConformers()
+    for new_id, index in enumerate(sorted(range(len(results)), key=lambda i: results[i][1])):
+        conf = conformers[index]
+        conf.SetId(new_id)
+        conf.SetDoubleProp('energy', results[index][1])
+        conf.SetBoolProp('converged', results[index][0] == 0)
+        mol.AddConformer(conf, assignId=False)
+
+
+def conformer_energies(mol):
+    """This function returns the force field energy of each conformation of a molecule, in kcal/mol.
+
+    Parameters
+    ----------
+    mol : mol object or MoleculeRecord
+        The rdkit mol object returned by parse_structure(), or its record.
+
+    Returns
+    -------
+    array
+        The energy of each conformation, in the conformation order. It is NaN for the conformations without energy,
+        e.g. 2D structures.
+
+    """
+    if isinstance(mol, MoleculeRecord):
+        return mol.energies
+    return np.array([conf.GetDoubleProp('energy') if conf.HasProp('energy') else np.nan
+                     for conf in mol.GetConformers()])
+
+
+def build_svg(mol, atom_radius=100, atom_color=color_map, radius_multi=atom_resize, pos_multi=300,
+              shadow_light=0.35, shadow=False, single_bonds=False, conformation=0, verbose=False,
+              rotation=(0, 0, 0), emoji=None, palette=None, compact=False, precision=None):
+    """This function takes a SMILES string and returns an icon of the molecule, in format PNG, SVG, JPEG, and PDF.
+
+    Parameters
+    ----------
+    mol : mol object or MoleculeRecord
+        The rdkit mol object representing a molecule, or its record.
+    atom_radius : int, default: 100
+        The radius of the atoms in the icon.
+    atom_color : dictionary, default: color_map
+        a dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
+    radius_multi : dictionary, default: atom_resize
+        A dictionary containing the multiplier for each atom, bond and outline. It multiplies the atom radius, bond and
+        outline thickness.
+    pos_multi : int, default: 300
+        This is the distance between atoms.
+    shadow_light : float, default: 0.35
+        How light the shadow is. 0.35 is a good value.
+    shadow : bool, optional
+        Whether to add a shadow to the image or not.
+    single_bonds : bool, optional
+        If True, all bonds will be single bonds.
+    conformation : int, default: 0
+        The conformation to draw.
+    verbose : bool, optional
+        Prints out the atoms and bonds coordinates.
+    rotation : tuple, default: (0,0,0)
+        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
+    emoji : dictionary, optional
+        A dictionary the string containing atom index as key, and as value a list containing the unicode
+        identifier of an emoji and whether it is colored or black emoji.
+    palette : Palette, optional
+        The compiled colors and sizes, see compile_palette(). It replaces atom_color, radius_multi and shadow_light.
+    compact : bool, optional
+        Write the bond strokes as CSS classes and round the numbers, see style_svg.
+    precision : int, optional
+        The maximum number of decimals of the coordinates and sizes, see style_svg.
+
+    Returns
+    -------
+    SvgWriter
+        The svg document of the icon.
+
+    """
+    geometry = icon_geometry(mol, pos_multi, single_bonds, conformation, rotation)
+    return style_svg(geometry, atom_radius=atom_radius, atom_color=atom_color, radius_multi=radius_multi,
+                     shadow_light=shadow_light, shadow=shadow, verbose=verbose, emoji=emoji, palette=palette,
+                     compact=compact, precision=precision)
+
+
+class IconGeometry:
+    """The part of an icon that depends only on the molecule, its conformation, the rotation and the distance between
+    atoms. It is built by icon_geometry() and drawn by style_svg().
+
+    Attributes
+    ----------
+    max_pos : float
+        The maximum absolute coordinate of the atoms.
+    draw_list : list
+        For each atom, in drawing order (z-axis order), a tuple (atom index, symbol, x, y, bonds). The bonds are drawn
+        before the atom, and each one is a tuple (rdkit bond type, atom index 1, atom index 2, number of lines, x1, y1,
+        x2, y2, radians perpendicular to the bond). The y-axis is already inverted as in the image.
+    symbols : list
+        The symbols of the atoms, in order of first appearance in the draw list.
+    fragments : OrderedDict
+        The svg bodies (bonds and atoms) already drawn, for each bond style. Filled by style_svg().
+
+    """
+    __slots__ = ('max_pos', 'draw_list', 'symbols', 'fragments')
+
+    def __init__(self, max_pos, draw_list):
+        self.max_pos = max_pos
+        self.draw_list = draw_list
+        self.symbols = list(dict.fromkeys(symbol for _, symbol, _, _, _ in draw_list))
+        self.fragments = OrderedDict()
+
+
+# number of geometries and bond styles kept for each geometry
+GEOMETRY_CACHE_ENTRIES = 32
+FRAGMENT_CACHE_ENTRIES = 8
+_geometry_cache = OrderedDict()
+_geometry_lock = threading.Lock()
+
+
+def icon_geometry(mol, pos_multi=300, single_bonds=False, conformation=0, rotation=(0, 0, 0)):
+    """This function computes the geometry of an icon: the atom centers, the drawing order and the bond lines with
+    their number of lines (single, double or triple). Geometries are cached for the last GEOMETRY_CACHE_ENTRIES
+    molecules and parameters, so restyling an icon does not compute them again.
+
+    Parameters
+    ----------
+    mol : mol object or MoleculeRecord
+        The rdkit mol object representing a molecule, or its record, see molecule_record().
+    pos_multi : int, default: 300
+        This is the distance between atoms.
+    single_bonds : bool, optional
+        If True, all bonds will be single bonds.
+    conformation : int, default: 0
+        The conformation to draw.
+    rotation : tuple, default: (0,0,0)
+        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
+
+    Returns
+    -------
+    IconGeometry
+        The geometry of the icon, shared by every caller: it must not be modified.
+
+    """
+    molecule = molecule_record(mol)
+    with span('geometry', atoms=len(molecule)) as record:
+        key = (molecule.key, pos_multi, bool(single_bonds), conformation, tuple(rotation))
+        with _geometry_lock:
+            geometry = _geometry_cache.get(key)
+            if geometry is not None:
+                _geometry_cache.move_to_end(key)
+        record['attrs']['hit'] = geometry is not None
+        if geometry is not None:
+            return geometry
+        geometry = _build_geometry(molecule, pos_multi, single_bonds, conformation, rotation)
+    with _geometry_lock:
+        _geometry_cache[key] = geometry
+        while len(_geometry_cache) > GEOMETRY_CACHE_ENTRIES:
+            _geometry_cache.popitem(last=False)
+    return geometry
+
+
+def clear_caches():
+    """This function empties the caches of the icon pipeline: the molecule records, the geometries and the styled
+    fragments kept with each geometry. The next icon of every molecule is then built from scratch."""
+    with _geometry_lock:
+        _geometry_cache.clear()
+    clear_records()
+
+
+def _build_geometry(record, pos_multi, single_bonds, conformation, rotation):
+    # positions are already scaled according to the image
+    positions, max_pos = record.positions(conformation, rotation, pos_multi)
+    begin, end = record.bonds['begin'].tolist(), record.bonds['end'].tolist()
+    # number of lines of each bond, the aromatic double bonds are assigned once in the record
+    lines = [1] * len(begin) if single_bonds else record.bonds['lines'].tolist()
+    names = record.bond_names
+    symbols = record.symbols
+    bond_ptr, atom_bonds = record.bond_ptr, record.atom_bonds
+    bond_done = np.zeros(len(begin), dtype=bool)
+    # the y-axis is inverted in an image
+    coords = np.column_stack((positions[:, 0], -positions[:, 1])).tolist()
+    # order the atoms according to the z-axis
+    atom_order = np.argsort(positions[:, 2], kind='stable').tolist()
+    draw_list = []
+    for atom_idx in atom_order:
+        atom_bond_list = []
+        # add atom bonds before the atom icon
+        for bond_idx in atom_bonds[bond_ptr[atom_idx]:bond_ptr[atom_idx + 1]].tolist():
+            if bond_done[bond_idx]:
+                continue
+            idx1, idx2 = begin[bond_idx], end[bond_idx]
+            x1, y1 = coords[idx1]
+            x2, y2 = coords[idx2]
+            atom_bond_list.append((names[bond_idx], idx1, idx2, lines[bond_idx], x1, y1, x2, y2,
+                                   bond_angle(x1, y1, x2, y2)))
+            bond_done[bond_idx] = True
+        draw_list.append((atom_idx, symbols[atom_idx], coords[atom_idx][0], coords[atom_idx][1], atom_bond_list))
+    return IconGeometry(max_pos, draw_list)
+
+
+def atom_emoji(emoji, atom_idx, symbol):
+    """It returns the (unicode, color) tuple of the emoji drawn in place of an atom, or None to draw the atom. An
+    emoji set for the atom index has priority over the one set for its element."""
+    for key in (atom_idx, symbol):
+        if key in emoji and emoji[key][0] and emoji[key][0].strip() != '':
+            return emoji[key][0], emoji[key][1]
+    return None
+
+
+@traced('svg_build')
+def style_svg(geometry, atom_radius=100, atom_color=color_map, radius_multi=atom_resize, shadow_light=0.35,
+              shadow=False, verbose=False, emoji=None, palette=None, compact=False, precision=None):
+    """This function draws an icon geometry with the given style. The atoms are drawn as <use> of one definition for
+    each element, so the colors and sizes of the atoms only change the defs. The body with the bonds and atoms is
+    cached in the geometry for each bond style: changing the atom colors or sizes does not draw it again.
+
+    Parameters
+    ----------
+    geometry : IconGeometry
+        The geometry returned by icon_geometry().
+    atom_radius : int, default: 100
+        The radius of the atoms in the icon.
+    atom_color : dictionary, default: color_map
+        a dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
+    radius_multi : dictionary, default: atom_resize
+        A dictionary containing the multiplier for each atom, bond and outline. It multiplies the atom radius, bond and
+        outline thickness.
+    shadow_light : float, default: 0.35
+        How light the shadow is. 0.35 is a good value.
+    shadow : bool, optional
+        Whether to add a shadow to the image or not.
+    verbose : bool, optional
+        Prints out the atoms and bonds coordinates.
+    emoji : dictionary, optional
+        A dictionary the string containing atom index as key, and as value a list containing the unicode
+        identifier of an emoji and whether it is colored or black emoji.
+    palette : Palette, optional
+        The compiled colors and sizes, see compile_palette(). It replaces atom_color, radius_multi and shadow_light.
+    compact : bool, optional
+        If True, the stroke of the bonds is written once as CSS classes instead of on every line, and the numbers are
+        rounded to COMPACT_PRECISION decimals unless precision is given.
+    precision : int, optional
+        The maximum number of decimals of the coordinates and sizes. By default, they are written in full.
+
+    Returns
+    -------
+    SvgWriter
+        The svg document of the icon.
+
+    """
+    if palette is None:
+        palette = compile_palette(atom_color, radius_multi, shadow_light)
+    if compact and precision is None:
+        precision = COMPACT_PRECISION
+    colors, sizes = palette.colors, palette.sizes
+    max_radius_multi = atom_radius * palette.max_size
+    # the dimension is calculated considering the maximum position, the atom diameter and multiplying by two (the
+    # dimension is half of the image size
+    dim = geometry.max_pos + max_radius_multi * 2
+    # setting svg attributes
+    view_box = ' '.join(format_number(value, precision) for value in (-dim, -dim, dim * 2, dim * 2))
+    svg = SvgWriter({'id': "molecule_icon", 'viewBox': view_box,
+                     'xmlns': "http://www.w3.org/2000/svg", 'xmlns:xlink': "http://www.w3.org/1999/xlink"},
+                    precision=precision)
+    background = colors['Background']
+    # add background if it is not white
+    if background and background != '#ffffff':
+        svg.element('rect', {'id': "background", 'x': -dim, 'y': -dim,
+                             'height': "101%",  # 101 to make sure covers the whole background
+                             'width': "101%", 'fill': background})
+    svg.start_defs()  # add defs to save space for repeated atoms and icons
+    # add atoms (to start from the Hydrogens, the atom index must be reversed)
+    if verbose:
+        print('\nAtom-index\tSymbol\tx\ty')
+        print('\nBond-type\tAtom1\tAtom2')
+        for atom_idx, symbol, atom_x, atom_y, atom_bond_list in geometry.draw_list:
+            symbol = symbol if symbol in colors else 'other'
+            print(f"Atom\t{atom_idx}\t{symbol}\t{atom_x}\t{atom_y}")
+            for b_type, idx1, idx2, *_ in atom_bond_list:
+                print(f"Bond\t{b_type}\t{idx1}\t{idx2}")
+    bond_thickness = atom_radius * sizes['Bond'] / 4
+    bond_outline = bond_thickness + atom_radius * sizes['Outline'] / 5
+    outline = atom_radius * sizes['Outline'] / 10
+    if 'Bond spacing' in sizes and sizes['Bond spacing']:
+        bond_space_multi = sizes['Bond spacing']
+    else:
+        bond_space_multi = 1
+    bond_style = (bond_thickness, bond_outline, colors['Bond'], palette.contour, bond_space_multi)
+    classes = None
+    if compact:
+        classes = bond_classes(svg, bond_thickness, bond_outline, colors['Bond'], palette.contour)
+
+    def draw_bonds(src, atom_bond_list):
+        for _, _, _, bond_type, x1, y1, x2, y2, radians in atom_bond_list:
+            add_bond_svg(src, bond_type, x1, y1, x2, y2, bond_thickness, bond_outline, bondcolor=colors['Bond'],
+                         bond_space_multi=bond_space_multi, radians=radians, contour_color=palette.contour,
+                         classes=classes)
+
+    if emoji:
+        atom_emojis = [atom_emoji(emoji, atom_idx, symbol if symbol in colors else 'other')
+                       for atom_idx, symbol, _, _, _ in geometry.draw_list]
+        # download all the missing emojis at once, before drawing
+        store = default_emoji_store()
+        with span('emoji_prefetch'):
+            store.prefetch(unicode_color for unicode_color in atom_emojis if unicode_color)
+        # emojis are defined when first used, and their size depends on the style
+        for (atom_idx, symbol, atom_x, atom_y, atom_bond_list), unicode_color in zip(geometry.draw_list, atom_emojis):
+            name, color, shadow_color, size = palette.style(symbol)
+            draw_bonds(svg, atom_bond_list)
+            corrected_radius = atom_radius * size  # resize the atom dimension
+            if unicode_color:
+                add_emoji(svg, (atom_x, atom_y), corrected_radius, unicode=unicode_color[0], color=unicode_color[1],
+                          store=store)
+            else:
+                add_atom_svg(svg, name, (atom_x, atom_y), corrected_radius, color, outline, shadow=shadow,
+                             shadow_color=shadow_color)
+        return svg
+
+    # elements missing in the colors are drawn as 'other'
+    others = frozenset(symbol for symbol in geometry.symbols if symbol not in colors)
+    for symbol in dict.fromkeys('other' if symbol in others else symbol for symbol in geometry.symbols):
+        name, color, shadow_color, size = palette.style(symbol)
+        add_atom_def(svg, name, atom_radius * size, color, outline, shadow=shadow, shadow_color=shadow_color)
+    key = (bond_style, others, compact, precision)
+    with _geometry_lock:
+        body = geometry.fragments.get(key)
+        if body is not None:
+            geometry.fragments.move_to_end(key)
+    if body is None:
+        body = SvgWriter({}, precision=precision)
+        body.start_defs()
+        for atom_idx, symbol, atom_x, atom_y, atom_bond_list in geometry.draw_list:
+            draw_bonds(body, atom_bond_list)
+            use_atom(body, 'other' if symbol in others else symbol, (atom_x, atom_y))
+        with _geometry_lock:
+            geometry.fragments[key] = body
+            while len(geometry.fragments) > FRAGMENT_CACHE_ENTRIES:
+                geometry.fragments.popitem(last=False)
+    svg.extend(body)
+    return svg
+
+
+def rdkit_svg_text(mol, size=300):
+    """It draws the molecule with the default RDKit drawer.
+
+    Parameters
+    ----------
+    mol : mol object
+        The rdkit mol object representing a molecule.
+    size : int, default: 300
+        The width and height of the image.
+
+    Returns
+    -------
+    string
+        The svg text of the RDKit image.
+
+    """
+    drawer = rdMolDraw2D.MolDraw2DSVG(size, size)
+    drawer.DrawMolecule(mol)
+    drawer.FinishDrawing()
+    return drawer.GetDrawingText()
+
+
+def svg_to_bytes(svg, indent=True):
+    """It serializes the svg document returned by build_svg.
+
+    Parameters
+    ----------
+    svg : SvgWriter
+        The svg document.
+    indent : bool, default: True
+        Whether to indent the elements with tabs. Without indentation the output is smaller and faster to write.
+
+    Returns
+    -------
+    bytes
+        The utf-8 encoded svg text.
+
+    """
+    with span('serialize', indent=bool(indent)) as record:
+        data = svg.to_bytes('\t' if indent else None)
+        record['attrs']['bytes'] = len(data)
+    return data
+
+
+def export_icon(svg, formats=('svg',), raster_backend='native', dpi=200, emoji=None, pretty=True):
+    """It converts the svg document returned by build_svg into the requested file formats, in memory.
+
+    Parameters
+    ----------
+    svg : SvgWriter
+        The svg document.
+    formats : iterable, default: ('svg',)
+        The formats to produce, among 'svg', 'svgz' (gzip compressed svg), 'pdf', 'png' and 'jpeg'.
+    raster_backend : str, default: 'native'
+        How PNG and JPEG images are produced. 'native' draws the icon directly in memory, 'poppler' converts the
+        SVG to PDF and rasterizes it with pdf2image. Icons with emojis always use 'poppler'.
+    dpi : float, default: 200
+        The resolution of the PNG and JPEG images.
+    emoji : dictionary, optional
+        The emoji dictionary used to build the svg.
+    pretty : bool, default: True
+        Whether to indent the svg text.
+
+    Returns
+    -------
+    dictionary
+        A dictionary with the format as key and the file content (bytes) as value.
+
+    """
+    formats = set(formats)
+    raster = formats & {'png', 'jpeg'}
+    # the native rasterizer does not draw the nested emoji svg
+    poppler = raster_backend == 'poppler' or bool(emoji)
+    outputs = dict()
+    svg_data = svg_to_bytes(svg, indent=pretty)
+    if 'svg' in formats:
+        outputs['svg'] = svg_data
+    if 'svgz' in formats:
+        with span('svgz'):
+            # without timestamp, the same icon is always compressed to the same bytes
+            outputs['svgz'] = gzip.compress(svg_data, mtime=0)
+    pdf_data = None
+    if 'pdf' in formats or (raster and poppler):
+        with span('pdf'):
+            drawing = svg2rlg(BytesIO(svg_data))
+            pdf_data = renderPDF.drawToString(drawing)
+        if 'pdf' in formats:
+            outputs['pdf'] = pdf_data
+    if raster:
+        with span('raster', backend='poppler' if poppler else 'native', dpi=dpi, formats=sorted(raster)):
+            if poppler:
+                image = convert_from_bytes(pdf_data, dpi=dpi)[0]
+            else:
+                image = rasterize_svg(svg_data, dpi=dpi)
+            for form in raster:
+                buffer = BytesIO()
+                image.save(buffer, form.upper())
+                outputs[form] = buffer.getvalue()
+    return outputs
+
+
+def _icon_svg(mol, remove_H=True, emoji=None, **kwargs):
+    """Remove the hydrogens and build the svg icon, returning the record of the drawn molecule."""
+    record = molecule_record(mol)
+    if remove_H:
+        record = record.without_hydrogens()  # remove not chiral Hydrogen
+    return record, build_svg(record, emoji=emoji, **kwargs)
+
+
+def _rdkit_outputs(record, rdkit_png=False, rdkit_svg=False, emoji=None):
+    """Draw the RDKit PNG and SVG images in memory, the Mol is only rebuilt from the record for them."""
+    outputs = dict()
+    if not (rdkit_png or rdkit_svg):
+        return outputs
+    mol = record.to_mol()
+    # Draw indices if emojis are present, otherwise clear the atom mapping
+    for atom in mol.GetAtoms():
+        atom.SetAtomMapNum(atom.GetIdx() if emoji else 0)
+    if rdkit_png:
+        buffer = BytesIO()
+        rdkit.Chem.Draw.MolToImage(mol).save(buffer, 'PNG')
+        outputs['rdkit_png'] = buffer.getvalue()
+    if rdkit_svg:
+        outputs['rdkit_svg'] = rdkit_svg_text(mol).encode('utf-8')
+    return outputs
+
+
+@traced()
+def render_icon(mol, formats=('svg',), rdkit_png=False, rdkit_svg=False, atom_color=color_map, atom_radius=100,
+                radius_multi=atom_resize, pos_multi=300, single_bonds=False, remove_H=True, shadow=True,
+                shadow_light=0.35, verbose=False, rotation=(0, 0, 0), emoji=None, raster_backend='native', dpi=200,
+                pretty=True, conformation=0, palette=None, compact=False, precision=None):
+    """This function takes a molecule and returns its icon in the requested formats, without touching the
+    filesystem.
+
+    Parameters
+    ----------
+    mol : mol object or MoleculeRecord
+        The rdkit mol object representing a molecule, or its record.
+    formats : iterable, default: ('svg',)
+        The formats to produce, among 'svg', 'svgz', 'pdf', 'png' and 'jpeg'.
+    rdkit_png : bool, optional
+        If True, will also produce the RDKit PNG image of the default structure, with the 'rdkit_png' key.
+    rdkit_svg : bool, optional
+        If True, will also produce the RDKit SVG image of the default structure, with the 'rdkit_svg' key.
+    atom_color : dictionary, default: color_map
+        A dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
+    atom_radius : int, default: 100
+        The radius of the atoms in the icon.
+    radius_multi : dictionary, default: atom_resize
+        A dictionary containing the multiplier for each atom. It multiplies the atom radius.
+    pos_multi : int, default: 300
+        This is the distance between atoms.
+    single_bonds : bool, optional
+        If True, all bonds will be single bonds.
+    remove_H : bool, optional
+        Remove all non-chiral hydrogen from the molecule.
+    shadow : bool, optional
+        Whether to add a shadow to the image or not.
+    shadow_light : float, default: 0.35
+        How light the shadow is. 0.35 is a good value.
+    verbose : bool, optional
+        Prints out the atoms coordinates.
+    rotation : tuple, default: (0,0,0)
+        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
+    emoji : dictionary, optional
+        A dictionary the string containing atom index as key, and as value a list containing the unicode
+        identifier of an emoji and whether it is colored or black emoji.
+    raster_backend : str, default: 'native'
+        How PNG and JPEG images are produced, see export_icon.
+    dpi : float, default: 200
+        The resolution of the PNG and JPEG images.
+    pretty : bool, default: True
+        Whether to indent the svg text. The compact svg is never indented.
+    palette : Palette, optional
+        The compiled colors and sizes, see compile_palette(). It replaces atom_color, radius_multi and shadow_light.
+    compact : bool, optional
+        If True, the svg is written without whitespace, with the bond strokes as CSS classes and with rounded
+        numbers, see style_svg.
+    precision : int, optional
+        The maximum number of decimals of the coordinates and sizes, COMPACT_PRECISION in compact mode. By default,
+        they are written in full.
+
+    Returns
+    -------
+    dictionary
+        A dictionary with the format as key and the file content (bytes) as value.
+
+    """
+    record, svg = _icon_svg(mol, atom_color=atom_color, atom_radius=atom_radius, radius_multi=radius_multi,
+                            pos_multi=pos_multi, single_bonds=single_bonds, remove_H=remove_H, shadow=shadow,
+                            shadow_light=shadow_light, verbose=verbose, rotation=rotation, emoji=emoji,
+                            conformation=conformation, palette=palette, compact=compact, precision=precision)
+    outputs = export_icon(svg, formats, raster_backend=raster_backend, dpi=dpi, emoji=emoji,
+                          pretty=pretty and not compact)
+    outputs.update(_rdkit_outputs(record, rdkit_png, rdkit_svg, emoji))
+    return outputs
+
+
+@traced()
+def icon_print(mol, name='molecule_icon', directory=os.getcwd(), rdkit_png=False, rdkit_svg=False, save_svg=True,
+               save_png=False, save_jpeg=False, save_pdf=False, atom_color=color_map, atom_radius=100,
+               radius_multi=atom_resize, pos_multi=300, single_bonds=False, remove_H=True,
+               shadow=True, shadow_light=0.35, verbose=False, rotation=(0, 0, 0), emoji=None, raster_backend='native',
+               dpi=200, conformation=0, palette=None, save_svgz=False, compact=False, precision=None, files=None):
+    """This function takes a SMILES string and saves an icon of the molecule, in format PNG, SVG, JPEG, and PDF.
+    Use render_icon to get the files in memory.
+
+    Parameters
+    ----------
+    mol : mol object or MoleculeRecord
+        The rdkit mol object representing a molecule, or its record.
+    name : string, default: 'molecule_icon'
+        The name of the file to be saved.
+    directory : string, default: os.getcwd()
+        The directory to save the image in.
+    rdkit_png : bool, optional
+        If True, will use RDKit to generate a PNG image of the default structure.
+    rdkit_svg : bool, optional
+        If True, will use RDKit to generate an SVG image of the default structure.
+    save_svg : bool, default: True
+        Save the SVG icon format.
+    save_png : bool, default: False
+        Save the SVG and PNG icon formats (and PDF with the 'poppler' raster backend).
+    save_jpeg : bool, default: False
+        Save the SVG and JPEG icon formats (and PDF with the 'poppler' raster backend).
+    save_pdf : bool, default: False
+        Save the SVG and PDF icon formats.
+    atom_color : dictionary, default: color_map
+        A dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
+    atom_radius : int, default: 100
+        The radius of the atoms in the icon.
+    radius_multi : dictionary, default: atom_resize
+        A dictionary containing the multiplier for each atom. It multiplies the atom radius.
+    pos_multi : int, default: 300
+        This is the distance between atoms.
+    single_bonds : bool, optional
+        If True, all bonds will be single bonds.
+    remove_H : bool, optional
+        Remove all non-chiral hydrogen from the molecule.
+    shadow : bool, optional
+        Whether to add a shadow to the image or not.
+    shadow_light : float, default: 0.35
+        How light the shadow is. 0.35 is a good value.
+    verbose : bool, optional
+        Prints out the atoms coordinates.
+    rotation : tuple, default: (0,0,0)
+        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
+    emoji : dictionary, optional
+        A dictionary the string containing atom index as key, and as value a list containing the unicode
+        identifier of an emoji and whether it is colored or black emoji.
+    raster_backend : str, default: 'native'
+        How PNG and JPEG images are produced. 'native' draws the icon directly in memory, 'poppler' converts the
+        SVG to PDF and rasterizes it with pdf2image. Icons with emojis always use 'poppler'.
+    dpi : float, default: 200
+        The resolution of the PNG and JPEG images.
+    conformation : int, default: 0
+        The conformation to draw.
+    palette : Palette, optional
+        The compiled colors and sizes, see compile_palette(). It replaces atom_color, radius_multi and shadow_light.
+    save_svgz : bool, default: False
+        Save the gzip compressed SVG icon (.svgz) too.
+    compact : bool, optional
+        If True, the svg is written without indentation, with the bond strokes as CSS classes and with rounded
+        numbers, see render_icon.
+    precision : int, optional
+        The maximum number of decimals of the coordinates and sizes, see render_icon.
+    files : list, optional
+        If given, the names of the written files are appended to it.
+
+    Returns
+    -------
+    SvgWriter
+        The svg document of the icon.
+
+    """
+    if name.endswith('.svg'):
+        name = name[:-len('.svg')]
+    formats = [form for form, save in (('svg', save_svg), ('svgz', save_svgz), ('pdf', save_pdf), ('png', save_png),
+                                       ('jpeg', save_jpeg)) if save]
+    if formats:
+        formats.append('svg')
+    if (save_png or save_jpeg) and (raster_backend == 'poppler' or emoji):
+        formats.append('pdf')  # keep the intermediate pdf, as the poppler pipeline always did
+    record, svg = _icon_svg(mol, atom_color=atom_color, atom_radius=atom_radius, radius_multi=radius_multi,
+                            pos_multi=pos_multi, single_bonds=single_bonds, remove_H=remove_H, shadow=shadow,
+                            shadow_light=shadow_light, verbose=verbose, rotation=rotation, emoji=emoji,
+                            conformation=conformation, palette=palette, compact=compact, precision=precision)
+    outputs = export_icon(svg, formats, raster_backend=raster_backend, dpi=dpi, emoji=emoji, pretty=not compact)
+    outputs.update(_rdkit_outputs(record, rdkit_png, rdkit_svg, emoji))
+    for form, data in outputs.items():
+        suffix = '_rdkit.' + form[len('rdkit_'):] if form.startswith('rdkit_') else '.' + form
+        with open(directory + os.sep + name + suffix, 'wb') as f:
+            f.write(data)
+        if files is not None:
+            files.append(name + suffix)
+
+    if verbose:
+        print('\033[0;32m' + directory + os.sep + name + '.svg completed' + '\033[0;0;m')
+    return svg
+
+
+@traced('graph_3d')
+def graph_3d(mol, name='molecule_icon', directory=os.getcwd(), rdkit_png=False, rdkit_svg=False, resolution=100,
+             atom_color=color_map, atom_radius=100, radius_multi=atom_resize, pos_multi=300, remove_H=True,
+             rotation=(0, 0, 0), mesh=False, vertex_budget=None, conformation=0, palette=None):
+    """This function takes a SMILES string and returns an icon of the molecule, in format PNG, SVG, JPEG, and PDF.
+
+    Parameters
+    ----------
+    mol : mol object or MoleculeRecord
+        The rdkit mol object representing a molecule, or its record.
+    name : string, default: 'molecule_icon'
+        The name of the file to be saved.
+    directory : string, default: os.getcwd()
+        The directory to save the image in.
+    rdkit_png : bool, optional
+        If True, will use RDKit to generate a PNG image of the default structure.
+    rdkit_svg : bool, optional
+        If True, will use RDKit to generate an SVG image of the default structure.
+    resolution : int, default: 100
+        The resolution of the sphere and cylinder in the 3D graph.
+    atom_color : dictionary, default: color_map
+        a dictionary of atom colors. The keys are the atom symbols, and the values are the hex colors.
+    atom_radius : int, default: 100
+        The radius of the atoms in the icon.
+    radius_multi : dictionary, default: atom_resize
+        A dictionary containing the multiplier for each atom. It multiplies the atom radius.
+    pos_multi : int, default: 300
+        This is the distance between atoms.
+    remove_H : bool, optional
+        Remove all non-chiral hydrogen from the molecule.
+    rotation : tuple, default: (0,0,0)
+        Tuple containing the angle (in degree) of the x-axis, y-axis and z-axis to rotate the image.
+    mesh : bool, optional
+        If True, all the atoms and bonds are drawn as a few indexed Mesh3d traces (one for each color) instead of one
+        Surface trace for each atom and bond. The atoms are icospheres of at most 642 vertices whatever the
+        resolution, while a Surface sphere has resolution x resolution points, so the gain grows with the resolution:
+        the figure is about 27 times smaller at resolution 100 and about 2.4 times smaller at resolution 30.
+    vertex_budget : int, optional
+        If given, the resolution is lowered for big molecules so that the graph has about vertex_budget vertices,
+        see lod_resolution(). The resolution argument is then the highest resolution used.
+    conformation : int, default: 0
+        The conformation to draw.
+    palette : Palette, optional
+        The compiled colors and sizes, see compile_palette(). It replaces atom_color and radius_multi.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        Plotly object containing the 3D structure of the molecule.
+
+    """
+    record = molecule_record(mol)
+    # produce rdkit image
+    if rdkit_png:
+        rdkit.Chem.Draw.MolToFile(record.to_mol(), directory + os.sep + name + "_rdkit.png")
+    if rdkit_svg:
+        with open(directory + os.sep + name + "_rdkit.svg", 'w') as f:
+            f.write(rdkit_svg_text(record.to_mol()))
+
+    if remove_H:
+        record = record.without_hydrogens()  # remove not chiral Hydrogen
+    if palette is None:
+        palette = compile_palette(atom_color, radius_multi)
+    max_radius_multi = atom_radius * palette.max_size
+    # positions are already scaled according to the image
+    positions, max_pos = record.positions(conformation, rotation, pos_multi)
+    bonds = np.column_stack((record.bonds['begin'], record.bonds['end']))
+    symbols = record.symbols
+    bond_names = record.bond_names
+    # the dimension is calculated considering the maximum position, the atom diameter and multiplying by two (the
+    # dimension is half of the image size)
+    dimension = (max_pos + max_radius_multi * 2)
+
+    # create plotly graph with the white background
+    layout = go.Layout(scene_xaxis_visible=False, scene_yaxis_visible=False, scene_zaxis_visible=False,
+                       scene_aspectmode='cube')
+    fig = go.Figure(layout=layout)
+
+    # all_pos = np.array(list(pos_dict.values()))
+    # x_cent, y_cent, z_cent = np.mean(all_pos[:, 0]), np.mean(all_pos[:, 1]), np.mean(all_pos[:, 2])
+    # set equal axis dimension
+    axis_range = [-dimension, dimension]
+    fig.update_layout(
+        scene=dict(
+            xaxis=dict(range=axis_range, ),
+            yaxis=dict(range=axis_range, ),
+            zaxis=dict(range=axis_range, ), ), )
+    bond_thickness = atom_radius * palette.sizes['Bond'] / 4
+    bond_color = palette.colors['Bond']
+    # the style of each atom is an index of the palette arrays by atomic number
+    numbers = record.atoms['atomic_number']
+    radii = atom_radius * palette.radius[numbers]  # resize the atom dimension
+    fills = palette.fill[numbers].tolist()
+    if vertex_budget is not None:
+        resolution = lod_resolution(len(positions), len(bonds), vertex_budget, mesh, resolution)
+    if mesh:
+        fig.add_traces(mesh_traces(positions, bonds, bond_thickness, bond_color, bond_names, radii, fills, symbols,
+                                   resolution=resolution))
+        return fig
+
+    # build bonds
+    for bond_idx, ((idx1, idx2), bond_name) in enumerate(zip(bonds.tolist(), bond_names)):
+        color_scale = [[0, bond_color], [1, bond_color]]
+        name = f'{bond_idx}: {bond_name}'
+        (x_surf, y_surf, z_surf) = cylinder(bond_thickness, positions[idx1], positions[idx2], resolution=resolution)
+        data = go.Surface(x=x_surf, y=y_surf, z=z_surf, colorscale=color_scale, name=name,
+                          showscale=False, showlegend=False)
+        fig.add_traces(data)
+
+    # build atom icons
+    for k, (val, symbol, radius, fill) in enumerate(zip(positions, symbols, radii.tolist(), fills)):
+        color_scale = [[0, fill], [1, fill]]
+        name = f'{k}: {symbol}'
+        (x_surf, y_surf, z_surf) = sphere(val[0], val[1], val[2], radius, resolution=resolution)
+        data = go.Surface(x=x_surf, y=y_surf, z=z_surf, colorscale=color_scale, name=name,
+                          showscale=False, showlegend=False)
+        fig.add_traces(data)
+    return fig
+
+
+def parse():
+    # create a parser for command line
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Produce 2D icons of molecules from smiles.')
+    main = parser.add_argument_group('[ Required ]')
+    main.add_argument('SMILE',
+                      metavar='SMILE string',
+                      nargs='?',
+                      help='Smile of the molecule to produce the icon (not needed with --batch)')
+
+    optional = parser.add_argument_group('[ Optional ]')
+    optional.add_argument("--name",
+                          metavar='STR',
+                          default='molecule_icon',
+                          help='Name of the png output file')
+    optional.add_argument("-a", '--atom_multiplier',
+                          metavar='FLOAT',
+                          type=float,
+                          default=1,
+                          help='Increase or decrease the atom size in the image')
+    optional.add_argument("-p", '--position_multiplier',
+                          metavar='FLOAT',
+                          type=float,
+                          default=1,
+                          help='Increase or decrease the image size in the image')
+    optional.add_argument("-d", '--directory',
+                          metavar='FOLDER',
+                          default=os.getcwd(),
+                          help='Path to the folder to save the icon file ')
+    optional.add_argument("--rdkit_svg",
+                          action='store_true',
+                          help='Use this flag to save also the rdkit 2D image of the molecule')
+    optional.add_argument("-s", "--single_bond",
+                          action='store_true',
+                          help='Use this flag to draw single bonds only')
+    optional.add_argument("--remove_H",
+                          action='store_true',
+                          help='Use this flag to remove the hydrogens from the structure')
+    optional.add_argument("--hide_shadows",
+                          action='store_true',
+                          help='Hide the shadows of the atoms')
+    optional.add_argument("--shadow_light",
+                          type=float,
+                          default=0.35,
+                          help='Select how dark the shadow should be in the range [0:1]')
+    optional.add_argument("--compact",
+                          action='store_true',
+                          help='Write a smaller SVG: no indentation, bond styles as CSS classes and rounded numbers')
+    optional.add_argument("--precision",
+                          metavar='INT',
+                          type=int,
+                          help=f'Number of decimals of the SVG coordinates ({COMPACT_PRECISION} with --compact, '
+                               'full precision otherwise)')
+    optional.add_argument("--svgz",
+                          action='store_true',
+                          help='Use this flag to save also the gzip compressed SVG (.svgz)')
+    optional.add_argument("-v", "--verbose",
+                          action='store_true',
+                          help='Print the 2D coordinates of each atom')
+
+    batch = parser.add_argument_group('[ Batch ]')
+    batch.add_argument("-b", "--batch",
+                       metavar='PATH',
+                       help='SMILES (.smi, .txt), CSV or SDF file, or a directory of them, to render in parallel')
+    batch.add_argument("-j", "--workers",
+                       metavar='INT',
+                       type=int,
+                       default=os.cpu_count(),
+                       help='Number of worker processes used in batch mode')
+    batch.add_argument("--manifest",
+                       metavar='FILE',
+                       default='manifest.json',
+                       help='Name of the batch manifest written in the output folder')
+    args = parser.parse_args()
+    if not args.SMILE and not args.batch:
+        parser.error('a SMILE string or --batch is required')
+    return args
+
+
+def icon_options(parsed):
+    """It converts the parsed command line arguments into the keyword arguments of icon_print.
+
+    Parameters
+    ----------
+    parsed : argparse.Namespace
+        The arguments returned by parse().
+
+    Returns
+    -------
+    dictionary
+        The keyword arguments to pass to icon_print.
+
+    """
+    return dict(directory=parsed.directory, pos_multi=int(300 * parsed.position_multiplier),
+                rdkit_svg=parsed.rdkit_svg, single_bonds=parsed.single_bond, save_png=True, verbose=parsed.verbose,
+                atom_radius=100 * parsed.atom_multiplier, remove_H=parsed.remove_H,
+                shadow=not parsed.hide_shadows, shadow_light=parsed.shadow_light, save_svgz=parsed.svgz,
+                compact=parsed.compact, precision=parsed.precision)
+
+
+batch_suffixes = ('.smi', '.smiles', '.txt', '.csv', '.sdf')
+
+
+def read_batch(path):
+    """It reads the molecules to render from a SMILES, CSV or SDF file, or from every such file of a directory.
+    SMILES files contain one molecule per line, with an optional name after the SMILES. CSV files need a 'smiles'
+    column and can have a 'name' column (case-insensitive). In SDF files the molecule title is used as name.
+
+    Parameters
+    ----------
+    path : string
+        The file or the directory to read.
+
+    Returns
+    -------
+    list
+        A list of (name, smiles) tuples. Names are unique and safe to use as file names.
+
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(batch_suffixes))
+    else:
+        files = [path]
+    items = []
+    for file in files:
+        suffix = os.path.splitext(file)[1].lower()
+        if suffix == '.csv':
+            with open(file, newline='') as f:
+                reader = csv.DictReader(f)
+                columns = {c.lower(): c for c in reader.fieldnames or ()}
+                if 'smiles' not in columns:
+                    raise ValueError(f'No smiles column in {file}')
+                for row in reader:
+                    items.append((row.get(columns.get('name', ''), ''), row[columns['smiles']]))
+        elif suffix == '.sdf':
+            for mol in Chem.SDMolSupplier(file, sanitize=False):
+                if mol is None:
+                    continue
+                name = mol.GetProp('_Name') if mol.HasProp('_Name') else ''
+                items.append((name, Chem.MolToSmiles(mol)))
+        else:
+            with open(file) as f:
+                for line in f:
+                    fields = line.split(None, 1)
+                    if not fields or fields[0].startswith('#'):
+                        continue
+                    items.append((fields[1].strip() if len(fields) > 1 else '', fields[0]))
+    # make the names unique and usable as file names
+    used = set()
+    unique = []
+    for index, (name, smiles) in enumerate(items):
+        name = re.sub(r'[^\w.-]+', '_', name.strip()).strip('._') or str(index)
+        if name in used:
+            name = f'{name}_{index}'
+        used.add(name)
+        unique.append((name, smiles.strip()))
+    return unique
+
+
+def render_item(name, smiles, options):
+    """It renders the icon of one batch item. Errors are returned instead of raised, so that one bad molecule does
+    not stop the batch.
+
+    Parameters
+    ----------
+    name : string
+        The name of the output files.
+    smiles : string
+        The SMILES string of the molecule.
+    options : dictionary
+        The keyword arguments to pass to icon_print.
+
+    Returns
+    -------
+    dictionary
+        The manifest record of the item, with the files written for it.
+
+    """
+    start = time.perf_counter()
+    record = {'name': name, 'smiles': smiles}
+    try:
+        molecule = parse_structure(smiles)
+        files = []
+        icon_print(molecule, name=name, files=files, **options)
+        record['status'] = 'ok'
+        record['files'] = files
+    except Exception as err:
+        record['status'] = 'error'
+        record['error'] = f'{type(err).__name__}: {err}'
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+# seconds between two writes of the manifest of a batch
+MANIFEST_INTERVAL = 5
+
+
+def write_manifest(path, options, records):
+    """It writes the manifest of a batch, replacing the previous one at once so that it is never seen half written."""
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'options': options, 'items': records}, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def render_batch(items, options, workers=None, manifest='manifest.json', stream=sys.stdout):
+    """It renders the icons of many molecules over a process pool, so the import cost of RDKit, plotly and scipy is
+    paid once per worker. Results and errors are written to stream as soon as each item finishes. A JSON manifest of
+    the finished items is written in the output directory every MANIFEST_INTERVAL seconds, and when the batch ends or
+    is interrupted, so an interrupted batch keeps the records of the icons it wrote.
+
+    Parameters
+    ----------
+    items : list
+        A list of (name, smiles) tuples, as returned by read_batch.
+    options : dictionary
+        The keyword arguments to pass to icon_print.
+    workers : int, optional
+        The number of worker processes. The default is the number of CPUs.
+    manifest : string, default: 'manifest.json'
+        The file name of the manifest, written in options['directory']. None disables the manifest.
+    stream : file, default: sys.stdout
+        Where to write the progress lines. None disables the progress.
+
+    Returns
+    -------
+    list
+        The manifest records, in the same order as items.
+
+    """
+    os.makedirs(options['directory'], exist_ok=True)
+    path = os.path.join(options['directory'], manifest) if manifest else None
+    records = [None] * len(items)
+    written = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render_item, name, smiles, options): i
+                       for i, (name, smiles) in enumerate(items)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                records[futures[future]] = record
+                if stream is not None:
+                    status = record['status'] if record['status'] == 'ok' else record['error']
+                    print(f"[{done}/{len(items)}]\t{record['name']}\t{status}", file=stream, flush=True)
+                if path and time.monotonic() - written >= MANIFEST_INTERVAL:
+                    write_manifest(path, options, [record for record in records if record is not None])
+                    written = time.monotonic()
+    finally:
+        if path:
+            write_manifest(path, options, [record for record in records if record is not None])
+    return records
+
+
+if __name__ == "__main__":
+    parsed = parse()
+    options = icon_options(parsed)
+    if parsed.batch:
+        results = render_batch(read_batch(parsed.batch), options, workers=parsed.workers, manifest=parsed.manifest)
+        failed = sum(record['status'] != 'ok' for record in results)
+        print(f'{len(results) - failed} icons completed, {failed} failed')
+        sys.exit(1 if failed else 0)
+    molecule = parse_structure(parsed.SMILE)
+    icon_print(molecule, name=parsed.name, **options)
@@ -0,0 +1,235 @@
+"""Compact array record of a molecule, extracted once from an RDKit Mol and shared by the icon, 3D and raster renderers.
+
+The draw loops only index NumPy arrays instead of walking the RDKit atoms and bonds, and the record is kept in the
+session state and in the caches instead of the Mol. The Mol binary is kept to rebuild the Mol for the RDKit drawings.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from rdkit import Chem
+from scipy.spatial.transform import Rotation as Rot
+
+from render_cache import molecule_key
+
+ATOM_DTYPE = np.dtype([('atomic_number', np.uint8), ('valence', np.uint8), ('degree', np.uint8)])
+# order: the RDKit bond type (1 single, 2 double, 3 triple, 12 aromatic...); lines: the number of lines drawn
+BOND_DTYPE = np.dtype([('begin', np.int32), ('end', np.int32), ('order', np.uint8), ('lines', np.uint8)])
+# number of records kept by molecule_record()
+RECORD_CACHE_ENTRIES = 64
+_PICKLE_OPTIONS = Chem.PropertyPickleOptions.AllProps | Chem.PropertyPickleOptions.CoordsAsDouble
+
+
+@lru_cache(maxsize=None)
+def element_symbol(atomic_number):
+    """Return the symbol of an element, '*' for the dummy atoms."""
+    return Chem.GetPeriodicTable().GetElementSymbol(int(atomic_number))
+
+
+@lru_cache(maxsize=None)
+def bond_type_name(order):
+    """Return the RDKit name of a bond type, e.g. 'SINGLE' or 'AROMATIC'."""
+    return str(Chem.BondType.values[int(order)])
+
+
+def bond_lines(atoms, bonds, bond_ptr, atom_bonds):
+    """It assigns the number of lines drawn for each bond: 2 for the double bonds, 3 for the triple bonds and, for the
+    aromatic rings, alternating single and double bonds. An aromatic bond is drawn double if neither atom already has a
+    double or triple bond, and both atoms have free valence; the bonds are visited atom by atom, in index order.
+
+    Returns
+    -------
+    numpy.ndarray
+        The number of lines of each bond.
+
+    """
+    order = bonds['order'].tolist()
+    begin, end = bonds['begin'].tolist(), bonds['end'].tolist()
+    free = (atoms['degree'] < atoms['valence']).tolist()
+    lines = [1] * len(order)
+    aromatic_index, double_index = set(), set()
+    done = [False] * len(order)
+    for atom_idx in range(len(atoms)):
+        for bond_idx in atom_bonds[bond_ptr[atom_idx]:bond_ptr[atom_idx + 1]].tolist():
+            if done[bond_idx]:
+                continue
+            done[bond_idx] = True
+            idx1, idx2 = begin[bond_idx], end[bond_idx]
+            if order[bond_idx] == Chem.BondType.AROMATIC:
+                if (idx1 not in aromatic_index and idx2 not in aromatic_index and idx1 not in double_index
+                        and idx2 not in double_index and free[idx1] and free[idx2]):
+                    lines[bond_idx] = 2
+                    aromatic_index.update((idx1, idx2))
+            elif order[bond_idx] == Chem.BondType.TRIPLE:
+                lines[bond_idx] = 3
+                aromatic_index.update((idx1, idx2))
+            elif order[bond_idx] == Chem.BondType.DOUBLE:
+                lines[bond_idx] = 2
+                double_index.update((idx1, idx2))
+    return np.array(lines, dtype=np.uint8)
+
+
+def adjacency(n_atoms, bonds):
+    """It returns the CSR adjacency (bond_ptr, atom_bonds) of the bonds: the bonds of atom i are
+    atom_bonds[bond_ptr[i]:bond_ptr[i + 1]], in increasing bond index order."""
+    # sort the bond ends by atom
+    ends = np.column_stack((bonds['begin'], bonds['end'])).ravel()
+    bond_ptr = np.zeros(n_atoms + 1, dtype=np.intp)
+    np.cumsum(np.bincount(ends, minlength=n_atoms), out=bond_ptr[1:])
+    return bond_ptr, np.argsort(ends, kind='stable') // 2
+
+
+def rotate(coordinates, rotation=(0, 0, 0), pos_multi=1):
+    """It rotates (angles in degree around the x, y and z axis) and scales positions in one matrix multiplication, and
+    returns them with their maximum absolute x or y coordinate."""
+    matrix = Rot.from_euler('xyz', rotation, degrees=True).as_matrix().T * pos_multi
+    positions = np.ascontiguousarray(coordinates @ matrix)
+    max_pos = float(np.abs(positions[:, :2]).max()) if len(positions) else 0.0
+    return positions, max_pos
+
+
+class MoleculeRecord:
+    """Read-only arrays of a molecule. Use MoleculeRecord.from_mol() or molecule_record() to build one.
+
+    Attributes
+    ----------
+    key : str
+        The digest of the molecule, see render_cache.molecule_key().
+    atoms : numpy.ndarray
+        The atomic number, total valence and degree of each atom, a structured array of ATOM_DTYPE.
+    bonds : numpy.ndarray
+        The atom indexes, the bond type and the number of lines drawn of each bond, a structured array of BOND_DTYPE.
+    coordinates : numpy.ndarray
+        The positions of the atoms in each conformation, shape (n_conformers, n_atoms, 3).
+    conformer_ids : tuple
+        The RDKit id of each conformation.
+    energies : numpy.ndarray
+        The force field energy of each conformation, NaN if unknown.
+    bond_ptr, atom_bonds : numpy.ndarray
+        The CSR adjacency of the bonds, see adjacency().
+    binary : bytes
+        The RDKit binary of the Mol, with its properties and double precision conformers.
+
+    """
+    __slots__ = ('key', 'atoms', 'bonds', 'coordinates', 'conformer_ids', 'energies', 'bond_ptr', 'atom_bonds',
+                 'binary', '_heavy')
+
+    def __init__(self, key, atoms, bonds, coordinates, conformer_ids, energies, binary):
+        self.key = key
+        self.atoms = atoms
+        self.bonds = bonds
+        self.coordinates = coordinates
+        self.conformer_ids = tuple(conformer_ids)
+        self.energies = energies
+        self.binary = binary
+        self.bond_ptr, self.atom_bonds = adjacency(len(atoms), bonds)
+        for array in (atoms, bonds, coordinates, energies, self.bond_ptr, self.atom_bonds):
+            array.flags.writeable = False  # shared by every session and cache
+        self._heavy = None
+
+    @classmethod
+    def from_mol(cls, mol):
+        """It extracts the record of an RDKit Mol, the only step that walks the RDKit atoms and bonds."""
+        binary = mol.ToBinary(_PICKLE_OPTIONS)
+        atoms = np.array([(atom.GetAtomicNum(), atom.GetTotalValence(), atom.GetDegree()) for atom in mol.GetAtoms()],
+                         dtype=ATOM_DTYPE)
+        bonds = np.array([(bond.GetBeginAtomIdx(), bond.GetEndAtomIdx(), int(bond.GetBondType()), 1)
+                          for bond in mol.GetBonds()], dtype=BOND_DTYPE)
+        conformers = list(mol.GetConformers())
+        coordinates = np.array([conf.GetPositions()[:len(atoms)] for conf in conformers],
+                               dtype=float).reshape(len(conformers), len(atoms), 3)
+        energies = np.array([conf.GetDoubleProp('energy') if conf.HasProp('energy') else np.nan
+                             for conf in conformers])
+        bonds['lines'] = bond_lines(atoms, bonds, *adjacency(len(atoms), bonds))
+        # same digest as render_cache.molecule_key(), without serializing the Mol twice
+        return cls(hashlib.sha1(binary).hexdigest(), atoms, bonds, coordinates, [conf.GetId() for conf in conformers],
+                   energies, binary)
+
+    def __len__(self):
+        return len(self.atoms)
+
+    @property
+    def n_conformers(self):
+        return len(self.conformer_ids)
+
+    @property
+    def symbols(self):
+        """The symbol of each atom."""
+        return [element_symbol(number) for number in self.atoms['atomic_number'].tolist()]
+
+    @property
+    def bond_names(self):
+        """The RDKit name of the type of each bond."""
+        return [bond_type_name(order) for order in self.bonds['order'].tolist()]
+
+    def positions(self, conformation=0, rotation=(0, 0, 0), pos_multi=1):
+        """It returns the rotated and scaled positions of a conformation (given by its RDKit id), and their maximum
+        absolute x or y coordinate, see rotate().
+
+        Raises
+        ------
+        ValueError
+            If the molecule has no conformation with this id.
+
+        """
+        if conformation not in self.conformer_ids:
+            raise ValueError(f'Bad Conformer Id ({conformation})')
+        return rotate(self.coordinates[self.conformer_ids.index(conformation)], rotation, pos_multi)
+
+    def to_mol(self):
+        """Return a new RDKit Mol of the record, e.g. for the RDKit drawings."""
+        return Chem.Mol(self.binary)
+
+    def without_hydrogens(self):
+        """Return the record of the molecule without its non-chiral hydrogens (RDKit RemoveHs), computed once."""
+        if self._heavy is None:
+            self._heavy = MoleculeRecord.from_mol(Chem.RemoveHs(self.to_mol()))
+        return self._heavy
+
+    def to_bytes(self):
+        """Serialize the record as an uncompressed npz archive, see from_bytes()."""
+        buffer = BytesIO()
+        np.savez(buffer, key=np.array(self.key), atoms=self.atoms, bonds=self.bonds, coordinates=self.coordinates,
+                 conformer_ids=np.array(self.conformer_ids, dtype=np.int64), energies=self.energies,
+                 binary=np.frombuffer(self.binary, dtype=np.uint8))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load a record serialized by to_bytes()."""
+        with np.load(BytesIO(data), allow_pickle=False) as arrays:
+            return cls(str(arrays['key']), arrays['atoms'], arrays['bonds'], arrays['coordinates'],
+                       arrays['conformer_ids'].tolist(), arrays['energies'], arrays['binary'].tobytes())
+
+
+_records = OrderedDict()  # molecule key -> record
+_records_lock = threading.Lock()
+
+
+def molecule_record(mol):
+    """Return the record of an RDKit Mol, extracted once for the last RECORD_CACHE_ENTRIES molecules. A record is
+    returned as is."""
+    if isinstance(mol, MoleculeRecord):
+        return mol
+    key = molecule_key(mol)
+    with _records_lock:
+        record = _records.get(key)
+        if record is not None:
+            _records.move_to_end(key)
+            return record
+    record = MoleculeRecord.from_mol(mol)
+    with _records_lock:
+        _records[key] = record
+        while len(_records) > RECORD_CACHE_ENTRIES:
+            _records.popitem(last=False)
+    return record
+
+
+def clear_records():
+    """Forget every record extracted by molecule_record()."""
+    with _records_lock:
+        _records.clear()
@@ -2,16 +2,30 @@
 
 import streamlit as st
 import cirpy
+import numpy as np
+import plotly.graph_objects as go
 import base64
+import functools
 import os
-import shutil
-import time
+import zipfile
+from collections import ChainMap
+from io import BytesIO
+from resolver_cache import resolve_smiles
+from conformer_cache import default_conformer_cache
+from render_cache import default_render_cache, render_spec
+from tracing import span, collect, counters
+from stoichiometry import Reaction
+from molecule_record import molecule_record
+from palette import compile_palette
 from molecule_icon_generator import (
     parse_structure,
     color_map,
     atom_resize,
-    icon_print,
+    render_icon,
+    rdkit_svg_text,
     graph_3d,
+    conformer_energies,
+    VERTEX_BUDGET,
     emoji_periodic_table,
 )
 
@@ -24,6 +38,73 @@ smiles_help = """See the following guide for mode information on SMILES:  \n
 https://chemicbook.com/2021/02/13/smiles-strings-explained-for-beginners-part-1.html"""
 
 
+def render_graph(record, rdkit_svg, params):
+    """Build the 3D graph of a molecule record, with the optional RDKit drawing. The html page is only built when it
+    is downloaded, see graph_html."""
+    output = {"figure": graph_3d(record, **params)}
+    if rdkit_svg:
+        output["rdkit_svg"] = rdkit_svg_text(record.to_mol()).encode("utf-8")
+    return output
+
+
+def graph_html(graph, config) -> bytes:
+    """Build the html page of a 3D graph, loading plotly.js from its CDN instead of inlining it."""
+    with span("plotly_html"):
+        return graph.to_html(config=config, include_plotlyjs="cdn").encode("utf-8")
+
+
+def debug_enabled() -> bool:
+    """Whether to show the timing panel: set TRACE_PANEL=1 or open the page with ?debug=1."""
+    if os.environ.get("TRACE_PANEL", "").lower() in ("1", "true", "yes"):
+        return True
+    return st.query_params.get("debug", "").lower() in ("1", "true", "yes")
+
+
+def show_spans(records) -> None:
+    """Show the spans of the current run and the process-wide counters in an expander."""
+    with st.expander("Debug: stage timings"):
+        st.dataframe(
+            [
+                {
+                    "stage": record["name"],
+                    "parent": record["parent"],
+                    "ms": round(record["duration_s"] * 1000, 2),
+                    "error": record["error"],
+                    "attributes": str(record["attrs"]) if record["attrs"] else "",
+                }
+                for record in records
+            ]
+        )
+        st.caption("All sessions since the server started:")
+        st.dataframe(
+            [
+                {
+                    "stage": name,
+                    "count": counter["count"],
+                    "errors": counter["errors"],
+                    "mean ms": round(counter["mean_s"] * 1000, 2),
+                    "max ms": round(counter["max_s"] * 1000, 2),
+                }
+                for name, counter in sorted(counters.snapshot().items())
+            ]
+        )
+
+
+def traced_page(func):
+    """Decorator collecting the spans of one run of a page and showing them when debug_enabled()."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with collect() as records:
+            try:
+                return func(*args, **kwargs)
+            finally:  # also after st.stop(), e.g. when the input could not be resolved
+                if debug_enabled():
+                    show_spans(records)
+
+    return wrapper
+
+
 def upload_setting_button():
     """Allow to upload setting"""
     st.session_state["upload_setting"] = True
@@ -53,14 +134,17 @@ molecule_reactions = {
     "Oxygen": "NH3 + O2 -> NO2- + 3H+ + 2e-",
     "Glucose": "12H2S + 6CO2 -> C6H12O6 + 6H2O + 12S",
 }
+# parsed and checked once, a typo in an equation fails at import
+molecule_equations = {name: Reaction.parse(equation) for name, equation in molecule_reactions.items()}
 
 
+@traced_page
 def init_session_state() -> None:
-    # initialize session state
+    # initialize session state, the sessions only keep their edits of the shared default colors and sizes
     if "color_dict" not in st.session_state:
-        st.session_state["color_dict"] = color_map.copy()
+        st.session_state["color_dict"] = dict()
     if "resize_dict" not in st.session_state:
-        st.session_state["resize_dict"] = atom_resize.copy()
+        st.session_state["resize_dict"] = dict()
     if "reset_color" not in st.session_state:
         st.session_state["reset_color"] = False
     if "reset_size" not in st.session_state:
@@ -80,21 +164,22 @@ def init_session_state() -> None:
     if "use_emoji" not in st.session_state:
         st.session_state["use_emoji"] = False
 
-    # loading the color, resize and emoji dictionary
+    # loading the color, resize and emoji dictionary: the edits are written in the session dictionaries (copy on
+    # write), the defaults are read from the shared ones
     if "color_dict" in st.session_state:
-        new_color = st.session_state["color_dict"]
+        new_color = ChainMap(st.session_state["color_dict"], color_map)
     else:
         st.exception(init_error)
         print([i for i in st.session_state])
-        st.session_state["color_dict"] = color_map.copy()
-        new_color = st.session_state["color_dict"]
+        st.session_state["color_dict"] = dict()
+        new_color = ChainMap(st.session_state["color_dict"], color_map)
     if "resize_dict" in st.session_state:
-        resize = st.session_state["resize_dict"]
+        resize = ChainMap(st.session_state["resize_dict"], atom_resize)
     else:
         st.exception(init_error)
         print([i for i in st.session_state])
-        st.session_state["resize_dict"] = atom_resize.copy()
-        resize = st.session_state["resize_dict"]
+        st.session_state["resize_dict"] = dict()
+        resize = ChainMap(st.session_state["resize_dict"], atom_resize)
     if "emoji_dict" in st.session_state:
         emoji = st.session_state["emoji_dict"]
     else:
@@ -155,15 +240,15 @@ def init_session_state() -> None:
 
     if not st.session_state["molecules_but"] or st.session_state["update_molecule"]:
         try:
-            start_time = time.time()
-            with st.spinner(text=f"Collecting structure from molecule {input_type}..."):
+            with st.spinner(text=f"Collecting structure from molecule {input_type}..."), span(
+                "resolve", input_type=input_type
+            ) as resolve_span:
                 if input_type == "name":
-                    input_string = cirpy.resolve(input_string, "smiles")
-                mol = cirpy.Molecule(input_string)
-                smiles = mol.smiles
-            # end of parsing time
-            end_time = time.time()
-            if end_time - start_time > 3:
+                    # cached locally, the web service is only asked on a miss
+                    smiles = resolve_smiles(input_string)
+                else:
+                    smiles = cirpy.Molecule(input_string).smiles
+            if resolve_span["duration_s"] > 3:
                 st.info("""If the app is slow, use SMILES input.""" + smiles_help)
         except Exception as e:
             print(e)  # print error in console
@@ -196,7 +281,6 @@ def init_session_state() -> None:
             formats = ("svg", "png", "jpeg")
         else:
             formats = ("svg", "png", "jpeg", "pdf")
-        forms = [False, False, False, False]
         img_format = st.selectbox(
             "Download file format:",
             formats,
@@ -204,19 +288,16 @@ def init_session_state() -> None:
             help="""The native file format is svg. Using png and jpeg formats could slow down 
                                        the app""",
         )
-        if dimension != "3D interactive":
-            for ind, img_form in enumerate(("svg", "png", "jpeg", "pdf")):
-                if img_form == img_format:
-                    forms[ind] = True
 
     # set the parameters for a 2D/3D structure
     conf = False
     dimension_3 = False
     rand_seed = -1
+    n_conf = 1
     f_field = None
     activate_emoji = st.session_state["use_emoji"]
     if input_type != "load file":
-        col1, col2 = st.columns(2, gap="medium")
+        col1, col2, col3 = st.columns(3, gap="medium")
         if "3D" in dimension:
             dimension_3 = True
             with col1:
@@ -236,6 +317,16 @@ def init_session_state() -> None:
                     help="""Choose the random seed to generate the molecule. A value of -1 will 
                                                     generate a random structure every time the app is running""",
                 )
+            with col3:
+                n_conf = st.number_input(
+                    "Number of conformers",
+                    min_value=1,
+                    max_value=100,
+                    key="3D_n_conf",
+                    on_change=update_molecule,
+                    help="""Generate several conformers and sort them by energy. More conformers give a better
+                                                    lowest energy structure for flexible molecules""",
+                )
 
     # try to build the mol structure
     if not st.session_state["molecules_but"] or st.session_state["update_molecule"]:
@@ -245,10 +336,13 @@ def init_session_state() -> None:
                 smiles,
                 nice_conformation=conf,
                 dimension_3=dimension_3,
+                n_conf=n_conf,
                 force_field=f_field,
                 randomseed=rand_seed,
+                cache=default_conformer_cache(),
             )
-            molecules.append(molecule)
+            # the session keeps the compact record, extracted once, instead of the Mol
+            molecules.append(molecule_record(molecule))
             st.session_state["molecules_but"] = molecules
         except Exception as err:
             print(f"An error occured {err}")  # print error in console
@@ -261,6 +355,25 @@ def init_session_state() -> None:
     molecules = st.session_state["molecules_but"]
     st.session_state["update_molecule"] = False
 
+    # step through the conformers, sorted from the lowest energy
+    conformer = 0
+    n_conformers = molecules[0].n_conformers
+    if n_conformers > 1:
+        energies = conformer_energies(molecules[0])
+        conformer = st.slider(
+            "Conformer (sorted by energy)",
+            0,
+            n_conformers - 1,
+            0,
+            key="conformer_slider",
+            help="""Conformer 0 has the lowest force field energy""",
+        )
+        if not np.isnan(energies[conformer]):
+            st.caption(
+                f"Energy: {energies[conformer]:.2f} kcal/mol "
+                f"(+{energies[conformer] - energies[0]:.2f} from the lowest)"
+            )
+
     # add common checkbox
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -280,7 +393,7 @@ def init_session_state() -> None:
     # add emojis
     activate_emoji = None
     if activate_emoji:
-        atom_and_index = list(range(molecules[0].GetNumAtoms())) + list(
+        atom_and_index = list(range(len(molecules[0]))) + list(
             atom_resize.keys()
         )
         col1, col2, col3 = st.columns(3, gap="medium")
@@ -387,8 +500,8 @@ def init_session_state() -> None:
                 help="Reset colours as default CPK",
                 key="reset_color_but",
             ):
-                st.session_state["color_dict"] = color_map.copy()
-                new_color = st.session_state["color_dict"]
+                st.session_state["color_dict"] = dict()
+                new_color = ChainMap(st.session_state["color_dict"], color_map)
                 st.session_state["reset_color"] = True
                 # st.experimental_rerun()
 
@@ -436,8 +549,8 @@ def init_session_state() -> None:
                 key="reset_size_but",
                 help='Reset size to 100% for all atoms. Select "Bond" to change the bond thickness',
             ):
-                st.session_state["resize_dict"] = atom_resize.copy()
-                resize = st.session_state["resize_dict"]
+                st.session_state["resize_dict"] = dict()
+                resize = ChainMap(st.session_state["resize_dict"], atom_resize)
                 st.session_state["reset_size"] = True
                 # st.experimental_rerun()
     icon_size = resize["All atoms"] * 100
@@ -471,7 +584,7 @@ def init_session_state() -> None:
                 100,
                 30,
                 key="resolution_slider",
-                help="""Resolution of the bond and atoms 3D mesh""",
+                help="""Resolution of the bond and atoms 3D mesh. Big molecules are drawn with less detail.""",
             )
 
     # correct the size of the image according to rdkit default conformation or coordGen
@@ -515,61 +628,58 @@ def init_session_state() -> None:
     else:
         rot_angles = (0, 0, 0)
 
-    # try to produce the image
-    if smiles_list:
-        direct = "icons_list"
-        if direct in os.listdir():
-            shutil.rmtree(direct)
-        os.mkdir(direct)
-    else:
-        direct = os.getcwd()
+    # try to produce the image, the outputs are kept in memory so concurrent sessions never share files.
+    # They are memoized on every parameter, so going back to settings already seen doesn't render again.
+    cache = default_render_cache()
+    # set camera to download the image format selected
+    config = {
+        "toImageButtonOptions": {
+            "label": f"Download {img_format}",
+            "format": img_format,  # one of png, svg, jpeg, webp
+            "filename": "molecule-icon",
+            "scale": 1,  # Multiply title/legend/axis/canvas sizes by this factor
+        }
+    }
+    outputs = []
     for index, mol in enumerate(molecules):
         try:
             if dimension == "3D interactive":
-                graph = graph_3d(
-                    mol,
-                    name=str(index),
-                    rdkit_svg=rdkit_draw,
-                    radius_multi=resize,
-                    directory=direct,
-                    atom_color=new_color,
+                params = dict(
+                    palette=compile_palette(new_color, resize),
                     pos_multi=img_multi,
                     atom_radius=icon_size,
                     resolution=resolution,
                     remove_H=remove_H,
+                    mesh=True,
+                    vertex_budget=VERTEX_BUDGET,
+                    conformation=conformer,
                 )
-                filename = direct + os.sep + str(index) + ".html"
-                # set camera to download the image format selected
-                config = {
-                    "toImageButtonOptions": {
-                        "label": f"Download {img_format}",
-                        "format": img_format,  # one of png, svg, jpeg, webp
-                        "filename": "molecule-icon",
-                        "scale": 1,  # Multiply title/legend/axis/canvas sizes by this factor
-                    }
-                }
-                graph.write_html(filename, config=config)
+                # the camera config only changes the html page, built at download time
+                spec = render_spec(mol, "graph", rdkit_svg=rdkit_draw, **params)
+                output = cache.get_or_render(
+                    spec, lambda: render_graph(mol, rdkit_draw, params)
+                )
+                graph = output["figure"]
             else:
-                icon_print(
-                    mol,
-                    name=str(index),
+                params = dict(
+                    formats=("svg", img_format),
                     rdkit_svg=rdkit_draw,
                     pos_multi=img_multi,
-                    directory=direct,
                     single_bonds=single_bonds,
                     atom_radius=icon_size,
-                    radius_multi=resize,
-                    atom_color=new_color,
+                    # compiled once for the style, shared with the other sessions and hashed for the cache
+                    palette=compile_palette(new_color, resize, shadow_light),
                     shadow=not h_shadow,
                     remove_H=remove_H,
-                    save_svg=forms[0],
-                    save_png=forms[1],
-                    save_jpeg=forms[2],
-                    save_pdf=forms[3],
-                    shadow_light=shadow_light,
                     rotation=rot_angles,
                     emoji=emoji,
+                    conformation=conformer,
+                    # smaller preview and downloads: no whitespace, shared bond styles, rounded coordinates
+                    compact=True,
                 )
+                spec = render_spec(mol, "icon", **params)
+                output = cache.get_or_render(spec, lambda: render_icon(mol, **params))
+            outputs.append(output)
         except Exception as e:
             print(e)  # print error in console
             error_txt = f"""
@@ -580,6 +690,7 @@ def init_session_state() -> None:
 
     # show the download button and preview
     if not smiles_list:
+        output = outputs[0]
         # download the html-graph or the image
         if dimension == "3D interactive":
             show_graph = st.checkbox(
@@ -594,32 +705,28 @@ def init_session_state() -> None:
                 )
                 col1, col2 = st.columns(2)
                 with col1:
-                    graph.update_layout(height=300)
-                    st.plotly_chart(graph, config=config, use_container_width=True)
-            with open(filename, "rb") as file:
-                btn = st.download_button(
-                    label="Download 3D plot",
-                    data=file,
-                    file_name="molecule-icon-graph.html",
-                    help=f"""Download the html graph and open it in your browser to take 
-                                              {img_format} snapshots with the camera button""",
-                )
+                    # the cached figure is shared, only the preview is resized
+                    preview = go.Figure(graph).update_layout(height=300)
+                    st.plotly_chart(preview, config=config, use_container_width=True)
+            btn = st.download_button(
+                label="Download 3D plot",
+                data=functools.partial(graph_html, graph, config),
+                file_name="molecule-icon-graph.html",
+                help=f"""Download the html graph and open it in your browser to take 
+                                          {img_format} snapshots with the camera button""",
+            )
         else:
             col1, col2 = st.columns(2)
             with col1:
-                f = open("0.svg", "r")
-                svg_text = f.read()
-                render_svg(svg_text)
-            filename = "0." + img_format
-            with open(filename, "rb") as file:
-                btn = st.download_button(
-                    label="Download icon",
-                    data=file,
-                    file_name="molecule_icon." + img_format,
-                    mime=f"image/{img_format}",
-                )
+                render_svg(output["svg"].decode("utf-8"))
+            btn = st.download_button(
+                label="Download icon",
+                data=output[img_format],
+                file_name="molecule_icon." + img_format,
+                mime=f"image/{img_format}",
+            )
             if input_string in molecule_reactions:
-                reaction = molecule_reactions[input_string]
+                reaction = molecule_equations[input_string].pretty()
                 st.write("")
                 st.markdown(
                     """<p style='text-align: center; font-size: 20px;'>
@@ -635,16 +742,13 @@ def init_session_state() -> None:
                 )
         with col2:  # generale col 2 in each case
             if rdkit_draw:
-                f = open("0_rdkit.svg", "r")
-                svg_text = f.read()
-                render_svg(svg_text)
-                with open("0_rdkit.svg", "rb") as file:
-                    btn = st.download_button(
-                        label="Download RDKIT icon",
-                        data=file,
-                        file_name="molecule_icon_rdkit.svg",
-                        mime=f"image/{img_format}",
-                    )
+                render_svg(output["rdkit_svg"].decode("utf-8"))
+                btn = st.download_button(
+                    label="Download RDKIT icon",
+                    data=output["rdkit_svg"],
+                    file_name="molecule_icon_rdkit.svg",
+                    mime=f"image/{img_format}",
+                )
     else:
         # add preview for single image
         st.write(
@@ -652,28 +756,23 @@ def init_session_state() -> None:
             Image SVG preview for one icon:
             """
         )
-        svg_set = {
-            im for im in os.listdir(direct) if ".svg" in im and "rdkit" not in im
-        }
-        example_svg = direct + os.sep + sorted(svg_set)[0]
         col1, col2 = st.columns(2)
         with col1:
-            f = open(example_svg, "r")
-            svg_text = f.read()
-            render_svg(svg_text)
+            render_svg(outputs[0]["svg"].decode("utf-8"))
         with col2:
             if rdkit_draw:
-                example_rdkit = example_svg.split(".svg")[0] + "_rdkit.svg"
-                f = open(example_rdkit, "r")
-                svg_text = f.read()
-                render_svg(svg_text)
-        shutil.make_archive("molecules-icons", "zip", direct)
+                render_svg(outputs[0]["rdkit_svg"].decode("utf-8"))
+        # zip the icons in memory
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for index, output in enumerate(outputs):
+                for form, data in output.items():
+                    suffix = "_rdkit.svg" if form == "rdkit_svg" else "." + form
+                    zip_file.writestr(str(index) + suffix, data)
         # download zip button
-        filename = "molecules-icons.zip"
-        with open(filename, "rb") as file:
-            _ = st.download_button(
-                label="Download icons zip",
-                data=file,
-                file_name="molecules-icons.zip",
-                mime=f"image/{img_format}",
-            )
+        _ = st.download_button(
+            label="Download icons zip",
+            data=archive.getvalue(),
+            file_name="molecules-icons.zip",
+            mime="application/zip",
+        )
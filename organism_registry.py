@@ -0,0 +1,166 @@
+"""Registry of the organisms of the Food Web Builder.
+
+The organisms are stored column by column in python lists, so adding one is an amortized O(1) append instead of a copy
+of the whole table, and a name index makes the uniqueness checks O(1). The views used by the page (the table and the
+name lists of the selectors) are built once for each version of the registry.
+"""
+
+import os
+
+import pandas as pd
+
+COLUMNS = ('Name', 'Type')
+
+
+def organism_key(name):
+    """Return the index key of an organism name: lower case and single spaced, so 'Riftia  pachyptila' and
+    'riftia pachyptila' are the same organism."""
+    return " ".join(str(name).strip().lower().split())
+
+
+class OrganismRegistry:
+    """Append-only table of uniquely named organisms.
+
+    Attributes
+    ----------
+    version : int
+        Incremented by every change, it identifies the cached views.
+
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._columns = {column: [] for column in COLUMNS}
+        self._index = {}  # organism key -> row
+        self._views = {}  # view key -> view of the current version
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return organism_key(name) in self._index
+
+    def _changed(self):
+        self.version += 1
+        self._views.clear()
+
+    def add(self, name, organism_type):
+        """Add an organism.
+
+        Raises
+        ------
+        ValueError
+            If the name is empty or already registered.
+
+        """
+        key = organism_key(name)
+        if not key:
+            raise ValueError('The organism name is empty')
+        if key in self._index:
+            raise ValueError(f'Organism ({name}) is already registered')
+        self._index[key] = len(self._index)
+        self._columns['Name'].append(str(name).strip())
+        self._columns['Type'].append(organism_type)
+        self._changed()
+
+    def extend(self, frame, name_column='Name', type_column='Type', default_type=''):
+        """Add the organisms of a table, skipping empty names and the names already registered or repeated.
+
+        Parameters
+        ----------
+        frame : pandas.DataFrame
+            The organisms. Column names are matched ignoring the case.
+        name_column : str, default: 'Name'
+            The column with the organism names.
+        type_column : str, default: 'Type'
+            The column with the organism types. If missing, every organism gets default_type.
+        default_type : str, default: ''
+            The type of the organisms without one.
+
+        Returns
+        -------
+        tuple
+            The number of added and skipped organisms.
+
+        Raises
+        ------
+        KeyError
+            If the table has no name column.
+
+        """
+        columns = {str(column).strip().lower(): column for column in frame.columns}
+        if name_column.lower() not in columns:
+            raise KeyError(f'The organism table has no {name_column} column')
+        names = frame[columns[name_column.lower()]].fillna('').astype(str).str.strip()
+        if type_column.lower() in columns:
+            types = frame[columns[type_column.lower()]].fillna(default_type).astype(str).str.strip()
+        else:
+            types = pd.Series(default_type, index=frame.index)
+        keys = names.str.lower().str.split().str.join(' ')
+        keep = (keys != '') & ~keys.duplicated() & ~keys.isin(self._index.keys())
+        added = int(keep.sum())
+        if added:
+            start = len(self._index)
+            self._index.update(zip(keys[keep].tolist(), range(start, start + added)))
+            self._columns['Name'].extend(names[keep].tolist())
+            self._columns['Type'].extend(types[keep].tolist())
+            self._changed()
+        return added, len(frame) - added
+
+    def import_file(self, source, file_format=None, **kwargs):
+        """Add the organisms of a CSV or Parquet file, see extend().
+
+        Parameters
+        ----------
+        source : str or file-like
+            The path or the opened file.
+        file_format : str, optional
+            'csv' or 'parquet'. By default, it is given by the file extension.
+        **kwargs
+            The column arguments of extend().
+
+        Returns
+        -------
+        tuple
+            The number of added and skipped organisms.
+
+        Raises
+        ------
+        ValueError
+            If the format is not supported.
+        ImportError
+            If Parquet files are read without pyarrow or fastparquet installed.
+
+        """
+        if file_format is None:
+            file_format = os.path.splitext(getattr(source, 'name', str(source)))[1].lstrip('.')
+        file_format = file_format.lower()
+        if file_format in ('csv', 'txt'):
+            frame = pd.read_csv(source, dtype=str, keep_default_na=False)
+        elif file_format in ('parquet', 'pq'):
+            frame = pd.read_parquet(source)
+        else:
+            raise ValueError(f'Unsupported organism file format ({file_format}), use CSV or Parquet')
+        return self.extend(frame, **kwargs)
+
+    def _view(self, key, build):
+        view = self._views.get(key)
+        if view is None:
+            view = self._views[key] = build()
+        return view
+
+    def names(self, organism_type=None):
+        """Return the organism names, in order of registration, optionally only the ones of a type. The lists are
+        not copied (all the names are the registry column itself), so they must not be modified."""
+        if organism_type is None:
+            return self._columns['Name']
+        return self._view(('names', organism_type), lambda: [
+            name for name, other in zip(self._columns['Name'], self._columns['Type']) if other == organism_type])
+
+    def types(self):
+        """Return the types of the registered organisms, sorted."""
+        return self._view('types', lambda: sorted(set(self._columns['Type']) - {''}))
+
+    def to_frame(self):
+        """Return the organisms as a DataFrame, shared until the next change of the registry."""
+        return self._view('frame', lambda: pd.DataFrame(self._columns, columns=list(COLUMNS)))
@@ -0,0 +1,195 @@
+"""Compiled style palette of the icons.
+
+A Palette holds the fill and shadow colors and the radius multiplier of every element, in arrays indexed by atomic
+number, with the shadow colors (the atom shadows and outlines, and the bond contour) precomputed for one shadow light.
+Palettes are immutable and shared by every session: the edits of a user are copy-on-write overrides layered over the
+shared defaults, and compile_palette() builds each distinct palette once.
+"""
+
+import colorsys
+import threading
+from collections import ChainMap, OrderedDict
+from types import MappingProxyType
+
+import numpy as np
+
+from molecule_record import element_symbol
+
+# atomic numbers 0 (dummy atom) to 118
+N_ELEMENTS = 119
+# number of compiled palettes kept by compile_palette()
+PALETTE_CACHE_ENTRIES = 64
+
+
+def hex_to_rgb(color):
+    """It takes a hexadecimal color string and returns a rgb tuple.
+
+    Parameters
+    ----------
+    color : string
+        The hexadecimal color code, it starts with a '#'.
+
+    Returns
+    -------
+    tuple
+        the RGB values of the hexadecimal color code.
+
+    """
+    r = int(color[1:3], 16)
+    g = int(color[3:5], 16)
+    b = int(color[5:], 16)
+    return r, g, b
+
+
+def rgb_to_hex(color):
+    """It takes the rgb tuple and returns the hexadecimal string of the color.
+    Based on https://stackoverflow.com/questions/3380726/converting-an-rgb-color-tuple-to-a-hexidecimal-string
+
+    Parameters
+    ----------
+    color : tuple
+        a tuple of three integers, each between 0 and 255, representing the rgb values.
+
+    Returns
+    -------
+    string
+        The hexadecimal color code, it starts with a '#'.
+
+    """
+    int_color = tuple([int(x) for x in color])
+    return '#%02x%02x%02x' % int_color
+
+
+def shadow_color_correction(color, light_multiplier):
+    """Given a color and a light multiplier, return the hexadecimal color code with the corrected light.
+
+    Parameters
+    ----------
+    color : tuple
+        The rgb color tuple.
+    light_multiplier : float
+        The value to multiply to decrease the light.
+
+    Returns
+    -------
+    string
+        The hexadecimal color code, it starts with a '#'.
+
+    """
+    r, g, b = hex_to_rgb(color)
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+    rgb = colorsys.hls_to_rgb(h, l * light_multiplier, s)
+    return rgb_to_hex(rgb)
+
+
+class Palette:
+    """Immutable colors and sizes of an icon style, see the module description. Build palettes with
+    compile_palette() so that equal styles share one palette.
+
+    Parameters
+    ----------
+    colors : mapping
+        The hex color of each atom symbol, and of 'other' (the elements without a color), 'Bond' and 'Background'.
+    sizes : mapping
+        The radius multiplier of each atom symbol and of 'other', and the 'Bond', 'Bond spacing' and 'Outline'
+        multipliers.
+    shadow_light : float, default: 0.35
+        The light multiplier of the shadow colors.
+
+    Attributes
+    ----------
+    colors, sizes : mapping
+        Read-only views of the colors and sizes.
+    fill, shadow : numpy.ndarray
+        The fill and the shadow color of each atomic number, the ones of 'other' for the elements without a color.
+    radius : numpy.ndarray
+        The radius multiplier of each atomic number.
+    known : numpy.ndarray
+        Whether each atomic number has its own color, the others are drawn as 'other'.
+    contour : str
+        The shadow color of the bonds, drawn around them.
+    max_size : float
+        The largest multiplier of the sizes, which bounds the atom size.
+
+    """
+    __slots__ = ('colors', 'sizes', 'shadow_light', 'fill', 'shadow', 'radius', 'known', 'contour', 'max_size',
+                 '_shadows', '_key')
+
+    def __init__(self, colors, sizes, shadow_light=0.35):
+        self.colors = MappingProxyType(colors)
+        self.sizes = MappingProxyType(sizes)
+        self.shadow_light = shadow_light
+        # the few distinct colors are corrected once
+        self._shadows = {color: shadow_color_correction(color, shadow_light) for color in set(colors.values())}
+        symbols = [element_symbol(number) for number in range(N_ELEMENTS)]
+        self.known = np.array([symbol in colors for symbol in symbols])
+        names = [symbol if symbol in colors else 'other' for symbol in symbols]
+        self.fill = np.array([colors[name] for name in names], dtype=object)
+        self.shadow = np.array([self._shadows[color] for color in self.fill], dtype=object)
+        self.radius = np.array([sizes.get(name, sizes['other']) for name in names], dtype=float)
+        self.contour = self._shadows[colors['Bond']]
+        self.max_size = max(sizes.values())
+        self._key = (tuple(sorted(colors.items())), tuple(sorted(sizes.items())), shadow_light)
+        for array in (self.known, self.fill, self.shadow, self.radius):
+            array.flags.writeable = False
+
+    def __eq__(self, other):
+        return isinstance(other, Palette) and self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return f'Palette({len(self.colors)} colors, shadow_light={self.shadow_light})'
+
+    def style(self, symbol):
+        """It returns the name ('other' if the symbol has no color), the fill color, the shadow color and the radius
+        multiplier of an atom symbol."""
+        name = symbol if symbol in self.colors else 'other'
+        color = self.colors[name]
+        return name, color, self._shadows[color], self.sizes.get(name, self.sizes['other'])
+
+    def override(self, colors=None, sizes=None, shadow_light=None):
+        """Return the palette with some colors, sizes or the shadow light changed. The changes are layered over the
+        colors and sizes of this palette, which are shared and not copied."""
+        return compile_palette(ChainMap(dict(colors or {}), self.colors), ChainMap(dict(sizes or {}), self.sizes),
+                               self.shadow_light if shadow_light is None else shadow_light)
+
+
+_palettes = OrderedDict()  # palette key -> palette
+_palettes_lock = threading.Lock()
+
+
+def compile_palette(colors, sizes, shadow_light=0.35):
+    """It returns the palette of the given colors, sizes and shadow light, compiled once for the last
+    PALETTE_CACHE_ENTRIES distinct styles. A ChainMap of the edits of a user over the default dictionaries can be
+    given, so a session only keeps its edits.
+
+    Parameters
+    ----------
+    colors : mapping
+        The colors, see Palette.
+    sizes : mapping
+        The sizes, see Palette.
+    shadow_light : float, default: 0.35
+        The light multiplier of the shadow colors.
+
+    Returns
+    -------
+    Palette
+        The palette, shared by every caller.
+
+    """
+    key = (tuple(sorted(colors.items())), tuple(sorted(sizes.items())), shadow_light)
+    with _palettes_lock:
+        palette = _palettes.get(key)
+        if palette is not None:
+            _palettes.move_to_end(key)
+            return palette
+    # the palette keeps its own flat copy, the given mappings may still be edited
+    palette = Palette(dict(colors), dict(sizes), shadow_light)
+    with _palettes_lock:
+        _palettes[key] = palette
+        while len(_palettes) > PALETTE_CACHE_ENTRIES:
+            _palettes.popitem(last=False)
+    return palette
@@ -0,0 +1,153 @@
+"""Memoization of the icons and 3D graphs rendered by the viewer, keyed on a hashable render specification."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from rdkit import Chem
+
+DEFAULT_MAX_ENTRIES = 64
+# bound of the memory of the cached results of a process, see result_size()
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def freeze(value):
+    """Return an immutable and hashable copy of a parameter: dictionaries become sorted tuples of (key, value) pairs,
+    lists and tuples become tuples and numpy scalars become python scalars."""
+    if isinstance(value, dict):
+        return tuple(sorted(((key, freeze(item)) for key, item in value.items()), key=lambda pair: repr(pair[0])))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(freeze(item) for item in value))
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return freeze(value.tolist())
+    return value
+
+
+def molecule_key(mol):
+    """Return a digest of a molecule, with its atoms, bonds, properties and coordinates of every conformation. A
+    molecule_record.MoleculeRecord carries the digest of its molecule."""
+    if not isinstance(mol, Chem.Mol):
+        return mol.key
+    data = mol.ToBinary(Chem.PropertyPickleOptions.AllProps | Chem.PropertyPickleOptions.CoordsAsDouble)
+    return hashlib.sha1(data).hexdigest()
+
+
+def result_size(result):
+    """Return the approximate memory, in bytes, of a render result: the length of its bytes and strings and the size
+    of the arrays of its figures, in dictionaries and lists. Other values are not counted."""
+    if isinstance(result, (bytes, bytearray, str)):
+        return len(result)
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, dict):
+        return sum(result_size(value) for value in result.values())
+    if isinstance(result, (list, tuple)):
+        return sum(result_size(value) for value in result)
+    if hasattr(result, "to_plotly_json"):  # plotly figure or trace
+        data = getattr(result, "data", None)
+        if data is not None:
+            return sum(result_size(trace) for trace in data)
+        return result_size(result.to_plotly_json())
+    return 0
+
+
+@dataclass(frozen=True)
+class RenderSpec:
+    """Immutable description of one render: the molecule digest, the kind of output (e.g. 'icon' or 'graph') and every
+    parameter passed to the renderer, frozen with freeze()."""
+    molecule: str
+    kind: str
+    params: tuple
+
+
+def render_spec(mol, kind, **params):
+    """Build the RenderSpec of a molecule rendered with the given keyword parameters."""
+    return RenderSpec(molecule_key(mol), kind, freeze(params))
+
+
+class RenderCache:
+    """Bounded cache of render results, evicting the least recently used ones.
+
+    Parameters
+    ----------
+    max_entries : int, default: DEFAULT_MAX_ENTRIES
+        The maximum number of results kept in memory.
+    max_bytes : int, default: DEFAULT_MAX_BYTES
+        The maximum total size of the results kept in memory, see result_size(). A result bigger than max_bytes is
+        returned but not cached.
+
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()  # spec -> (result, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_render(self, spec, render):
+        """Return the result cached for spec, or call render() and cache its result.
+
+        Parameters
+        ----------
+        spec : RenderSpec
+            The key of the result.
+        render : callable
+            A function without arguments that produces the result described by spec. The result is shared by every
+            later hit, so it must not be modified by the callers.
+
+        """
+        with self._lock:
+            if spec in self._results:
+                self.hits += 1
+                self._results.move_to_end(spec)
+                return self._results[spec][0]
+            self.misses += 1
+        result = render()  # outside the lock, other specs can be rendered meanwhile
+        size = result_size(result)
+        if size > self.max_bytes:
+            return result
+        with self._lock:
+            if spec in self._results:  # rendered meanwhile by another session
+                self._bytes -= self._results.pop(spec)[1]
+            self._results[spec] = (result, size)
+            self._bytes += size
+            while len(self._results) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._results.popitem(last=False)[1][1]
+        return result
+
+    def stats(self):
+        """Return the number of hits, misses and cached results, and the size of the results."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._results), "bytes": self._bytes}
+
+    def clear(self):
+        """Remove every result, the counters are kept."""
+        with self._lock:
+            self._results.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_render_cache():
+    """Return the process-wide render cache."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = RenderCache()
+        return _default_cache
@@ -0,0 +1,180 @@
+"""Persistent cache for resolving molecule names to SMILES through cirpy."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cirpy
+
+from tracing import span
+
+# default location of the on-disk cache, shared by every session and restart
+DEFAULT_CACHE_PATH = os.environ.get(
+    "RESOLVER_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "beyond-sunlight", "resolver.sqlite3"),
+)
+# resolved names are kept for 30 days before asking the CIR web service again
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+# number of names kept in the in-process tier in front of SQLite
+MEMORY_ENTRIES = 512
+# the access times of the names served from memory are written to SQLite at most this often (seconds)
+ACCESS_FLUSH_INTERVAL = 60
+
+
+def normalize_name(name):
+    """Return the cache key of a molecule name: lower case and single spaced."""
+    return " ".join(str(name).strip().lower().split())
+
+
+class ResolverCache:
+    """Name to SMILES resolver with an in-memory tier, a SQLite tier and the CIR web service as fallback.
+
+    Parameters
+    ----------
+    path : str, default: DEFAULT_CACHE_PATH
+        The SQLite file used as persistent store. Use ':memory:' for a non-persistent cache.
+    ttl : float, default: DEFAULT_TTL
+        Number of seconds after which a cached entry is considered stale. None disables the expiration.
+    max_entries : int, default: DEFAULT_MAX_ENTRIES
+        Maximum number of entries in the SQLite store, the least recently used ones are evicted first.
+    offline : bool, default: False
+        If True, the web service is never contacted and unknown names raise a LookupError.
+
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, offline=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.offline = offline
+        self._memory = OrderedDict()  # key -> (smiles, stored_at)
+        self._accessed = {}  # key -> last access of the memory hits not written to SQLite yet
+        self._flushed_at = time.time()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resolved ("
+            "name TEXT PRIMARY KEY, smiles TEXT NOT NULL, stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS resolved_access ON resolved (last_access)")
+        self._conn.commit()
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _remember(self, key, smiles, stored_at):
+        self._memory[key] = (smiles, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _flush_accesses(self, now):
+        # write the pending access times of the memory hits, so the eviction order sees the most used names
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE resolved SET last_access = MAX(last_access, ?) WHERE name = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._flushed_at = now
+
+    def get(self, name):
+        """Return the cached SMILES of a molecule name, or None if the name is not cached or expired."""
+        key = normalize_name(name)
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None and not self._expired(hit[1], now):
+                self._memory.move_to_end(key)
+                self._accessed[key] = now
+                if now - self._flushed_at > ACCESS_FLUSH_INTERVAL:
+                    self._flush_accesses(now)
+                    self._conn.commit()
+                return hit[0]
+            row = self._conn.execute("SELECT smiles, stored_at FROM resolved WHERE name = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            smiles, stored_at = row
+            if self._expired(stored_at, now) and not self.offline:  # stale entries are still better than nothing offline
+                return None
+            self._conn.execute("UPDATE resolved SET last_access = ? WHERE name = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, smiles, stored_at)
+            return smiles
+
+    def put(self, name, smiles):
+        """Store the SMILES of a molecule name and evict the least recently used entries above max_entries."""
+        key = normalize_name(name)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resolved (name, smiles, stored_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, smiles, now, now),
+            )
+            self._flush_accesses(now)
+            self._conn.execute(
+                "DELETE FROM resolved WHERE name IN "
+                "(SELECT name FROM resolved ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self._remember(key, smiles, now)
+
+    def resolve(self, name):
+        """Return the SMILES of a molecule name, asking the CIR web service only on a cache miss.
+
+        Raises
+        ------
+        LookupError
+            If the name is not cached and the cache is offline.
+        ValueError
+            If the web service is not able to resolve the name.
+
+        """
+        smiles = self.get(name)
+        if smiles is not None:
+            return smiles
+        if self.offline:
+            raise LookupError(f"Molecule name ({name}) is not cached and the resolver is offline")
+        with span("cir_request"):
+            smiles = cirpy.resolve(name, "smiles")
+        if not smiles:
+            raise ValueError(f"Molecule name ({name}) could not be resolved")
+        self.put(name, smiles)
+        return smiles
+
+    def clear(self):
+        """Remove every entry from both cache tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM resolved")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM resolved").fetchone()[0]
+
+
+_default_resolver = None
+_default_lock = threading.Lock()
+
+
+def default_resolver():
+    """Return the process-wide resolver. Set RESOLVER_OFFLINE=1 to never contact the web service."""
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            offline = os.environ.get("RESOLVER_OFFLINE", "").lower() in ("1", "true", "yes")
+            _default_resolver = ResolverCache(offline=offline)
+        return _default_resolver
+
+
+def resolve_smiles(name):
+    """Resolve a molecule name to SMILES through the process-wide cached resolver."""
+    return default_resolver().resolve(name)
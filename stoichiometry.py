@@ -0,0 +1,280 @@
+"""Parsing, exact balancing and vectorized yields of chemical reactions.
+
+An equation such as '12H2S + 6CO2 -> C6H12O6 + 6H2O + 12S' is parsed into the composition matrix of its species
+(one row for each element and one for the charge, one column for each species). The coefficients are checked, or
+found, with exact rational arithmetic, and the yields of whole grids of reactant amounts are computed with NumPy
+broadcasting:
+
+    reaction = Reaction.parse('CO2 + 4H2S + O2 -> CH2O + 4S + 3H2O')
+    h2s, co2, o2 = np.meshgrid(np.arange(21), np.arange(21), np.arange(21), indexing='ij')
+    result = reaction.run({'H2S': h2s, 'CO2': co2, 'O2': o2})  # arrays of shape (21, 21, 21)
+"""
+
+import math
+import re
+from collections import Counter
+from fractions import Fraction
+
+import numpy as np
+
+ELECTRON = 'e-'
+CHARGE = 'charge'
+_SUBSCRIPTS = str.maketrans('₀₁₂₃₄₅₆₇₈₉⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻', '01234567890123456789+-')
+_TO_SUBSCRIPTS = str.maketrans('0123456789', '₀₁₂₃₄₅₆₇₈₉')
+_TO_SUPERSCRIPTS = str.maketrans('0123456789+-', '⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻')
+_TERM = re.compile(r'^(\d*\.\d+|\d+(?:/\d+)?)?\s*(.+)$')
+_TOKEN = re.compile(r'([A-Z][a-z]?)(\d*)|(\()|(\))(\d*)')
+_CHARGE = re.compile(r'^(.*?)(?:\^(\d+))?([+-])$')
+_SUPERSCRIPT_CHARGE = re.compile(r'([⁰¹²³⁴⁵⁶⁷⁸⁹]+)(?=[⁺⁻]$)')
+
+
+def parse_formula(formula):
+    """It returns the composition of a chemical formula, e.g. 'C6H12O6', 'Ca(OH)2', 'NO2-', 'SO4^2-' or 'e-'.
+
+    Parameters
+    ----------
+    formula : str
+        The formula. A charge other than 1 follows a caret, so that 'NO2-' is NO2 with charge -1 and 'Fe^3+' is Fe
+        with charge +3. Unicode subscripts and superscripts (e.g. 'H₂S' or 'Fe³⁺') are accepted.
+
+    Returns
+    -------
+    Counter
+        The number of atoms of each element, and the charge under the CHARGE key.
+
+    Raises
+    ------
+    ValueError
+        If the formula is not valid.
+
+    """
+    text = _SUPERSCRIPT_CHARGE.sub(r'^\1', formula.strip()).translate(_SUBSCRIPTS)
+    if text == ELECTRON:
+        return Counter({CHARGE: -1})
+    composition = Counter()
+    match = _CHARGE.match(text)
+    if match and match.group(1):
+        text = match.group(1)
+        composition[CHARGE] = int(match.group(2) or 1) * (1 if match.group(3) == '+' else -1)
+    stack = [Counter()]
+    position = 0
+    while position < len(text):
+        token = _TOKEN.match(text, position)
+        if token is None:
+            raise ValueError(f'Invalid chemical formula ({formula})')
+        element, count, opening, closing, multiplier = token.groups()
+        if element:
+            stack[-1][element] += int(count or 1)
+        elif opening:
+            stack.append(Counter())
+        else:
+            if len(stack) == 1:
+                raise ValueError(f'Unbalanced parenthesis in the chemical formula ({formula})')
+            group = stack.pop()
+            for key, value in group.items():
+                stack[-1][key] += value * int(multiplier or 1)
+        position = token.end()
+    if len(stack) != 1 or not stack[0]:
+        raise ValueError(f'Invalid chemical formula ({formula})')
+    composition.update(stack[0])
+    return composition
+
+
+def pretty_formula(formula):
+    """Return a formula with unicode subscripts and superscripts, e.g. 'H₂S' or 'NO₂⁻'."""
+    match = _CHARGE.match(formula)
+    body, charge = (match.group(1), (match.group(2) or '') + match.group(3)) if match else (formula, '')
+    body = re.sub(r'(?<=[A-Za-z)])(\d+)', lambda m: m.group(1).translate(_TO_SUBSCRIPTS), body)
+    return body + charge.translate(_TO_SUPERSCRIPTS)
+
+
+def nullspace(matrix):
+    """It returns a basis of the rational null space of an integer matrix, by exact Gauss-Jordan elimination.
+
+    Parameters
+    ----------
+    matrix : array-like
+        The integer matrix.
+
+    Returns
+    -------
+    list
+        The basis vectors, as lists of Fraction.
+
+    """
+    rows = [[Fraction(int(value)) for value in row] for row in np.asarray(matrix)]
+    n_columns = len(rows[0]) if rows else 0
+    pivots = []
+    rank = 0
+    for column in range(n_columns):
+        pivot = next((r for r in range(rank, len(rows)) if rows[r][column] != 0), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        rows[rank] = [value / rows[rank][column] for value in rows[rank]]
+        for r in range(len(rows)):
+            if r != rank and rows[r][column] != 0:
+                factor = rows[r][column]
+                rows[r] = [value - factor * other for value, other in zip(rows[r], rows[rank])]
+        pivots.append(column)
+        rank += 1
+    basis = []
+    for free in (column for column in range(n_columns) if column not in pivots):
+        vector = [Fraction(0)] * n_columns
+        vector[free] = Fraction(1)
+        for r, column in enumerate(pivots):
+            vector[column] = -rows[r][free]
+        basis.append(vector)
+    return basis
+
+
+def integer_coefficients(vector):
+    """Return the smallest integers proportional to a rational vector."""
+    denominator = math.lcm(*(value.denominator for value in vector))
+    integers = [int(value * denominator) for value in vector]
+    divisor = math.gcd(*integers) or 1
+    return [value // divisor for value in integers]
+
+
+class Reaction:
+    """A balanced chemical reaction.
+
+    Attributes
+    ----------
+    species : tuple
+        The formulas of the reactants, then of the products.
+    coefficients : tuple
+        The stoichiometric coefficient (a positive integer) of each species.
+    n_reactants : int
+        The number of reactants.
+    elements : tuple
+        The elements of the reaction, and CHARGE if any species is charged.
+    matrix : numpy.ndarray
+        The composition matrix, elements x species.
+
+    """
+
+    def __init__(self, reactants, products, coefficients=None):
+        self.species = tuple(reactants) + tuple(products)
+        self.n_reactants = len(reactants)
+        if not reactants or not products:
+            raise ValueError('A reaction needs reactants and products')
+        if len(set(self.species)) != len(self.species):
+            raise ValueError('A species appears twice in the reaction')
+        compositions = [parse_formula(formula) for formula in self.species]
+        self.elements = tuple(sorted({key for composition in compositions for key in composition},
+                                     key=lambda key: (key == CHARGE, key)))
+        self.matrix = np.array([[composition[element] for composition in compositions] for element in self.elements],
+                               dtype=np.int64)
+        self.coefficients = tuple(self.balance(coefficients))
+
+    def _signed(self, coefficients):
+        return np.array([-c if i < self.n_reactants else c for i, c in enumerate(coefficients)], dtype=object)
+
+    def balance(self, coefficients=None):
+        """It returns the given coefficients if they balance the reaction, otherwise the only balanced coefficients.
+
+        Raises
+        ------
+        ValueError
+            If the reaction cannot be balanced, or if the species take part in several independent reactions and the
+            given coefficients do not balance the reaction.
+
+        """
+        if coefficients is not None:
+            coefficients = [Fraction(c) for c in coefficients]
+            if all(c > 0 for c in coefficients) and not any(self.matrix.astype(object) @ self._signed(coefficients)):
+                return integer_coefficients(coefficients)
+        equation = self._format([1] * len(self.species))
+        basis = nullspace(self.matrix)
+        if len(basis) != 1:
+            raise ValueError(f'The reaction {equation} cannot be balanced' if not basis else
+                             f'The species of the reaction {equation} balance {len(basis)} independent reactions, '
+                             f'the coefficients must be given')
+        # the null space vector has the signs of the stoichiometric vector: negative for the reactants
+        solution = list(self._signed(integer_coefficients(basis[0])))
+        if all(c < 0 for c in solution):
+            solution = [-c for c in solution]
+        if any(c <= 0 for c in solution):
+            raise ValueError(f'The reaction {equation} cannot be balanced with positive coefficients')
+        return [int(c) for c in solution]
+
+    @classmethod
+    def parse(cls, equation):
+        """It parses an equation such as '12H2S + 6CO2 -> C6H12O6 + 6H2O + 12S'. The arrow can be '->', '=>', '=' or
+        '→', and missing coefficients are 1 if the equation is balanced, otherwise they are computed."""
+        sides = re.split(r'\s*(?:->|=>|→|=)\s*', equation.strip())
+        if len(sides) != 2:
+            raise ValueError(f'Invalid chemical equation ({equation})')
+        terms = []
+        for side in sides:
+            side_terms = []
+            for term in re.split(r'\s+\+\s+', side):
+                match = _TERM.match(term.strip())
+                if match is None:
+                    raise ValueError(f'Invalid term ({term}) in the chemical equation ({equation})')
+                side_terms.append((Fraction(match.group(1) or 1), match.group(2).strip()))
+            terms.append(side_terms)
+        reactants, products = ([formula for _, formula in side] for side in terms)
+        return cls(reactants, products, [coefficient for side in terms for coefficient, _ in side])
+
+    @property
+    def reactants(self):
+        return self.species[:self.n_reactants]
+
+    @property
+    def products(self):
+        return self.species[self.n_reactants:]
+
+    def _format(self, coefficients, formula=str, arrow='->'):
+        terms = [f'{c if c != 1 else ""}{formula(s)}' for c, s in zip(coefficients, self.species)]
+        return f' {arrow} '.join((' + '.join(terms[:self.n_reactants]), ' + '.join(terms[self.n_reactants:])))
+
+    def __str__(self):
+        return self._format(self.coefficients)
+
+    def __repr__(self):
+        return f'Reaction.parse({str(self)!r})'
+
+    def pretty(self):
+        """Return the equation with unicode subscripts and arrow, e.g. 'CH₄ + 2O₂ → CO₂ + 2H₂O'."""
+        return self._format(self.coefficients, pretty_formula, '→')
+
+    def stoichiometric_vector(self):
+        """Return the signed coefficients: negative for the reactants, positive for the products."""
+        return np.array(self._signed(self.coefficients), dtype=float)
+
+    def run(self, amounts):
+        """It runs the reaction to completion for scalar or array amounts of reactants, in one vectorized call.
+
+        Parameters
+        ----------
+        amounts : dictionary
+            The moles of each reactant, as numbers or arrays broadcastable to a common shape. Missing reactants
+            are considered in excess (e.g. water, or the electrons of a half reaction).
+
+        Returns
+        -------
+        dictionary
+            'extent': the moles of reaction; 'limiting': the index in self.reactants of the limiting reactant (the
+            first one on ties); 'amounts': the final moles of every species given or produced.
+
+        """
+        unknown = set(amounts) - set(self.reactants)
+        if unknown:
+            raise KeyError(f'{", ".join(sorted(unknown))} are not reactants of {self}')
+        given = [i for i, formula in enumerate(self.reactants) if formula in amounts]
+        if not given:
+            raise ValueError('No reactant amount given')
+        arrays = np.broadcast_arrays(*(np.asarray(amounts[self.reactants[i]], dtype=float) for i in given))
+        # moles of reaction allowed by each reactant, stacked on the last axis
+        ratios = np.stack(arrays, axis=-1) / np.array([self.coefficients[i] for i in given], dtype=float)
+        position = np.argmin(ratios, axis=-1)
+        extent = np.maximum(np.take_along_axis(ratios, position[..., None], axis=-1)[..., 0], 0)
+        limiting = np.asarray(given)[position]
+        final = {}
+        for i, array in zip(given, arrays):
+            final[self.reactants[i]] = array - extent * self.coefficients[i]
+        for i, formula in enumerate(self.products, self.n_reactants):
+            final[formula] = extent * self.coefficients[i]
+        return {'extent': extent, 'limiting': limiting, 'amounts': final}
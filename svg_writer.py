@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Streaming SVG writer used to build the molecule icons.
+
+Elements are serialized to strings as soon as they are added, and the ids of the shapes in <defs> are kept in a set,
+so building and serializing an icon is linear in the number of elements. The pretty-printed output is the same as
+ElementTree with ET.indent(tree, space='\\t').
+
+For the compact output, the numbers can be rounded to a given number of decimals, and the attributes repeated by many
+elements can be written once as CSS classes in a <style> element.
+"""
+
+from xml.sax.saxutils import quoteattr
+
+
+def format_number(value, precision=None):
+    """It writes a number with at most precision decimals, without the trailing zeros (e.g. 12.50 is written 12.5
+    and 3.0 is written 3). With precision None, or for an integer, it returns str(value).
+
+    Parameters
+    ----------
+    value : float
+        The number.
+    precision : int, optional
+        The maximum number of decimals.
+
+    Returns
+    -------
+    str
+        The number text.
+
+    """
+    if precision is None or not isinstance(value, float):
+        return str(value)
+    text = f'{value:.{precision}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def format_attrs(attrs, precision=None):
+    """It serializes a dictionary of attributes, keeping their order.
+
+    Parameters
+    ----------
+    attrs : dictionary
+        The attribute names and values. Values are converted with str().
+    precision : int, optional
+        The maximum number of decimals of the float values, see format_number. By default, they are written in full.
+
+    Returns
+    -------
+    str
+        The attributes, each one preceded by a space.
+
+    """
+    return ''.join(f' {key}={quoteattr(format_number(value, precision))}' for key, value in attrs.items())
+
+
+def format_element(tag, attrs, precision=None):
+    """It serializes an empty element, in the same way as ElementTree.
+
+    Parameters
+    ----------
+    tag : str
+        The tag of the element.
+    attrs : dictionary
+        The attributes of the element.
+    precision : int, optional
+        The maximum number of decimals of the float values, see format_number.
+
+    Returns
+    -------
+    str
+        The element text.
+
+    """
+    return f'<{tag}{format_attrs(attrs, precision)} />'
+
+
+class SvgWriter:
+    """Buffered SVG document with a registry of the shapes defined in <defs>.
+
+    Parameters
+    ----------
+    attrs : dictionary
+        The attributes of the root <svg> element.
+    precision : int, optional
+        The maximum number of decimals of the numbers written in the document, see format_number. By default, they
+        are written in full.
+
+    """
+
+    def __init__(self, attrs, precision=None):
+        self.attrs = dict(attrs)
+        self.precision = precision
+        self._head = []  # (depth, text) chunks written before <defs>
+        self._defs = []  # (depth, text) chunks inside <defs>
+        self._body = []  # (depth, text) chunks written after <defs>
+        self._defined = set()
+        self._defs_started = False
+        self._classes = {}  # CSS class name -> attributes, written in <style>
+
+    def get(self, key, default=None):
+        """Return an attribute of the root element."""
+        return self.attrs.get(key, default)
+
+    def number(self, value):
+        """Return the text of a number with the precision of the document, e.g. to build a path or a transform."""
+        return format_number(value, self.precision)
+
+    def element(self, tag, attrs):
+        """Append an empty element to the document."""
+        (self._body if self._defs_started else self._head).append((1, format_element(tag, attrs, self.precision)))
+
+    def add_class(self, name, attrs):
+        """Define a CSS class, so that the elements with class=name share these attributes instead of repeating
+        them. The elements of extended documents can use the classes of this document."""
+        self._classes[name] = dict(attrs)
+
+    def extend(self, other):
+        """Append the body of another document, e.g. a cached fragment. Its defs and root attributes are ignored."""
+        (self._body if self._defs_started else self._head).extend(other._head + other._body)
+
+    def start_defs(self):
+        """Place the <defs> element: the next elements are written after it."""
+        self._defs_started = True
+
+    def has_def(self, def_id):
+        """Whether a shape with this id is already defined."""
+        return def_id in self._defined
+
+    def add_def(self, def_id, children):
+        """Define a group of shapes that can be reused with <use>.
+
+        Parameters
+        ----------
+        def_id : str
+            The id of the group.
+        children : list
+            A list of (tag, attrs) tuples for the elements of the group.
+
+        """
+        self._defined.add(def_id)
+        self._defs.append((2, f'<g{format_attrs({"id": def_id})}>'))
+        self._defs.extend((3, format_element(tag, attrs, self.precision)) for tag, attrs in children)
+        self._defs.append((2, '</g>'))
+
+    def add_raw_def(self, def_id, text):
+        """Define a group containing already serialized SVG text, e.g. an emoji."""
+        self._defined.add(def_id)
+        self._defs.append((2, f'<g{format_attrs({"id": def_id})}>'))
+        self._defs.append((3, text))
+        self._defs.append((2, '</g>'))
+
+    def _chunks(self):
+        yield 0, f'<svg{format_attrs(self.attrs)}>'
+        if self._classes:
+            rules = ''.join('.' + name + '{' + ';'.join(f'{key}:{format_number(value, self.precision)}'
+                                                        for key, value in attrs.items()) + '}'
+                            for name, attrs in self._classes.items())
+            yield 1, f'<style>{rules}</style>'
+        yield from self._head
+        if self._defs_started:
+            if self._defs:
+                yield 1, '<defs>'
+                yield from self._defs
+                yield 1, '</defs>'
+            else:
+                yield 1, '<defs />'
+        yield from self._body
+        yield 0, '</svg>'
+
+    def to_string(self, indent='\t'):
+        """Serialize the document.
+
+        Parameters
+        ----------
+        indent : str, default: '\\t'
+            The indentation of each level. None writes the document without whitespace between elements.
+
+        Returns
+        -------
+        str
+            The svg text.
+
+        """
+        if indent is None:
+            return ''.join(text for _, text in self._chunks())
+        return '\n'.join(indent * depth + text for depth, text in self._chunks())
+
+    def to_bytes(self, indent='\t'):
+        """Serialize the document as utf-8 bytes, see to_string."""
+        return self.to_string(indent).encode('utf-8')
@@ -0,0 +1,44 @@
+import json
+import os
+
+import pytest
+
+import molecule_icon_generator as mig
+
+
+def test_invalid_smiles_is_a_value_error():
+    with pytest.raises(ValueError, match='not_a_smiles'):
+        mig.parse_structure('not_a_smiles')
+    record = mig.render_item('junk', 'not_a_smiles', {'directory': '.'})
+    assert record['status'] == 'error'
+    assert record['error'] == 'ValueError: Invalid SMILES (not_a_smiles)'
+
+
+def test_render_item_lists_the_written_files(tmp_path):
+    # a stale file of a previous run must not be reported
+    (tmp_path / 'ethanol.pdf').write_bytes(b'')
+    record = mig.render_item('ethanol', 'CCO', {'directory': str(tmp_path), 'save_png': True})
+    assert record['status'] == 'ok'
+    assert record['files'] == ['ethanol.svg', 'ethanol.png']
+    assert all(os.path.getsize(tmp_path / name) for name in record['files'])
+
+
+class Interrupt:
+    """A progress stream interrupting the batch after the first item."""
+
+    def write(self, text):
+        if text.strip():
+            raise KeyboardInterrupt
+
+    def flush(self):
+        pass
+
+
+def test_interrupted_batch_keeps_its_manifest(tmp_path):
+    items = [('water', 'O'), ('ethanol', 'CCO'), ('methane', 'C')]
+    with pytest.raises(KeyboardInterrupt):
+        mig.render_batch(items, {'directory': str(tmp_path)}, workers=1, stream=Interrupt())
+    with open(tmp_path / 'manifest.json') as f:
+        records = json.load(f)['items']
+    assert len(records) == 1
+    assert records[0]['name'] == 'water' and records[0]['status'] == 'ok'
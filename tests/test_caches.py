@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from rdkit import Chem
+
+import conformer_cache
+import resolver_cache
+from conformer_cache import ConformerCache
+from render_cache import RenderCache, render_spec, result_size
+from resolver_cache import ResolverCache
+
+WATER = Chem.MolFromSmiles('O')
+
+
+class Clock:
+    """A time.time() replacement advanced by hand, so the access times never tie."""
+
+    def __init__(self):
+        self.now = 1e9
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resolver_cache, 'time', clock)
+    monkeypatch.setattr(conformer_cache, 'time', clock)
+    return clock
+
+
+def test_resolver_evicts_the_least_recently_used_names(tmp_path, clock):
+    path = str(tmp_path / 'resolver.sqlite3')
+    cache = ResolverCache(path, max_entries=3, offline=True)
+    for name, smiles in (('water', 'O'), ('methane', 'C'), ('ethanol', 'CCO')):
+        cache.put(name, smiles)
+    assert cache.get(' Water ') == 'O'  # a memory hit, written to SQLite with the next put
+    cache.put('ammonia', 'N')
+    assert len(cache) == 3
+    stored = ResolverCache(path, offline=True)  # reads the SQLite tier only
+    assert stored.get('methane') is None
+    assert [stored.get(name) for name in ('water', 'ethanol', 'ammonia')] == ['O', 'CCO', 'N']
+
+
+def test_resolver_entries_expire(tmp_path, clock):
+    path = str(tmp_path / 'resolver.sqlite3')
+    ResolverCache(path, ttl=100).put('water', 'O')
+    clock.now += 1000
+    assert ResolverCache(path, ttl=100).get('water') is None
+    # stale entries are still used offline, unknown names are not looked up
+    offline = ResolverCache(path, ttl=100, offline=True)
+    assert offline.resolve('water') == 'O'
+    with pytest.raises(LookupError):
+        offline.resolve('methane')
+
+
+def test_conformer_cache_is_bounded_by_size(tmp_path, clock):
+    molecules = {smiles: Chem.AddHs(Chem.MolFromSmiles(smiles)) for smiles in ('CCO', 'CCN', 'CCC', 'CCCl')}
+    path = str(tmp_path / 'conformers.sqlite3')
+    sizes = []
+    for smiles, mol in molecules.items():
+        probe = ConformerCache(':memory:')
+        probe.put(smiles, mol)
+        sizes.append(probe.size())
+    cache = ConformerCache(path, max_bytes=sizes[1] + sizes[2] + sizes[3])
+    for smiles, mol in molecules.items():
+        cache.put(smiles, mol)
+    assert len(cache) == 3 and cache.size() <= cache.max_bytes
+    stored = ConformerCache(path)
+    assert stored.get('CCO') is None
+    copy = stored.get('CCN')
+    assert Chem.MolToSmiles(copy) == Chem.MolToSmiles(molecules['CCN'])
+    copy.SetProp('_Name', 'changed')
+    assert not stored.get('CCN').HasProp('_Name')  # every hit is a new copy
+    assert (stored.hits, stored.misses) == (2, 1)
+
+
+def test_render_cache_evicts_by_entries_and_bytes():
+    cache = RenderCache(max_entries=3, max_bytes=1000)
+    specs = [render_spec(WATER, 'icon', size=size) for size in range(5)]
+    for spec in specs[:3]:
+        cache.get_or_render(spec, lambda: b'x' * 100)
+    cache.get_or_render(specs[0], lambda: pytest.fail('cached'))
+    cache.get_or_render(specs[3], lambda: b'x' * 100)
+    assert len(cache) == 3
+    assert cache.get_or_render(specs[1], lambda: 'rendered again') == 'rendered again'  # the least recently used
+    # a big result evicts the least recently used results until the bytes fit
+    cache.get_or_render(specs[4], lambda: np.zeros(100))
+    assert cache.stats() == {'hits': 1, 'misses': 6, 'entries': 3, 'bytes': 100 + len('rendered again') + 800}
+    # results bigger than the bound are returned but not cached
+    big = cache.get_or_render(render_spec(WATER, 'graph'), lambda: {'data': [b'x' * 2000]})
+    assert result_size(big) == 2000 and len(cache) == 3
+
+
+def test_render_specs_are_frozen():
+    assert render_spec(WATER, 'icon', colors={'C': '#000', 'O': '#f00'}, rotation=[0, 1, 2]) == \
+        render_spec(WATER, 'icon', rotation=(0, 1, 2), colors={'O': '#f00', 'C': '#000'})
+    assert render_spec(WATER, 'icon', size=np.int64(3)) == render_spec(WATER, 'icon', size=3)
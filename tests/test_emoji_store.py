@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from emoji_store import EmojiStore
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 72 72"><circle cx="36" cy="36" r="30"/></svg>'
+
+
+class OpenMoji(BaseHTTPRequestHandler):
+    """Serve /<style>/<unicode>.svg: 'SLOW' answers after a delay, 'FLAKY' fails twice with a 503 and 'GONE' is
+    never found."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            count = server.requests[self.path]
+        unicode = self.path.rsplit('/', 1)[-1][:-len('.svg')]
+        if unicode == 'SLOW':
+            time.sleep(0.5)
+        if unicode == 'GONE':
+            self.send_response(404)
+            body = b'404: Not Found'
+        elif unicode == 'FLAKY' and count <= 2:
+            self.send_response(503)
+            body = b''
+        else:
+            self.send_response(200)
+            body = SVG
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), OpenMoji)
+    httpd.requests = Counter()
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_store(server, tmp_path, **kwargs):
+    url = f'http://127.0.0.1:{server.server_port}/{{style}}/{{unicode}}.svg'
+    return EmojiStore(path=str(tmp_path), bundle=None, url=url, **kwargs)
+
+
+def test_concurrent_downloads_are_fetched_once(server, tmp_path):
+    store = make_store(server, tmp_path)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def download():
+        barrier.wait()
+        results.append(store.download('slow'))
+
+    threads = [threading.Thread(target=download) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [SVG] * 8
+    assert server.requests == {'/color/SLOW.svg': 1}
+    assert store.downloads == 1
+    assert (tmp_path / 'color' / 'SLOW.svg').read_bytes() == SVG
+
+
+def test_prefetch_loads_repeated_emojis_once(server, tmp_path):
+    store = make_store(server, tmp_path)
+    store.prefetch([('1f525', True), ('1F525', True), ('1F525', False), ('2728', True)])
+    assert server.requests == {'/color/1F525.svg': 1, '/black/1F525.svg': 1, '/color/2728.svg': 1}
+    store.get('1F525')
+    assert sum(server.requests.values()) == 3
+
+
+def test_server_errors_are_retried(server, tmp_path):
+    store = make_store(server, tmp_path, retries=2)
+    assert store.get('flaky')[1] == (0, 0, 72, 72)
+    assert server.requests['/color/FLAKY.svg'] == 3
+
+
+def test_missing_emoji_is_a_value_error(server, tmp_path):
+    store = make_store(server, tmp_path)
+    with pytest.raises(ValueError, match='GONE'):
+        store.get('GONE')
+    assert server.requests['/color/GONE.svg'] == 1
+    assert not (tmp_path / 'color' / 'GONE.svg').exists()
+
+
+def test_offline_store_makes_no_request(server, tmp_path):
+    (tmp_path / 'color').mkdir()
+    (tmp_path / 'color' / '1F525.svg').write_bytes(SVG)
+    store = make_store(server, tmp_path, offline=True)
+    assert store.get('1F525')[1] == (0, 0, 72, 72)
+    with pytest.raises(LookupError):
+        store.get('2728')
+    with pytest.raises(LookupError):
+        store.prefetch([('2728', True), ('1F680', True)])
+    assert not store.has('2728')
+    assert sum(server.requests.values()) == 0
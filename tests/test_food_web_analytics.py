@@ -0,0 +1,91 @@
+import math
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from food_web_analytics import (adjacency_matrix, analyze, betweenness, energy_flow, keystone_index, source_links,
+                                trophic_levels)
+
+
+def random_web(n, p, seed, acyclic=True):
+    """A random food web, with the edges from prey to predator."""
+    graph = nx.gnp_random_graph(n, p, seed=seed, directed=True)
+    if acyclic:
+        graph.remove_edges_from([(i, j) for i, j in list(graph.edges) if i >= j])
+    return graph
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_trophic_levels_match_networkx(seed):
+    graph = random_web(60, 0.08, seed)
+    nodes, matrix = adjacency_matrix(graph)
+    levels = trophic_levels(matrix, np.zeros(len(nodes), dtype=bool))
+    expected = nx.trophic_levels(graph)
+    np.testing.assert_allclose(levels, [expected[node] for node in nodes], rtol=1e-8)
+
+
+def test_energy_sources_are_level_zero():
+    graph = nx.DiGraph([('H2S', 'bacterium'), ('bacterium', 'worm'), ('CH4', 'worm')])
+    nodes, matrix = adjacency_matrix(graph)
+    levels = dict(zip(nodes, trophic_levels(matrix, np.array([node in ('H2S', 'CH4') for node in nodes]))))
+    assert levels == {'H2S': 0, 'CH4': 0, 'bacterium': 1, 'worm': 1.5}
+
+
+@pytest.mark.parametrize('acyclic', (True, False))
+def test_betweenness_matches_networkx(acyclic):
+    graph = random_web(80, 0.05, 7, acyclic)
+    nodes, matrix = adjacency_matrix(graph)
+    expected = nx.betweenness_centrality(graph, normalized=True)
+    np.testing.assert_allclose(betweenness(matrix), [expected[node] for node in nodes], atol=1e-12)
+
+
+def test_source_links_match_networkx():
+    graph = random_web(50, 0.06, 3, acyclic=False)
+    graph = nx.relabel_nodes(graph, {0: 'H2S', 1: 'CH4'})
+    nodes, matrix = adjacency_matrix(graph)
+    links = source_links(matrix, nodes)
+    for source in ('H2S', 'CH4'):
+        lengths = nx.single_source_shortest_path_length(graph, source)
+        assert list(links[source]) == [lengths.get(node, math.inf) for node in nodes]
+
+
+def test_energy_flow_solves_the_transfers():
+    graph = random_web(40, 0.1, 5, acyclic=False)
+    nodes, matrix = adjacency_matrix(graph)
+    sources = np.zeros(len(nodes), dtype=bool)
+    sources[:3] = True
+    energy = energy_flow(matrix, sources, efficiency=0.1)
+    # every node keeps its inflow plus the share of the energy of each prey
+    inflow = sources.astype(float)
+    for j, node in enumerate(nodes):
+        received = sum(0.1 * energy[nodes.index(prey)] / graph.out_degree(prey) for prey in graph.predecessors(node))
+        assert energy[j] == pytest.approx(inflow[j] + received, abs=1e-9)
+
+
+def test_keystone_index_of_a_food_chain():
+    graph = random_web(40, 0.1, 11)
+    nodes, matrix = adjacency_matrix(graph)
+    bottom_up, top_down = keystone_index(matrix)
+
+    def recursive_bottom_up(node):
+        return sum((1 + recursive_bottom_up(predator)) / graph.in_degree(predator)
+                   for predator in graph.successors(node))
+
+    def recursive_top_down(node):
+        return sum((1 + recursive_top_down(prey)) / graph.out_degree(prey) for prey in graph.predecessors(node))
+
+    np.testing.assert_allclose(bottom_up, [recursive_bottom_up(node) for node in nodes], rtol=1e-10)
+    np.testing.assert_allclose(top_down, [recursive_top_down(node) for node in nodes], rtol=1e-10)
+
+
+def test_analyze_table():
+    graph = nx.DiGraph([('H2S', 'bacterium'), ('bacterium', 'worm'), ('bacterium', 'crab'), ('worm', 'crab')])
+    table = analyze(graph)
+    # the ties keep the order of the nodes
+    assert list(table.index) == ['H2S', 'bacterium', 'crab', 'worm']
+    assert list(table['keystone']) == [3, 3, 3, 1.5]
+    assert table.loc['crab', 'prey'] == 2 and table.loc['crab', 'predators'] == 0
+    assert table.loc['crab', 'links_from_H2S'] == 2
+    assert list(table['trophic_level']) == pytest.approx([0, 1, 2.5, 2])
+    assert 'links_from_CH4' not in table
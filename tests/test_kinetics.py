@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+import pytest
+
+import kinetics
+from kinetics import PATHWAY_KINETICS, KineticModel, half_life, simulate_batch
+
+EQUATION = '2H2 + O2 -> 2H2O'
+PATHWAY = 'Hydrogen oxidation'
+
+
+def scenarios(n, seed=0):
+    rng = np.random.default_rng(seed)
+    temperatures = rng.uniform(0, 120, n)
+    concentrations = np.column_stack((rng.uniform(0.1, 100, n), rng.uniform(0.1, 100, n), np.zeros(n)))
+    biomass = rng.uniform(1, 200, n)
+    return temperatures, concentrations, biomass
+
+
+@pytest.fixture
+def blocked_executor():
+    """Keep the simulation thread busy, so the batches asked meanwhile are still pending."""
+    release = threading.Event()
+    blocker = kinetics._executor.submit(release.wait)
+    yield
+    release.set()
+    blocker.result()
+
+
+def batch(t_end, channel):
+    return simulate_batch(EQUATION, PATHWAY, *scenarios(4), t_end=t_end, n_points=5, channel=channel)
+
+
+def test_a_channel_only_waits_for_its_last_batch(blocked_executor):
+    first = batch(1.0, 'session')
+    second = batch(2.0, 'session')
+    assert first.cancelled()
+    assert not second.cancelled()
+    assert kinetics.batch_key(EQUATION, PATHWAY, *scenarios(4), 1.0, 5) not in kinetics._pending
+
+
+def test_shared_batches_are_not_cancelled(blocked_executor):
+    shared = batch(3.0, 'first session')
+    assert batch(3.0, 'second session') is shared
+    anonymous = batch(4.0, None)
+    batch(5.0, 'first session')
+    assert not shared.cancelled()  # the second session still waits for it
+    batch(6.0, 'second session')
+    assert shared.cancelled()
+    batch(4.0, 'first session')
+    batch(7.0, 'first session')
+    assert not anonymous.cancelled()  # asked without channel
+
+
+def test_results_are_memoized_and_read_only():
+    result = batch(8.0, 'session').result(timeout=60)
+    again = batch(8.0, 'session')
+    assert again.done() and again.result() is result
+    assert not result['concentrations'].flags.writeable
+    assert not kinetics._wanted and not kinetics._latest
+
+
+def test_grouped_integration_matches_each_scenario():
+    model = KineticModel(EQUATION, PATHWAY_KINETICS[PATHWAY])
+    temperatures, concentrations, biomass = scenarios(2 * kinetics.GROUP_SCENARIOS + 5, seed=1)
+    result = model.simulate(temperatures, concentrations, biomass, t_end=24, n_points=25)
+    assert result['concentrations'].shape == (len(biomass), 3, 25)
+    # hydrogen atoms are conserved
+    hydrogen = result['concentrations'][:, 0] + result['concentrations'][:, 2]
+    np.testing.assert_allclose(hydrogen, hydrogen[:, :1].repeat(25, axis=1), atol=1e-5)
+    for i in (0, 17, 40, 68):
+        alone = model.simulate(temperatures[i:i + 1], concentrations[i:i + 1], biomass[i:i + 1], t_end=24,
+                               n_points=25, method='Radau')
+        np.testing.assert_allclose(result['concentrations'][i], alone['concentrations'][0], atol=1e-4)
+    assert np.isfinite(half_life(result, 1)).any()
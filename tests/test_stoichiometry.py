@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from stoichiometry import CHARGE, Reaction, parse_formula
+
+
+def test_parse_integer_coefficients():
+    reaction = Reaction.parse('12H2S + 6CO2 -> C6H12O6 + 6H2O + 12S')
+    assert reaction.reactants == ('H2S', 'CO2')
+    assert reaction.products == ('C6H12O6', 'H2O', 'S')
+    assert reaction.coefficients == (12, 6, 1, 6, 12)
+
+
+def test_parse_fractional_coefficients():
+    assert Reaction.parse('H2 + 1/2O2 -> H2O').coefficients == (2, 1, 2)
+
+
+def test_parse_decimal_coefficients():
+    assert Reaction.parse('H2 + 0.5O2 -> H2O').coefficients == (2, 1, 2)
+    assert Reaction.parse('H2 + .5 O2 -> H2O').coefficients == (2, 1, 2)
+    assert Reaction.parse('1.5O2 + CH4 -> CO + 2H2O').coefficients == (3, 2, 2, 4)
+
+
+def test_parse_charged_terms():
+    reaction = Reaction.parse('NH4+ + 2O2 -> NO3- + 2H+ + H2O')
+    assert reaction.coefficients == (1, 2, 1, 2, 1)
+    assert CHARGE in reaction.elements
+    assert Reaction.parse('Fe^2+ -> Fe^3+ + e-').coefficients == (1, 1, 1)
+    assert parse_formula('SO4^2-') == {'S': 1, 'O': 4, CHARGE: -2}
+
+
+def test_parse_rejects_invalid_equations():
+    with pytest.raises(ValueError):
+        Reaction.parse('H2 + O2')
+    with pytest.raises(ValueError, match='Invalid chemical formula'):
+        Reaction.parse('H2 + O2 -> h2o')
+    # the decimal coefficient is read, the species then appears twice
+    with pytest.raises(ValueError, match='twice'):
+        Reaction.parse('2H2 + O2 -> 2H2O + 0.5O2')
+
+
+def test_missing_coefficients_are_balanced():
+    assert str(Reaction.parse('H2S + CO2 -> C6H12O6 + H2O + S')) == '12H2S + 6CO2 -> C6H12O6 + 6H2O + 12S'
+    assert Reaction.parse('CH4 + O2 -> CO2 + H2O').coefficients == (1, 2, 1, 2)
+    assert Reaction.parse('Fe^2+ + MnO4- + H+ -> Fe^3+ + Mn^2+ + H2O').coefficients == (5, 1, 8, 5, 1, 4)
+    # wrong coefficients are replaced by the balanced ones
+    assert Reaction.parse('3H2 + O2 -> H2O').coefficients == (2, 1, 2)
+
+
+def test_unbalanceable_reactions():
+    with pytest.raises(ValueError, match='cannot be balanced'):
+        Reaction.parse('H2 -> O2')
+    with pytest.raises(ValueError, match='independent reactions'):
+        Reaction.parse('C + O2 -> CO + CO2')
+    assert Reaction.parse('2C + 1.5O2 -> CO + CO2').coefficients == (4, 3, 2, 2)
+
+
+def test_run_finds_the_limiting_reactant():
+    reaction = Reaction.parse('CH4 + 2O2 -> CO2 + 2H2O')
+    result = reaction.run({'CH4': [1, 3, 2], 'O2': [4, 2, 4]})
+    np.testing.assert_allclose(result['extent'], [1, 1, 2])
+    # on ties the first reactant is limiting
+    np.testing.assert_array_equal(result['limiting'], [0, 1, 0])
+    np.testing.assert_allclose(result['amounts']['CH4'], [0, 2, 0])
+    np.testing.assert_allclose(result['amounts']['O2'], [2, 0, 0])
+    np.testing.assert_allclose(result['amounts']['H2O'], [2, 2, 4])
+
+
+def test_run_broadcasts_grids_and_ignores_missing_reactants():
+    reaction = Reaction.parse('CO2 + 4H2S + O2 -> CH2O + 4S + 3H2O')
+    h2s, co2 = np.meshgrid(np.arange(9), np.arange(3), indexing='ij')
+    result = reaction.run({'H2S': h2s, 'CO2': co2})  # O2 in excess
+    assert result['extent'].shape == (9, 3)
+    np.testing.assert_allclose(result['extent'], np.minimum(h2s / 4, co2))
+    assert 'O2' not in result['amounts']
+    with pytest.raises(KeyError):
+        reaction.run({'CH2O': 1})
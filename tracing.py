@@ -0,0 +1,167 @@
+"""Lightweight timing spans for the stages of the pipeline: resolve, parse, render and export.
+
+A span measures a block of code and, when it ends, passes its record to every registered sink and to the collectors
+active in the current context (e.g. the Streamlit session running the code). Without sinks and collectors a span only
+costs two clock reads. Records are dictionaries with the span 'name', its 'parent' span name, the 'start' (epoch
+seconds) and 'duration_s', the 'attrs' given to the span and the 'error' type name if the block raised.
+
+    add_sink(LogSink())  # one structured log line for each span
+    with span('embed', n_conf=10):
+        ...
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_sinks = []
+_sinks_lock = threading.Lock()
+# name of the innermost open span and the collectors of the current context
+_current = contextvars.ContextVar('current_span', default=None)
+_collectors = contextvars.ContextVar('span_collectors', default=())
+
+
+def add_sink(sink):
+    """Register a callable receiving the record of every span, in every thread."""
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    """Unregister a sink added with add_sink()."""
+    with _sinks_lock:
+        _sinks.remove(sink)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Measure the enclosed block as a span.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage, e.g. 'embed'.
+    **attrs
+        Attributes of the span, e.g. the number of atoms. They must be JSON serializable to be logged.
+
+    Yields
+    ------
+    dictionary
+        The record of the span, 'duration_s' is set when the block ends. More attributes can be added to 'attrs'.
+
+    """
+    record = {'name': name, 'parent': _current.get(), 'attrs': attrs, 'error': None}
+    token = _current.set(name)
+    record['start'] = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as err:
+        record['error'] = type(err).__name__
+        raise
+    finally:
+        record['duration_s'] = time.perf_counter() - start
+        _current.reset(token)
+        for sink in _sinks:
+            try:
+                sink(record)
+            except Exception:  # a broken sink must never break the pipeline
+                logging.getLogger(__name__).exception('Span sink %r failed', sink)
+        for collector in _collectors.get():
+            collector.append(record)
+
+
+def traced(name=None):
+    """Decorator measuring every call of a function as a span, named after the function by default."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect():
+    """Collect the records of the spans ending in the enclosed block and in the same context (thread or task), e.g.
+    to show the timings of one Streamlit rerun without mixing the other sessions.
+
+    Yields
+    ------
+    list
+        The span records, in order of end.
+
+    """
+    records = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+
+class LogSink:
+    """Sink writing one structured (JSON) log line for each span.
+
+    Parameters
+    ----------
+    logger : logging.Logger, optional
+        The logger, 'tracing' by default.
+    level : int, default: logging.INFO
+        The level of the log lines.
+    min_duration : float, default: 0
+        Spans shorter than this (in seconds) are not logged.
+
+    """
+
+    def __init__(self, logger=None, level=logging.INFO, min_duration=0):
+        self.logger = logger or logging.getLogger('tracing')
+        self.level = level
+        self.min_duration = min_duration
+
+    def __call__(self, record):
+        if record['duration_s'] >= self.min_duration and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, json.dumps(record, default=str))
+
+
+class CounterSink:
+    """Sink aggregating the spans in memory: number of calls, errors, total and maximum duration for each name."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            counter = self._counters.setdefault(record['name'], {'count': 0, 'errors': 0, 'total_s': 0.0,
+                                                                 'max_s': 0.0})
+            counter['count'] += 1
+            counter['errors'] += record['error'] is not None
+            counter['total_s'] += record['duration_s']
+            counter['max_s'] = max(counter['max_s'], record['duration_s'])
+
+    def snapshot(self):
+        """Return a copy of the counters, with the mean duration of each span name."""
+        with self._lock:
+            return {name: dict(counter, mean_s=counter['total_s'] / counter['count'])
+                    for name, counter in self._counters.items()}
+
+    def reset(self):
+        """Remove every counter."""
+        with self._lock:
+            self._counters.clear()
+
+
+# process-wide counters, always registered: they cost a dictionary update per span
+counters = add_sink(CounterSink())
+if os.environ.get("TRACE_LOG", "").lower() in ("1", "true", "yes"):
+    add_sink(LogSink())